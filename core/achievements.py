@@ -0,0 +1,100 @@
+# core/achievements.py
+# Milestones are declared once in MILESTONES, each reading one per-user counter. After a change,
+# evaluate() is told which counters that change could have moved and checks only the milestones the
+# user has not earned that read one of them; each newly met one is stored as an Achievement. The
+# reports page lists the user's Achievement rows and never recomputes anything.
+# Add a milestone with register(Milestone(...)), e.g. from an AppConfig.ready(); run the
+# award_milestones command afterwards so users who already qualify get it.
+from django.db.models import Count, F, FloatField, Max, Q, Sum
+from django.db.models.functions import Cast, NullIf
+from django.utils import timezone
+
+from .models import Achievement, Habit
+
+# Counters, over the user's habits that are not deleted
+COMPLETED_DAYS = 'completed_days'  # Completed days, summed
+LONGEST_STREAK = 'longest_streak'  # Best streak of any habit
+BEST_RATE = 'best_rate'  # Highest completion rate (%) of any habit
+COMPLETED_HABITS = 'completed_habits'  # Habits marked completed
+DAY_COUNTERS = frozenset({COMPLETED_DAYS, LONGEST_STREAK, BEST_RATE})  # Moved by toggling entries
+
+MILESTONES = {}
+
+
+class Milestone:
+    """Earned once `counter` reaches `threshold`; override is_met() and counters for other rules."""
+
+    def __init__(self, key, title, message, color, counter, threshold):
+        self.key = key
+        self.title = title
+        self.message = message
+        self.color = color
+        self.counter = counter
+        self.threshold = threshold
+        self.counters = frozenset({counter})
+
+    def is_met(self, values):
+        return (values[self.counter] or 0) >= self.threshold
+
+
+def register(milestone):
+    MILESTONES[milestone.key] = milestone
+    return milestone
+
+
+register(Milestone('days_10', "10 Days Consistent", "You’ve checked off 10 days! Small steps lead to big wins—keep it up!", 'bg-info', COMPLETED_DAYS, 10))
+register(Milestone('days_30', "30-Day Champion", "Wow, 30 days of progress! You’re building habits like a pro!", 'bg-primary', COMPLETED_DAYS, 30))
+register(Milestone('streak_7', "Week-Long Warrior", "A 7-day streak? That’s serious dedication—stay unstoppable!", 'bg-warning', LONGEST_STREAK, 7))
+register(Milestone('finisher', "Habit Finisher", "You’ve completed a habit! Celebrate your victory!", 'bg-success', COMPLETED_HABITS, 1))
+register(Milestone('rate_100', "Perfect Habit Master", "100% completion on a habit? You’re a perfectionist—amazing work!", 'bg-dark', BEST_RATE, 100))
+register(Milestone('rate_90', "Near-Perfect Achiever", "90%+ on a habit—almost flawless, keep shining!", 'bg-purple', BEST_RATE, 90))
+register(Milestone('rate_75', "Three-Quarter Titan", "75%+ completion—strong and steady, you’re crushing it!", 'bg-teal', BEST_RATE, 75))
+register(Milestone('rate_50', "Halfway Hero", "50%+ on a habit—half the battle won, keep pushing forward!", 'bg-orange', BEST_RATE, 50))
+
+
+def counter_values(user_ids):
+    # Every counter per user in one aggregate over the habits and their stats
+    return {row.pop('user_id'): row for row in (
+        Habit.objects.filter(user_id__in=user_ids, is_deleted=False).values('user_id').order_by().annotate(**{
+            COMPLETED_DAYS: Sum('stats__completed_days'),
+            LONGEST_STREAK: Max('stats__longest_streak'),
+            BEST_RATE: Max(Cast('stats__completed_days', FloatField()) * 100 / NullIf(F('stats__total_days'), 0)),
+            COMPLETED_HABITS: Count('id', filter=Q(is_completed=True)),
+        })
+    )}
+
+
+def evaluate(user_id, changed=None):
+    """Award the milestones met after a change that may have moved the `changed` counters (all when None).
+
+    Returns the newly earned Achievements; no query runs when no milestone reads a changed counter.
+    """
+    return evaluate_many([user_id], changed)
+
+
+def evaluate_many(user_ids, changed=None):
+    """evaluate() for many users with the same three queries, e.g. after a bulk UPDATE."""
+    candidates = [milestone for milestone in MILESTONES.values() if changed is None or milestone.counters & changed]
+    if not candidates or not user_ids:
+        return []
+    earned = set(Achievement.objects.filter(user_id__in=user_ids, key__in=[milestone.key for milestone in candidates])
+                 .values_list('user_id', 'key'))
+    if len(earned) == len(candidates) * len(set(user_ids)):
+        return []
+    values = counter_values(user_ids)
+    now = timezone.now()
+    new = [Achievement(user_id=user_id, key=milestone.key, earned_at=now)
+           for user_id, counters in values.items() for milestone in candidates
+           if (user_id, milestone.key) not in earned and milestone.is_met(counters)]
+    Achievement.objects.bulk_create(new, ignore_conflicts=True)
+    return new
+
+
+def earned(user):
+    """The user's achievements for display, oldest first; milestones no longer registered are left out."""
+    return [
+        {'title': milestone.title, 'message': milestone.message, 'color': milestone.color,
+         'earned_at': achievement.earned_at}
+        for achievement in Achievement.objects.filter(user=user).order_by('earned_at', 'id')
+        for milestone in [MILESTONES.get(achievement.key)] if milestone
+    ]
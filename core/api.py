@@ -0,0 +1,339 @@
+# core/api.py
+# JSON API, version 1 (mounted under /api/v1/ by core.api_urls). It uses the app's session login,
+# so POST/PATCH/DELETE need the usual X-CSRFToken header. GET responses carry a strong ETag built
+# from the user's stamp in core.stamps: a matching If-None-Match gets a 304 before any habit, note
+# or todo is loaded. ?fields=a,b trims each object to the listed fields.
+import hashlib
+import json
+from datetime import date
+from functools import wraps
+
+from django.forms.models import model_to_dict
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from . import importer, stamps
+from .forms import NoteForm, ToDoForm
+from .models import Habit, HabitStats, ImportJob, Note, ToDo
+from .pagination import InvalidCursor, keyset_page
+from .services import apply_checkins, toggle_entry
+from .streaks import rebuild_stats
+from .views import NOTE_ORDERING, TODO_ORDERING
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def api_view(resource, methods=('GET',)):
+    """JSON errors for auth, method and ApiError, plus ETag handling on GET for `resource`."""
+    def etag(request, *args, **kwargs):
+        # One version per user and resource; the full path covers ids, ?fields= and cursors
+        stamp = stamps.get_stamp(request.user.pk, resource)
+        return hashlib.md5(f'{stamp}:{request.get_full_path()}'.encode(), usedforsecurity=False).hexdigest()
+
+    def decorator(view):
+        conditional = cache_control(private=True, no_cache=True)(condition(etag_func=etag)(view))
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return JsonResponse({'error': 'Authentication required.'}, status=401)
+            if request.method not in methods:
+                response = JsonResponse({'error': 'Method not allowed.'}, status=405)
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                if request.method == 'GET':
+                    return conditional(request, *args, **kwargs)
+                return view(request, *args, **kwargs)
+            except ApiError as e:
+                return JsonResponse({'error': str(e), **e.extra}, status=e.status)
+            except Http404:
+                return JsonResponse({'error': 'Not found.'}, status=404)
+        return wrapper
+    return decorator
+
+
+def requested_fields(request, available, default):
+    fields = [name for name in request.GET.get('fields', '').split(',') if name]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}.", available=list(available))
+    return fields or default
+
+
+def serialize(obj, available, fields):
+    return {name: available[name](obj) for name in fields}
+
+
+def read_json(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError('Request body must be JSON.')
+    if not isinstance(data, dict):
+        raise ApiError('Request body must be a JSON object.')
+    return data
+
+
+def form_errors(form):
+    return {field: [error['message'] for error in errors] for field, errors in form.errors.get_json_data().items()}
+
+
+def save_form(form_class, data, instance, user=None):
+    # PATCH semantics: fields missing from the body keep their current values
+    if instance.pk:
+        data = {**model_to_dict(instance, form_class._meta.fields), **data}
+    form = form_class(data, instance=instance)
+    if not form.is_valid():
+        raise ApiError('Invalid data.', fields=form_errors(form))
+    obj = form.save(commit=False)
+    if user is not None:
+        obj.user = user
+    return form, obj
+
+
+def page(request, queryset, ordering):
+    try:
+        return keyset_page(queryset, ordering, request.GET.get('cursor'))
+    except InvalidCursor as e:
+        raise ApiError(str(e))
+
+
+def iso(value):
+    return value.isoformat() if value else None
+
+
+# Habits
+
+def habit_stats(habit):
+    try:
+        return habit.stats
+    except HabitStats.DoesNotExist:
+        return rebuild_stats(habit)  # Habits created before the summary existed
+
+
+HABIT_FIELDS = {
+    'id': lambda habit: habit.id,
+    'name': lambda habit: habit.name,
+    'start_date': lambda habit: iso(habit.start_date),
+    'end_date': lambda habit: iso(habit.end_date),
+    'is_completed': lambda habit: habit.is_completed,
+    'is_deleted': lambda habit: habit.is_deleted,
+    'total_days': lambda habit: habit.total_days,
+    'completed_days': lambda habit: habit_stats(habit).completed_days,
+    'current_streak': lambda habit: habit_stats(habit).current_streak,
+    'longest_streak': lambda habit: habit_stats(habit).longest_streak,
+    'last_completed': lambda habit: iso(habit_stats(habit).last_completed),
+    'entries': lambda habit: [iso(day) for day, completed in habit.days() if completed],
+}
+DEFAULT_HABIT_FIELDS = [name for name in HABIT_FIELDS if name != 'entries']
+STATS_FIELDS = {'completed_days', 'current_streak', 'longest_streak', 'last_completed'}
+
+
+def habit_queryset(user, fields, tab='all'):
+    queryset = Habit.objects.for_tab(user, tab)
+    if STATS_FIELDS.intersection(fields):
+        queryset = queryset.select_related('stats')
+    if 'entries' not in fields:
+        queryset = queryset.defer('history')
+    return queryset
+
+
+@api_view('habits')
+def habit_list(request):
+    tab = request.GET.get('tab', 'all')
+    if tab not in ('ongoing', 'completed', 'deleted', 'all'):
+        raise ApiError('tab must be one of ongoing, completed, deleted, all.')
+    fields = requested_fields(request, HABIT_FIELDS, DEFAULT_HABIT_FIELDS)
+    habits = habit_queryset(request.user, fields, tab)
+    return JsonResponse({'results': [serialize(habit, HABIT_FIELDS, fields) for habit in habits.order_by('id')]})
+
+
+@api_view('habits')
+def habit_detail(request, habit_id):
+    fields = requested_fields(request, HABIT_FIELDS, DEFAULT_HABIT_FIELDS)
+    habit = get_object_or_404(habit_queryset(request.user, fields), pk=habit_id)
+    return JsonResponse(serialize(habit, HABIT_FIELDS, fields))
+
+
+@api_view('habits')
+def habit_entries(request, habit_id):
+    habit = get_object_or_404(Habit, pk=habit_id, user=request.user)
+    return JsonResponse({
+        'id': habit.id,
+        'entries': [{'date': iso(day), 'completed': completed} for day, completed in habit.days()],
+    })
+
+
+@api_view('habits', methods=('POST',))
+def toggle_habit_entry(request, habit_id, day):
+    habit = get_object_or_404(Habit, pk=habit_id, user=request.user)
+    try:
+        day = date.fromisoformat(day)
+        completed = toggle_entry(habit, day)
+    except ValueError:
+        raise ApiError('No such day for this habit.', status=404)
+    return JsonResponse({'date': iso(day), 'completed': completed})
+
+
+@api_view('habits', methods=('POST',))
+def checkins(request):
+    # {"operations": [{"habit_id": 1, "date": "2025-01-03", "completed": true}, ...]}
+    operations = read_json(request).get('operations')
+    if not isinstance(operations, list):
+        raise ApiError('operations must be a list.')
+    try:
+        parsed = []
+        for operation in operations:
+            if not isinstance(operation['completed'], bool):
+                raise TypeError
+            parsed.append((int(operation['habit_id']), date.fromisoformat(operation['date']), operation['completed']))
+    except (KeyError, TypeError, ValueError):
+        raise ApiError('Each operation needs habit_id, date (YYYY-MM-DD) and completed (true or false).')
+    try:
+        stats = apply_checkins(request.user, parsed)
+    except ValueError as e:
+        raise ApiError(str(e))
+    return JsonResponse({'results': [{
+        'id': habit_id,
+        'completed_days': habit_stats.completed_days,
+        'total_days': habit_stats.total_days,
+        'completion_rate': round(habit_stats.completion_rate, 1),
+        'current_streak': habit_stats.current_streak,
+        'longest_streak': habit_stats.longest_streak,
+        'last_completed': iso(habit_stats.last_completed),
+    } for habit_id, habit_stats in stats.items()]})
+
+
+# Imports
+
+def import_job(job):
+    return {
+        'id': job.pk,
+        'source': job.source,
+        'format': job.format,
+        'status': job.status,
+        'rows_done': job.rows_done,
+        'entries_written': job.entries_written,
+        'habits_created': job.habits_created,
+        'error_count': job.error_count,
+        'errors': job.errors,
+        'created_at': iso(job.created_at),
+        'updated_at': iso(job.updated_at),
+    }
+
+
+@api_view('habits', methods=('POST',))
+def imports(request):
+    # multipart/form-data: file=<CSV or JSON>, optionally format=csv|json (else from the file name)
+    # and resume=<job id> to continue an interrupted import of the same file
+    upload = request.FILES.get('file')
+    if upload is None:
+        raise ApiError('Send the history as a file field.')
+    resume = request.POST.get('resume')
+    try:
+        if resume:
+            if not resume.isdigit():
+                raise Http404
+            job = get_object_or_404(ImportJob, pk=resume, user=request.user)
+        else:
+            job = importer.start_import(request.user, request.POST.get('format') or importer.guess_format(upload.name),
+                                        upload.name)
+    except ValueError as e:
+        raise ApiError(str(e))
+    try:
+        importer.run_import(job, upload.file)
+    except ValueError as e:
+        raise ApiError(str(e), job=import_job(job))
+    return JsonResponse(import_job(job), status=200 if resume else 201)
+
+
+@api_view('habits')
+def import_detail(request, job_id):
+    return JsonResponse(import_job(get_object_or_404(ImportJob, pk=job_id, user=request.user)))
+
+
+# Notes
+
+NOTE_FIELDS = {
+    'id': lambda note: note.id,
+    'title': lambda note: note.title,
+    'heading': lambda note: note.heading,
+    'content': lambda note: note.content,
+    'created_at': lambda note: iso(note.created_at),
+}
+
+
+@api_view('notes', methods=('GET', 'POST'))
+def note_list(request):
+    if request.method == 'POST':
+        _, note = save_form(NoteForm, read_json(request), Note(), user=request.user)
+        note.save()
+        return JsonResponse(serialize(note, NOTE_FIELDS, NOTE_FIELDS), status=201)
+
+    fields = requested_fields(request, NOTE_FIELDS, list(NOTE_FIELDS))
+    notes, next_cursor = page(request, Note.objects.filter(user=request.user), NOTE_ORDERING)
+    return JsonResponse({'results': [serialize(note, NOTE_FIELDS, fields) for note in notes], 'next_cursor': next_cursor})
+
+
+@api_view('notes', methods=('GET', 'PATCH', 'DELETE'))
+def note_detail(request, note_id):
+    note = get_object_or_404(Note, pk=note_id, user=request.user)
+    if request.method == 'DELETE':
+        note.delete()
+        return HttpResponse(status=204)
+    if request.method == 'PATCH':
+        _, note = save_form(NoteForm, read_json(request), note)
+        note.save()
+        return JsonResponse(serialize(note, NOTE_FIELDS, NOTE_FIELDS))
+
+    fields = requested_fields(request, NOTE_FIELDS, list(NOTE_FIELDS))
+    return JsonResponse(serialize(note, NOTE_FIELDS, fields))
+
+
+# Todos
+
+TODO_FIELDS = {
+    'id': lambda todo: todo.id,
+    'task': lambda todo: todo.task,
+    'deadline': lambda todo: iso(todo.deadline),
+    'reminder': lambda todo: iso(todo.reminder),
+    'status': lambda todo: todo.status,
+    'created_at': lambda todo: iso(todo.created_at),
+}
+
+
+@api_view('todos', methods=('GET', 'POST'))
+def todo_list(request):
+    if request.method == 'POST':
+        _, todo = save_form(ToDoForm, read_json(request), ToDo(), user=request.user)
+        todo.save()  # The send_due_reminders sweeper picks the reminder up once it is due
+        return JsonResponse(serialize(todo, TODO_FIELDS, TODO_FIELDS), status=201)
+
+    fields = requested_fields(request, TODO_FIELDS, list(TODO_FIELDS))
+    todos, next_cursor = page(request, ToDo.objects.filter(user=request.user), TODO_ORDERING)
+    return JsonResponse({'results': [serialize(todo, TODO_FIELDS, fields) for todo in todos], 'next_cursor': next_cursor})
+
+
+@api_view('todos', methods=('GET', 'PATCH', 'DELETE'))
+def todo_detail(request, todo_id):
+    todo = get_object_or_404(ToDo, pk=todo_id, user=request.user)
+    if request.method == 'DELETE':
+        todo.delete()
+        return HttpResponse(status=204)
+    if request.method == 'PATCH':
+        form, todo = save_form(ToDoForm, read_json(request), todo)
+        if 'reminder' in form.changed_data:
+            todo.reminder_sent_at = None  # Send the moved reminder again
+        todo.save()
+        return JsonResponse(serialize(todo, TODO_FIELDS, TODO_FIELDS))
+
+    fields = requested_fields(request, TODO_FIELDS, list(TODO_FIELDS))
+    return JsonResponse(serialize(todo, TODO_FIELDS, fields))
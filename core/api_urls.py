@@ -0,0 +1,17 @@
+from django.urls import path
+from . import api
+
+# Version 1 of the JSON API, included under api/v1/ by core.urls
+urlpatterns = [
+    path('habits/', api.habit_list, name='api_habits'),
+    path('habits/<int:habit_id>/', api.habit_detail, name='api_habit'),
+    path('habits/<int:habit_id>/entries/', api.habit_entries, name='api_habit_entries'),
+    path('habits/<int:habit_id>/entries/<str:day>/', api.toggle_habit_entry, name='api_toggle_entry'),
+    path('checkins/', api.checkins, name='api_checkins'),
+    path('imports/', api.imports, name='api_imports'),
+    path('imports/<int:job_id>/', api.import_detail, name='api_import'),
+    path('notes/', api.note_list, name='api_notes'),
+    path('notes/<int:note_id>/', api.note_detail, name='api_note'),
+    path('todos/', api.todo_list, name='api_todos'),
+    path('todos/<int:todo_id>/', api.todo_detail, name='api_todo'),
+]
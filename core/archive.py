@@ -0,0 +1,85 @@
+# core/archive.py
+# Habits deleted more than HABIT_ARCHIVE_AFTER_DAYS ago are moved out of the hot tables into
+# ArchivedHabit, a batch per transaction, by the nightly archive_deleted_habits task. Their entries,
+# stats and weekly rollups are dropped: the packed history already holds every completed day, and
+# restore() rebuilds the rest. The deleted and all tabs list archived habits next to deleted ones.
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import achievements, report_cache, stamps
+from .models import ArchivedHabit, Habit, HabitEntry, HabitStats, WeeklyHabitRollup
+from .services import bulk_delete
+from .streaks import refresh_stats
+
+BATCH_SIZE = 500  # Habits moved per transaction
+COPIED_FIELDS = ['id', 'user_id', 'name', 'start_date', 'end_date', 'created_at', 'is_completed', 'history']
+
+
+def cutoff(days=None):
+    return timezone.now() - timedelta(days=settings.HABIT_ARCHIVE_AFTER_DAYS if days is None else days)
+
+
+def archive_batch(before, limit=BATCH_SIZE):
+    """Move up to `limit` habits deleted before `before` into the archive; returns how many were moved."""
+    with transaction.atomic():
+        habits = list(Habit.objects.select_for_update()
+                      .filter(is_deleted=True, deleted_at__lt=before).order_by('deleted_at', 'id')[:limit])
+        if not habits:
+            return 0
+        now = timezone.now()
+        ArchivedHabit.objects.bulk_create([
+            ArchivedHabit(deleted_at=habit.deleted_at, archived_at=now,
+                          **{name: getattr(habit, name) for name in COPIED_FIELDS})
+            for habit in habits
+        ])
+        ids = [(habit.pk,) for habit in habits]
+        # No per-row signals: they would rebuild rollups and invalidate caches habit by habit
+        for model in (HabitEntry, HabitStats, WeeklyHabitRollup):
+            bulk_delete(model, ['habit'], ids)
+        bulk_delete(Habit, ['id'], ids)
+    # Both bump stamps in the database, so web processes see the change even when this runs in celery
+    user_ids = {habit.user_id for habit in habits}
+    report_cache.invalidate_many(user_ids)
+    stamps.touch_many(user_ids, 'habits')
+    return len(habits)
+
+
+def archive_deleted(before=None, batch_size=BATCH_SIZE):
+    """Archive every habit deleted before `before` (HABIT_ARCHIVE_AFTER_DAYS ago by default); returns the count."""
+    before = before or cutoff()
+    archived = 0
+    while moved := archive_batch(before, batch_size):
+        archived += moved
+    return archived
+
+
+def deleted_habits(user):
+    """The user's deleted habits, those still in the hot table first, then the archived ones."""
+    return [*Habit.objects.for_tab(user, 'deleted'), *ArchivedHabit.objects.filter(user=user).order_by('-deleted_at')]
+
+
+def restore(user, habit_id):
+    """Undelete one of the user's habits, bringing it back from the archive if it was moved there.
+
+    Returns the live Habit; raises ArchivedHabit.DoesNotExist when the user has no such deleted habit.
+    """
+    habit = Habit.objects.filter(pk=habit_id, user=user, is_deleted=True).first()
+    if habit is not None:
+        habit.is_deleted = False
+        habit.deleted_at = None
+        habit.save()
+    else:
+        with transaction.atomic():
+            archived = ArchivedHabit.objects.select_for_update().get(pk=habit_id, user=user)
+            # Inserted with its old id, so links and exports made before the deletion still match
+            habit = Habit(**{name: getattr(archived, name) for name in COPIED_FIELDS})
+            habit.save(force_insert=True)
+            HabitEntry.objects.bulk_create(
+                [HabitEntry(habit=habit, date=day, completed=True) for day, completed in habit.days() if completed])
+            refresh_stats(habit)
+            archived.delete()
+    achievements.evaluate(user.pk)
+    return habit
@@ -0,0 +1,36 @@
+# core/backends.py
+# Login is by email. Emails are compared lowercased, through the unique LOWER(email) index on auth_user
+# that migration 0018 adds, so finding the account is one index probe however many users there are.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Lower
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def users_with_email(email):
+    """Users whose email matches `email` ignoring case; the index makes this at most one."""
+    # Repeats the index's condition (no empty emails) so the planner knows the partial index applies
+    return get_user_model()._default_manager.alias(email_lower=Lower('email')).filter(
+        email_lower=normalize_email(email)).exclude(email='')
+
+
+class EmailBackend(ModelBackend):
+    """ModelBackend that also accepts authenticate(email=..., password=...); username logins (the admin) still work."""
+
+    def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+        if email is None:
+            return super().authenticate(request, username=username, password=password, **kwargs)
+        if not normalize_email(email) or password is None:
+            return None
+        try:
+            user = users_with_email(email).get()
+        except get_user_model().DoesNotExist:
+            # Hash anyway, so the response time does not tell whether the email has an account
+            get_user_model()().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,48 @@
+# core/bitset.py
+# Habit.history packs one bit per day since start_date: bit i is set when day i was completed.
+# Histories are handled as Python ints so streak maths is a handful of big-int operations.
+
+
+def decode(history):
+    return int.from_bytes(history or b'', 'little')
+
+
+def encode(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def from_indexes(indexes):
+    bits = 0
+    for index in indexes:
+        bits |= 1 << index
+    return bits
+
+
+def is_set(bits, index):
+    return (bits >> index) & 1 == 1
+
+
+def flip(bits, index):
+    return bits ^ (1 << index)
+
+
+def count(bits):
+    return bin(bits).count('1')
+
+
+def longest_run(bits):
+    # Each `bits & (bits >> 1)` shortens every run of ones by one day
+    length = 0
+    while bits:
+        bits &= bits >> 1
+        length += 1
+    return length
+
+
+def trailing_run(bits):
+    """Length of the run that ends at the most recent completed day."""
+    if not bits:
+        return 0
+    last = bits.bit_length() - 1
+    gaps = ~bits & ((1 << last) - 1)
+    return last - gaps.bit_length() + 1 if gaps else last + 1
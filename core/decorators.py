@@ -0,0 +1,16 @@
+# core/decorators.py
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+
+
+def async_login_required(view):
+    """login_required for coroutine views (Django's decorator only supports them from 5.0)."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # Resolve the lazy request.user off the event loop; templates then reuse the loaded user
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,126 @@
+# core/export.py
+# Streaming exports of a user's habits, entries, notes and todos as CSV or JSON, optionally gzipped.
+# Rows are read with .iterator(chunk_size=...) and written out a chunk at a time, so memory stays flat
+# however long the history is; used by export_view and the export_data command.
+import csv
+import json
+import zlib
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, StreamingHttpResponse
+
+from .models import Habit, HabitEntry, Note, ToDo
+
+CHUNK_SIZE = 2000  # Rows fetched per database round trip, and written per yielded chunk
+FORMATS = {'csv': 'text/csv', 'json': 'application/json'}
+
+# name -> (queryset for a user, columns); values_list keeps model instances out of the loop
+RESOURCES = {
+    'habits': (lambda user: Habit.objects.filter(user=user).order_by('id'),
+               ['id', 'name', 'start_date', 'end_date', 'created_at', 'is_completed', 'is_deleted']),
+    # Entries are stored for completed days only, so every exported row is a completed day
+    'entries': (lambda user: HabitEntry.objects.filter(habit__user=user, completed=True).order_by('habit_id', 'date'),
+                ['habit_id', 'date']),
+    'notes': (lambda user: Note.objects.filter(user=user).order_by('id'),
+              ['id', 'title', 'heading', 'content', 'created_at']),
+    'todos': (lambda user: ToDo.objects.filter(user=user).order_by('id'),
+              ['id', 'task', 'deadline', 'reminder', 'status', 'created_at']),
+}
+
+
+class Echo:
+    # csv.writer target that hands each formatted row back instead of storing it
+    def write(self, value):
+        return value
+
+
+def cell(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def rows(user, resource):
+    queryset, columns = RESOURCES[resource]
+    return columns, queryset(user).values_list(*columns).iterator(chunk_size=CHUNK_SIZE)
+
+
+def csv_chunks(user, resource):
+    columns, values = rows(user, resource)
+    writer = csv.writer(Echo())
+    chunk = [writer.writerow(columns)]
+    for row in values:
+        chunk.append(writer.writerow([cell(value) for value in row]))
+        if len(chunk) >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+def _json_array(user, resource):
+    columns, values = rows(user, resource)
+    chunk, separator = ['['], ''
+    for row in values:
+        chunk.append(separator + json.dumps(dict(zip(columns, map(cell, row))), ensure_ascii=False))
+        separator = ','
+        if len(chunk) >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append(']')
+    yield ''.join(chunk)
+
+
+def json_chunks(user, resource):
+    # One array for a single resource, or {"habits": [...], "entries": [...], ...} for 'all'
+    if resource != 'all':
+        yield from _json_array(user, resource)
+        return
+    for index, name in enumerate(RESOURCES):
+        yield ('{' if index == 0 else ',') + json.dumps(name) + ':'
+        yield from _json_array(user, name)
+    yield '}'
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(user, resource, fmt, gzip=False):
+    """Encoded chunks of `user`'s `resource` ('all' for every resource, JSON only) as csv or json."""
+    if fmt not in FORMATS or (resource not in RESOURCES and not (resource == 'all' and fmt == 'json')):
+        raise ValueError(f'Cannot export {resource} as {fmt}.')
+    chunks = (chunk.encode() for chunk in (csv_chunks if fmt == 'csv' else json_chunks)(user, resource))
+    return gzipped(chunks) if gzip else chunks
+
+
+async def pulled(chunks):
+    # Served over ASGI, a sync iterator would first be read into a list; pull one chunk at a time
+    # instead, on the request's database thread
+    pull = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await pull(chunks, None)) is not None:
+        yield chunk
+
+
+def filename(resource, fmt, gzip=False):
+    return f'streaks-{resource}.{fmt}' + ('.gz' if gzip else '')
+
+
+@login_required
+def export_view(request, resource, fmt):
+    # /export/entries.csv, /export/all.json; ?gzip=1 downloads a compressed file
+    gzip = request.GET.get('gzip') == '1'
+    try:
+        chunks = export_chunks(request.user, resource, fmt, gzip)
+    except ValueError:
+        raise Http404
+    if isinstance(request, ASGIRequest):
+        chunks = pulled(chunks)
+    response = StreamingHttpResponse(chunks, content_type='application/gzip' if gzip else f'{FORMATS[fmt]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename(resource, fmt, gzip)}"'
+    return response
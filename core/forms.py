@@ -1,6 +1,8 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
+from .backends import normalize_email, users_with_email
+from .models import Note, ToDo
 
 class RegisterForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -9,6 +11,31 @@ class RegisterForm(UserCreationForm):
         model = User
         fields = ['username', 'email', 'password1', 'password2']
 
+    def clean_email(self):
+        # Stored lowercased; the database also refuses a second account with the same email in any case
+        email = normalize_email(self.cleaned_data['email'])
+        if users_with_email(email).exists():
+            raise forms.ValidationError('An account with this email already exists.')
+        return email
+
 class LoginForm(forms.Form):
     email = forms.EmailField()
-    password = forms.CharField(widget=forms.PasswordInput)
\ No newline at end of file
+    password = forms.CharField(widget=forms.PasswordInput)
+
+# Used by the JSON API (core.api) to validate request bodies
+class NoteForm(forms.ModelForm):
+    class Meta:
+        model = Note
+        fields = ['title', 'heading', 'content']
+
+class ToDoForm(forms.ModelForm):
+    class Meta:
+        model = ToDo
+        fields = ['task', 'deadline', 'reminder', 'status']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['status'].required = False
+
+    def clean_status(self):
+        return self.cleaned_data['status'] or 'pending'
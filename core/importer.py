@@ -0,0 +1,240 @@
+# core/importer.py
+# Bulk import of habit histories exported from other trackers: rows of (habit name, date, completed)
+# as CSV or JSON. Input is parsed as a stream and applied a batch at a time; each batch is one
+# transaction that creates the habits it names that do not exist yet, widens the date range of those
+# it falls outside of, upserts the completed days, deletes the uncompleted ones (entries are sparse),
+# and rewrites the packed histories and stats, all with a fixed number of queries. The ImportJob is
+# saved in the same transaction, so an interrupted import resumes after its last committed batch.
+# Used by the imports API endpoint and the import_history command.
+import csv
+import io
+import json
+import re
+from datetime import date
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import achievements, bitset, report_cache, rollups, stamps
+from .models import Habit, HabitEntry, ImportJob
+from .services import MAX_HABIT_DURATION, bulk_delete, bulk_set, save_stats
+
+BATCH_SIZE = 20000  # Input rows per transaction
+MAX_ERRORS = 100  # Row errors kept on the job; the rest are only counted
+MAX_RECORD = 1 << 20  # Characters a single JSON object may take
+FORMATS = ('csv', 'json')
+
+# Accepted column (CSV) or key (JSON) names, in order of preference
+COLUMNS = {
+    'habit': ('habit', 'habit_name', 'name'),
+    'date': ('date', 'day'),
+    'completed': ('completed', 'done', 'status'),
+}
+TRUE = frozenset({'1', 'true', 'yes', 'y', 'x', 'done', 'completed'})
+FALSE = frozenset({'0', 'false', 'no', 'n', '', 'missed', 'skipped'})
+SEPARATORS = re.compile(r'[\s,\[\]]*')
+NAME_LENGTH = Habit._meta.get_field('name').max_length
+
+
+def _find(names, wanted):
+    return next((name for name in COLUMNS[wanted] if name in names), None)
+
+
+def csv_records(stream):
+    """(habit, date, completed) per row of a CSV file with a header; completed is True when there is no such column."""
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    header = [column.strip().lower() for column in next(reader, [])]
+    habit, day, completed = (_find(header, column) for column in COLUMNS)
+    if habit is None or day is None:
+        raise ValueError('The CSV header needs a habit and a date column.')
+    habit, day = header.index(habit), header.index(day)
+    completed = header.index(completed) if completed else None
+    for row in reader:
+        if not row:
+            continue
+        try:
+            yield row[habit], row[day], True if completed is None else row[completed]
+        except IndexError:
+            yield None
+
+
+def json_records(stream, chunk_size=1 << 16):
+    """(habit, date, completed) per object of a JSON array, or of JSON Lines, decoded one object at a time."""
+    decoder = json.JSONDecoder()
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    buffer, position, eof = '', 0, False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        try:
+            if position == len(buffer):
+                raise ValueError
+            value, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            # The object is cut off at the end of the buffer, or it is malformed
+            if eof:
+                if position == len(buffer):
+                    return
+                raise ValueError(f'Malformed JSON near {buffer[position:position + 40]!r}.')
+            if len(buffer) - position > MAX_RECORD:
+                raise ValueError('Malformed JSON, or an object over 1 MiB.')
+            more = text.read(chunk_size)
+            buffer, position, eof = buffer[position:] + more, 0, not more
+            continue
+        if not isinstance(value, dict):
+            yield None
+            continue
+        keys = {key.lower(): key for key in value if isinstance(key, str)}
+        habit, day, completed = (keys.get(_find(keys, column)) for column in COLUMNS)
+        yield value.get(habit), value.get(day), True if completed is None else value[completed]
+
+
+def clean(record):
+    """Validate one record, returning (name, date, completed); raises ValueError with the reason."""
+    if record is None:
+        raise ValueError('Expected a habit, a date and optionally completed.')
+    name, day, completed = record
+    if not isinstance(name, str) or not (name := name.strip()):
+        raise ValueError('Missing habit name.')
+    if len(name) > NAME_LENGTH:
+        raise ValueError('Habit name is too long.')
+    if not isinstance(day, str):
+        raise ValueError('Missing date.')
+    day = date.fromisoformat(day.strip())
+    if isinstance(completed, str):
+        flag = completed.strip().lower()
+        if flag not in TRUE and flag not in FALSE:
+            raise ValueError(f'completed must be true or false, not {completed!r}.')
+        completed = flag in TRUE
+    elif not isinstance(completed, (bool, int)):
+        raise ValueError('completed must be true or false.')
+    return name, day, bool(completed)
+
+
+def upsert_sql(connection):
+    # The statement HabitEntry.objects.bulk_create(update_conflicts=True, unique_fields=['habit', 'date'],
+    # update_fields=['completed']) sends, prepared once for executemany(): building a model instance and
+    # compiling SQL for every row costs several times more than SQLite takes to write it
+    meta = HabitEntry._meta
+    quote = connection.ops.quote_name
+    habit, day, completed = (quote(meta.get_field(name).column) for name in ('habit', 'date', 'completed'))
+    return (f'INSERT INTO {quote(meta.db_table)} ({habit}, {day}, {completed}) VALUES (%s, %s, %s) '
+            f'ON CONFLICT ({habit}, {day}) DO UPDATE SET {completed} = EXCLUDED.{completed}')
+
+
+def _fail(job, number, error):
+    job.error_count += 1
+    if len(job.errors) < MAX_ERRORS:
+        job.errors.append({'row': number, 'error': str(error)})
+
+
+def apply_batch(job, batch):
+    """Apply (row number, record) pairs for job.user in one transaction, recording invalid rows on the job."""
+    user = job.user
+    with transaction.atomic():
+        rows = []
+        for number, record in batch:
+            try:
+                rows.append((number, *clean(record)))
+            except ValueError as e:
+                _fail(job, number, e)
+        # The first live habit of each name is the one imported into
+        habits = {}
+        for habit in (Habit.objects.select_for_update(of=('self',)).select_related('stats')
+                      .filter(user=user, is_deleted=False, name__in={row[1] for row in rows}).order_by('-id')):
+            habits[habit.name] = habit
+
+        # Widen each habit once to cover the batch; only rows that would make it too long go day by day
+        spans = {}
+        for _, name, day, _ in rows:
+            span = spans.setdefault(name, [day, day])
+            if day < span[0]:
+                span[0] = day
+            elif day > span[1]:
+                span[1] = day
+        now = timezone.now()
+        bits, wanted = {}, {}
+        for name, (first, last) in spans.items():
+            habit = habits.get(name)
+            if habit is None:
+                habit = habits[name] = Habit(user=user, name=name, start_date=first, end_date=first, created_at=now)
+            start, end = min(habit.start_date, first), max(habit.end_date, last)
+            value = bitset.decode(habit.history)
+            if (end - start).days <= MAX_HABIT_DURATION:
+                value <<= (habit.start_date - start).days
+                habit.start_date, habit.end_date = start, end
+            bits[name] = value
+        for number, name, day, completed in rows:
+            habit = habits[name]
+            value = bits[name]
+            if not habit.start_date <= day <= habit.end_date:
+                start, end = min(habit.start_date, day), max(habit.end_date, day)
+                if (end - start).days > MAX_HABIT_DURATION:
+                    _fail(job, number, f'{name} would span more than {MAX_HABIT_DURATION} days.')
+                    continue
+                # Moving start_date earlier moves every existing day up by as many bits
+                value <<= (habit.start_date - start).days
+                habit.start_date, habit.end_date = start, end
+            index = (day - habit.start_date).days
+            bits[name] = value | (1 << index) if completed else value & ~(1 << index)
+            wanted[name, day] = completed  # Later rows for the same day win
+
+        touched = [habits[name] for name in bits]
+        for habit in touched:
+            habit.history = bitset.encode(bits[habit.name])
+        new = [habit for habit in touched if habit.pk is None]
+        bulk_set([habit for habit in touched if habit.pk is not None], ['start_date', 'end_date', 'history'])
+        Habit.objects.bulk_create(new)
+        ids = {habit.name: habit.pk for habit in touched}
+        adapt = connection.ops.adapt_datefield_value
+        with connection.cursor() as cursor:
+            cursor.executemany(upsert_sql(connection), [
+                (ids[name], adapt(day), True) for (name, day), completed in wanted.items() if completed
+            ])
+        bulk_delete(HabitEntry, ['habit', 'date'],
+                    [(ids[name], day) for (name, day), completed in wanted.items() if not completed])
+        save_stats(touched)
+
+        job.rows_done += len(batch)
+        job.entries_written += len(wanted)
+        job.habits_created += len(new)
+        job.save()
+
+    # bulk writes send no signals, so do what core.signals would have done once
+    report_cache.invalidate(user.pk)
+    stamps.touch(user.pk, 'habits')
+    return job
+
+
+def guess_format(filename):
+    return {'csv': 'csv', 'json': 'json', 'jsonl': 'json', 'ndjson': 'json'}.get(filename.rpartition('.')[2].lower())
+
+
+def start_import(user, fmt, source=''):
+    if fmt not in FORMATS:
+        raise ValueError(f'Cannot import {fmt or "this file"}, only {" or ".join(FORMATS)}.')
+    return ImportJob.objects.create(user=user, format=fmt, source=source[:255])
+
+
+def run_import(job, stream, batch_size=BATCH_SIZE):
+    """Import a binary CSV or JSON stream into job.user's habits; returns the job, now done.
+
+    Rows an earlier run of the job committed are skipped, so an interrupted import is resumed by
+    running its job again with the same file. Raises ValueError when the file cannot be parsed;
+    the rows before the bad spot stay imported.
+    """
+    if job.status != 'running':
+        raise ValueError('This import has already finished.')
+    records = csv_records(stream) if job.format == 'csv' else json_records(stream)
+    numbered = islice(enumerate(records, start=1), job.rows_done, None)
+    while batch := list(islice(numbered, batch_size)):
+        apply_batch(job, batch)
+
+    # Imported days can fall anywhere in the user's history, so its rollups are rebuilt whole
+    rollups.rebuild_user(job.user_id)
+    achievements.evaluate(job.user_id, achievements.DAY_COUNTERS)
+    job.status = 'done'
+    job.save()
+    report_cache.invalidate(job.user_id)
+    stamps.touch(job.user_id, 'habits')
+    return job
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = ('Move habits deleted more than HABIT_ARCHIVE_AFTER_DAYS ago into the archive tables '
+            '(celery beat runs this nightly).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive habits deleted more than this many days ago instead.')
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE, help='Habits per transaction.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        count = archive.archive_deleted(archive.cutoff(options['days']), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {count} habit{"" if count == 1 else "s"}.'))
@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from core import achievements, report_cache
+
+
+class Command(BaseCommand):
+    help = 'Check every registered milestone for every user and award the met ones (after adding a milestone).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only check this user id.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(pk=options['user'])
+
+        awarded, user_ids = 0, []
+        for user_id in users.values_list('id', flat=True).iterator():
+            new = achievements.evaluate(user_id)
+            if new:
+                awarded += len(new)
+                user_ids.append(user_id)
+        report_cache.invalidate_many(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Awarded {awarded} achievement{"" if awarded == 1 else "s"}.'))
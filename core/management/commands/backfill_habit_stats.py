@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Habit
+from core.streaks import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Repack Habit.history from HabitEntry rows and rebuild HabitStats for every habit.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only backfill habits belonging to this user id.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        habits = Habit.objects.order_by('id')
+        if options['user']:
+            habits = habits.filter(user_id=options['user'])
+
+        count = 0
+        for habit in habits.iterator(chunk_size=options['chunk_size']):
+            rebuild_stats(habit)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Backfilled stats for {count} habit{"" if count == 1 else "s"}.'))
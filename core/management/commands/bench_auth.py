@@ -0,0 +1,91 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from .bench_views import Rollback, percentile
+
+PASSWORD = 'bench-password'
+PAGE = '/dashboard/'  # A static page, so its time is the session and user lookups
+
+
+class Command(BaseCommand):
+    help = ('Seed users in a rolled-back transaction and time logging in by email and an authenticated '
+            'page under each session profile in settings.SESSION_PROFILES.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000, help='Accounts in auth_user while timing.')
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--profiles', nargs='+', choices=list(settings.SESSION_PROFILES),
+                            default=list(settings.SESSION_PROFILES))
+        parser.add_argument('--real-hasher', action='store_true',
+                            help='Keep PASSWORD_HASHERS; by default a fast hasher is used so the lookups are what is timed.')
+
+    def measure(self, run, repeat):
+        run()  # Warm up
+        reset_queries()  # Each request clears the log, which would leave the capture below with a negative count
+        with CaptureQueriesContext(connection) as captured:
+            run()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), percentile(timings, 99), len(captured)
+
+    def bench(self, users, repeat):
+        results = {}
+        try:
+            with transaction.atomic():
+                password = make_password(PASSWORD)
+                User.objects.bulk_create(
+                    [User(username=f'bench-auth-{i}', email=f'bench-auth-{i}@example.com', password=password)
+                     for i in range(users)],
+                    batch_size=5000,
+                )
+                if connection.vendor == 'sqlite':
+                    connection.cursor().execute('ANALYZE')
+                email = f'bench-auth-{users - 1}@example.com'  # The last row, so a table scan reads them all
+
+                for profile in self.profiles:
+                    with override_settings(SESSION_ENGINE=settings.SESSION_PROFILES[profile]):
+                        def login():
+                            response = Client().post('/login/', {'email': email, 'password': PASSWORD})
+                            if response.status_code != 302:
+                                raise CommandError(f'Login as {email} failed under {profile}.')
+
+                        client = Client()
+                        client.post('/login/', {'email': email, 'password': PASSWORD})
+
+                        def page():
+                            response = client.get(PAGE)
+                            if response.status_code != 200:
+                                raise CommandError(f'{PAGE} returned {response.status_code} under {profile}.')
+
+                        results[profile] = {'login': self.measure(login, repeat), 'page': self.measure(page, repeat)}
+                raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1.')
+        self.profiles = options['profiles']
+        overrides = {'ALLOWED_HOSTS': ['testserver']}
+        if not options['real_hasher']:
+            overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        with override_settings(**overrides):
+            results = self.bench(options['users'], options['repeat'])
+
+        self.stdout.write(f"{options['users']:,} users, {options['repeat']} runs each")
+        self.stdout.write(f"  {'profile':<16} {'benchmark':<8} {'p50':>9} {'p99':>9} {'queries':>8}")
+        for profile, benchmarks in results.items():
+            for name, (p50, p99, queries) in benchmarks.items():
+                self.stdout.write(f'  {profile:<16} {name:<8} {p50:>7.2f}ms {p99:>7.2f}ms {queries:>8}')
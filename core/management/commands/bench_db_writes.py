@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from .storage_report import HABITENTRY_DDL
+
+
+def write_worker(path, pragmas, timeout, worker, seconds, results):
+    # One autocommit INSERT per iteration, like a habit toggle request, plus a read like a page view
+    db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    for pragma, value in pragmas.items():
+        db.execute(f'PRAGMA {pragma} = {value}')
+    writes = errors = 0
+    day = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            db.execute('INSERT INTO core_habitentry (date, completed, habit_id) VALUES (?, 1, ?)',
+                       (f'day-{day}', worker))
+            db.execute('SELECT COUNT(*) FROM core_habitentry WHERE habit_id = ?', (worker,)).fetchone()
+            writes += 1
+        except sqlite3.OperationalError:  # "database is locked"
+            errors += 1
+        day += 1
+    db.close()
+    results.put((writes, errors))
+
+
+class Command(BaseCommand):
+    help = 'Measure concurrent SQLite write throughput with default settings vs the SQLITE_PRAGMAS profile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+
+    def run(self, pragmas, timeout, workers, seconds):
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        try:
+            db = sqlite3.connect(path)
+            db.executescript(HABITENTRY_DDL)
+            db.close()
+            context = multiprocessing.get_context('spawn')
+            results = context.Queue()
+            processes = [context.Process(target=write_worker, args=(path, pragmas, timeout, i, seconds, results))
+                         for i in range(workers)]
+            for process in processes:
+                process.start()
+            totals = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        return sum(w for w, _ in totals) / seconds, sum(e for _, e in totals)
+
+    def handle(self, *args, **options):
+        workers, seconds = options['workers'], options['seconds']
+        tuned_timeout = settings.DATABASES['default'].get('OPTIONS', {}).get('timeout', 5)
+        # sqlite3 defaults: rollback journal, synchronous=FULL, 5 s lock timeout
+        before = self.run({}, 5, workers, seconds)
+        after = self.run(settings.SQLITE_PRAGMAS, tuned_timeout, workers, seconds)
+
+        self.stdout.write(f'{workers} concurrent writers for {seconds:g}s')
+        self.stdout.write(f'  default journal: {before[0]:10.0f} writes/s  {before[1]} lock errors')
+        self.stdout.write(f'  tuned profile:   {after[0]:10.0f} writes/s  {after[1]} lock errors')
+        self.stdout.write(f"  pragmas: {', '.join(f'{k}={v}' for k, v in settings.SQLITE_PRAGMAS.items())}")
@@ -0,0 +1,52 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Habit, HabitEntry
+from core.services import create_habit
+
+
+def legacy_create_habit(user, name, duration):
+    # The per-day get_or_create loop habits() used before core.services existed
+    start_date = timezone.now().date()
+    end_date = start_date + timedelta(days=duration)
+    habit = Habit.objects.create(user=user, name=name, start_date=start_date, end_date=end_date)
+    current_date = start_date
+    while current_date <= end_date:
+        HabitEntry.objects.get_or_create(habit=habit, date=current_date, defaults={'completed': False})
+        current_date += timedelta(days=1)
+    return habit
+
+
+class Command(BaseCommand):
+    help = 'Compare habit creation latency of the per-day loop against the bulk service.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--duration', type=int, default=30)
+
+    def time_runs(self, create, user, runs, duration):
+        timings = []
+        for i in range(runs):
+            started = time.perf_counter()
+            create(user, f'bench-{i}', duration)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return sum(timings) / len(timings), timings[len(timings) // 2]
+
+    def handle(self, *args, **options):
+        runs, duration = options['runs'], options['duration']
+        user = User.objects.create_user(f'bench-{int(time.time() * 1000)}', password=None)
+        try:
+            legacy = self.time_runs(legacy_create_habit, user, runs, duration)
+            bulk = self.time_runs(lambda u, n, d: create_habit(u, n, duration=d), user, runs, duration)
+        finally:
+            user.delete()
+
+        self.stdout.write(f'{runs} habits x {duration + 1} entries each')
+        self.stdout.write(f'  get_or_create loop: mean {legacy[0]:.2f} ms, median {legacy[1]:.2f} ms')
+        self.stdout.write(f'  create_habit:       mean {bulk[0]:.2f} ms, median {bulk[1]:.2f} ms')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {legacy[0] / bulk[0]:.1f}x'))
@@ -0,0 +1,88 @@
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from core import bitset
+from core.models import Habit, HabitEntry
+from core.streaks import compute_streaks
+
+
+def legacy_summary(habit):
+    # The HabitEntry walk reports() did per request, over one row per day
+    entries = habit.habitentry_set.order_by('date')
+    total_days = 0
+    completed_days = 0
+    streaks = []
+    temp_streak = 0
+    prev_date = None
+    for entry in entries:
+        total_days += 1
+        if prev_date and (entry.date - prev_date).days > 1:
+            if temp_streak > 0:
+                streaks.append(temp_streak)
+            temp_streak = 0
+        if entry.completed:
+            completed_days += 1
+            temp_streak += 1
+        elif temp_streak > 0:
+            streaks.append(temp_streak)
+            temp_streak = 0
+        prev_date = entry.date
+    if temp_streak > 0:
+        streaks.append(temp_streak)
+    return completed_days, total_days, max(streaks) if streaks else 0
+
+
+def packed_summary(habit):
+    stats = compute_streaks(bitset.decode(habit.history), habit.start_date, habit.total_days)
+    return stats['completed_days'], stats['total_days'], stats['longest_streak']
+
+
+def measure(func, habit, runs):
+    tracemalloc.start()
+    func(habit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    started = time.perf_counter()
+    for _ in range(runs):
+        result = func(habit)
+    return result, (time.perf_counter() - started) * 1000 / runs, peak
+
+
+class Command(BaseCommand):
+    help = 'Compare the per-entry HabitEntry streak loop with the packed Habit.history bitmap.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--completion', type=float, default=0.7)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        user = User.objects.create_user(f'bench-{int(time.time() * 1000)}', password=None)
+        try:
+            for label, days in (('1 year', 365), ('5 years', 5 * 365)):
+                start = date(2020, 1, 1)
+                habit = Habit.objects.create(user=user, name=label, start_date=start,
+                                             end_date=start + timedelta(days=days - 1))
+                completed = [rng.random() < options['completion'] for _ in range(days)]
+                HabitEntry.objects.bulk_create(
+                    HabitEntry(habit=habit, date=start + timedelta(days=i), completed=done)
+                    for i, done in enumerate(completed)
+                )
+                habit.history = bitset.encode(bitset.from_indexes(i for i, done in enumerate(completed) if done))
+
+                legacy, legacy_ms, legacy_peak = measure(legacy_summary, habit, options['runs'])
+                packed, packed_ms, packed_peak = measure(packed_summary, habit, options['runs'])
+                if legacy != packed:
+                    self.stderr.write(f'Mismatch for {label}: {legacy} != {packed}')
+
+                self.stdout.write(f'{label} ({days} days, {len(habit.history)} bytes packed)')
+                self.stdout.write(f'  HabitEntry loop: {legacy_ms:8.3f} ms  peak {legacy_peak / 1024:8.1f} KiB')
+                self.stdout.write(f'  bitmap:          {packed_ms:8.3f} ms  peak {packed_peak / 1024:8.1f} KiB')
+        finally:
+            user.delete()
@@ -0,0 +1,142 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.search import (
+    MARK_END, MARK_START, MIN_PREFIX, SQLITE_FTS_TABLE, SQLITE_SEARCH_SQL, SQLITE_TRIGGERS, fts_query,
+)
+
+NOTE_DDL = """
+CREATE TABLE core_note (
+    id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+    title varchar(100) NOT NULL,
+    heading varchar(200) NOT NULL,
+    content text NOT NULL,
+    created_at datetime NOT NULL,
+    user_id integer NOT NULL
+);
+CREATE INDEX note_user_created_idx ON core_note (user_id, created_at DESC, id DESC);
+"""
+
+# icontains over the three text columns, scoped to the user like the view would be
+LIKE_SQL = """
+    SELECT id FROM core_note
+    WHERE user_id = ? AND (title LIKE ? OR heading LIKE ? OR content LIKE ?)
+    ORDER BY created_at DESC, id DESC
+    LIMIT 25"""
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'te', 'su', 'no', 'vi', 'de', 'pa', 'zu', 'ho', 'ne', 'gi', 'ba']
+
+
+class Command(BaseCommand):
+    help = 'Time notes full-text search on a synthetic SQLite database against a LIKE scan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', metavar='PATH')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Zipf-ish vocabulary so there are both very common and rare words
+        vocabulary = sorted({''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(20000)})
+        rng.shuffle(vocabulary)
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+        cum_weights = [0.0] * len(weights)
+        total = 0.0
+        for i, weight in enumerate(weights):
+            total += weight
+            cum_weights[i] = total
+
+        def words(k):
+            return ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=k))
+
+        notes, users = options['notes'], options['users']
+
+        def rows():
+            for i in range(notes):
+                yield (words(3).capitalize(), words(6), words(40), f'2026-01-01 00:00:{i % 60:02d}', i % users + 1)
+
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        try:
+            db = sqlite3.connect(path)
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = NORMAL')
+            db.executescript(NOTE_DDL)
+            started = time.perf_counter()
+            db.executemany('INSERT INTO core_note (title, heading, content, created_at, user_id) '
+                           'VALUES (?, ?, ?, ?, ?)', rows())
+            db.execute(SQLITE_FTS_TABLE)
+            db.execute("INSERT INTO core_note_fts (core_note_fts) VALUES ('rebuild')")
+            for trigger in SQLITE_TRIGGERS.values():
+                db.execute(trigger)
+            db.commit()
+            self.stdout.write(f'Loaded and indexed {notes:,} notes for {users:,} users '
+                              f'in {time.perf_counter() - started:.1f}s')
+
+            # Search cost follows how many notes contain a term, so queries are picked by document frequency
+            db.execute('CREATE VIRTUAL TABLE temp.note_vocab USING fts5vocab(main, core_note_fts, row)')
+            vocab = db.execute("SELECT term, doc FROM note_vocab WHERE term NOT GLOB '[0-9]*' "
+                               'ORDER BY doc DESC').fetchall()
+
+            def term_in(share):
+                return min(vocab, key=lambda row: abs(row[1] - share * notes))[0]
+
+            queries = {
+                'rare word': [vocab[-1][0]],
+                'word in 1%': [term_in(0.01)],
+                'word in 10%': [term_in(0.1)],
+                'word in 30%': [term_in(0.3)],
+                'two words': [term_in(0.1), term_in(0.01)],
+                'prefix': [term_in(0.01)[:MIN_PREFIX]],
+            }
+            stopword = [vocab[0][0]]
+            search_sql = SQLITE_SEARCH_SQL.replace('%s', '?')
+            marks = [MARK_START, MARK_END] * 3
+
+            def measure(terms):
+                fts, like = [], []
+                for _ in range(options['repeat']):
+                    user_id = rng.randint(1, users)
+                    started = time.perf_counter()
+                    db.execute(search_sql, marks + [fts_query(user_id, terms), 25, 0]).fetchall()
+                    fts.append((time.perf_counter() - started) * 1000)
+                    pattern = f'%{terms[0]}%'
+                    started = time.perf_counter()
+                    db.execute(LIKE_SQL, (user_id, pattern, pattern, pattern)).fetchall()
+                    like.append((time.perf_counter() - started) * 1000)
+                return fts, like
+
+            self.stdout.write(f"{'query':<22} {'fts p50':>9} {'fts p95':>9} {'like p50':>9} {'like p95':>9}")
+            worst = 0.0
+            for label, terms in list(queries.items()) + [('stopword (in ~all)', stopword)]:
+                fts, like = measure(terms)
+                if terms is not stopword:
+                    worst = max(worst, percentile(fts, 95))
+                self.stdout.write(f'{label:<22} {statistics.median(fts):7.2f}ms {percentile(fts, 95):7.2f}ms '
+                                  f'{statistics.median(like):7.2f}ms {percentile(like, 95):7.2f}ms')
+            db.close()
+        finally:
+            if options['keep']:
+                db.close()
+                os.replace(path, options['keep'])
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+        verdict = 'under' if worst < 100 else 'OVER'
+        self.stdout.write(f'Slowest FTS p95: {worst:.2f}ms ({verdict} the 100ms budget). Stopword-frequency '
+                          'terms are outside the budget; search drops common English stopwords from queries.')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
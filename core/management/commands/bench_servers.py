@@ -0,0 +1,133 @@
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from itertools import cycle
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import Client
+from django.utils import timezone
+
+from core.models import Note, ToDo
+from core.services import create_habit
+
+DEFAULT_PATHS = ['/to-do/', '/to-do/page/', '/notes/', '/notes/page/', '/reports/']
+
+
+def client(port, host, cookie, paths, deadline, results):
+    # One keep-alive connection per simulated user, requesting the paths round-robin
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Host': host, 'Cookie': cookie}
+    for path in cycle(paths):
+        if time.perf_counter() >= deadline:
+            break
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            status = 0
+        results.append((path, time.perf_counter() - started, status))
+    conn.close()
+
+
+class Command(BaseCommand):
+    help = ('Load-test the WSGI (gunicorn sync workers) and ASGI (gunicorn + uvicorn workers) profiles '
+            'from gunicorn.conf.py with concurrent logged-in clients; reports p50/p99 latency and requests/s.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', default=['wsgi', 'asgi'], choices=['wsgi', 'asgi'])
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--seconds', type=float, default=10.0)
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+
+    def seed(self):
+        user, created = User.objects.get_or_create(username='loadtest', defaults={'email': 'loadtest@example.com'})
+        if created:
+            now = timezone.now()
+            Note.objects.bulk_create(Note(user=user, title=f'Note {i}', heading='Load test', content='Lorem ipsum ' * 20)
+                                     for i in range(200))
+            ToDo.objects.bulk_create(ToDo(user=user, task=f'Task {i}', deadline=now, reminder=now, reminder_sent_at=now)
+                                     for i in range(200))
+            for i in range(5):
+                create_habit(user, f'Habit {i}')
+        return user
+
+    def session_cookie(self, user):
+        # Logged in the way the test client does it, so it holds for any SESSION_ENGINE and auth backend
+        session = Client()
+        session.force_login(user, backend=settings.AUTHENTICATION_BACKENDS[0])
+        return f'{settings.SESSION_COOKIE_NAME}={session.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def start(self, profile, port, workers):
+        env = {**os.environ, 'SERVER_PROFILE': profile}
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+             '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        deadline = time.perf_counter() + 30
+        while time.perf_counter() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'The {profile} server exited with status {server.returncode}.')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'The {profile} server did not start listening on port {port}.')
+
+    def load(self, port, host, cookie, paths, concurrency, seconds):
+        results = []
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=client, args=(port, host, cookie, paths[i % len(paths):] + paths[:i % len(paths)],
+                                                         deadline, results))
+                   for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def handle(self, *args, **options):
+        if MigrationExecutor(connection).migration_plan(MigrationExecutor(connection).loader.graph.leaf_nodes()):
+            raise CommandError('Run migrate first; the servers use the configured database.')
+        user = self.seed()
+        cookie = self.session_cookie(user)
+        host = next((h for h in settings.ALLOWED_HOSTS if h not in ('*', '') and not h.startswith('.')), 'localhost')
+        paths, port = options['paths'], options['port']
+
+        self.stdout.write(f"{options['concurrency']} concurrent clients for {options['seconds']:g}s, "
+                          f"{options['workers']} workers, paths: {' '.join(paths)}")
+        self.stdout.write(f"{'profile':<8} {'requests':>9} {'req/s':>8} {'p50':>9} {'p99':>9} {'errors':>7}")
+        for profile in options['profiles']:
+            server = self.start(profile, port, options['workers'])
+            try:
+                self.load(port, host, cookie, paths, options['workers'], 1.0)  # Warm up imports and connections
+                results = self.load(port, host, cookie, paths, options['concurrency'], options['seconds'])
+            finally:
+                server.terminate()
+                server.wait()
+
+            latencies = sorted(elapsed * 1000 for _, elapsed, status in results if status == 200)
+            errors = sum(1 for _, _, status in results if status != 200)
+            if not latencies:
+                raise CommandError(f'Every {profile} request failed; is the database reachable from gunicorn?')
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(f'{profile:<8} {len(results):>9} {len(latencies) / options["seconds"]:>8.1f} '
+                              f'{statistics.median(latencies):>7.1f}ms {p99:>7.1f}ms {errors:>7}')
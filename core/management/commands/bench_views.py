@@ -0,0 +1,173 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from core import seeding, stamps
+from core.models import ToDo
+from core.tasks import send_reminder_email
+
+# Per-user sizes; every scale also benchmarks as the first of its users
+SCALES = {
+    'small': {'users': 5, 'habits': 5, 'history_days': 30, 'notes': 20, 'todos': 20},
+    'medium': {'users': 20, 'habits': 10, 'history_days': 365, 'notes': 200, 'todos': 200},
+    'large': {'users': 5, 'habits': 25, 'history_days': 1095, 'notes': 2000, 'todos': 2000},
+}
+VIEWS = {
+    'habits': '/habits/ongoing/',
+    'reports': '/reports/',
+    'notes': '/notes/',
+    'to_do': '/to-do/',
+}
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'views.json'
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def measure(run, prepare, repeat):
+    """Latency percentiles, query count and peak traced memory for one callable."""
+    prepare()
+    run()  # Warm up templates, imports and connections
+    prepare()
+    with CaptureQueriesContext(connection) as captured:
+        run()
+    queries = len(captured)
+    prepare()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings = []
+    for _ in range(repeat):
+        prepare()
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'queries': queries,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Seed each data scale in a rolled-back transaction, time the core views and the reminder email '
+            'task, and compare latency, query counts and peak memory with a JSON baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', default=list(SCALES), choices=list(SCALES))
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--save', action='store_true', help='Write these results as the new baseline.')
+        parser.add_argument('--threshold', type=float, default=25.0,
+                            help='Percent slower (p50) or more memory than the baseline that counts as a regression.')
+        parser.add_argument('--min-ms', type=float, default=2.0,
+                            help='Ignore p50 increases smaller than this, they are within timer noise.')
+
+    def bench_scale(self, scale, repeat):
+        results = {}
+        try:
+            with transaction.atomic():
+                user = seeding.seed(**SCALES[scale], due_reminders=1, prefix=f'bench-{scale}')[0]
+                if connection.vendor == 'sqlite':
+                    connection.cursor().execute('ANALYZE')
+                client = Client()
+                client.force_login(user)
+
+                for name, url in VIEWS.items():
+                    def run():
+                        response = client.get(url)
+                        if response.status_code != 200:
+                            raise CommandError(f'{url} returned {response.status_code}.')
+
+                    # The reports page is cached per user; time building it, not the cache hit. Bumped
+                    # right away: invalidate() waits for a commit this rolled-back transaction never makes
+                    prepare = (lambda: stamps.bump([user.pk], 'reports')) if name == 'reports' else (lambda: None)
+                    results[name] = measure(run, prepare, repeat)
+
+                # Claims and emails the due todo through the in-memory backend; unclaimed again before each call
+                due = ToDo.objects.filter(user=user, reminder_sent_at__isnull=True).order_by('reminder').first()
+                results['send_reminder_email'] = measure(
+                    lambda: send_reminder_email(due.pk),
+                    lambda: ToDo.objects.filter(pk=due.pk).update(reminder_sent_at=None),
+                    repeat,
+                )
+                raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def handle(self, *args, **options):
+        path = Path(options['baseline'])
+        run = {
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'machine': platform.machine(),
+            },
+            'repeat': options['repeat'],
+            'scales': {scale: SCALES[scale] for scale in options['scales']},
+            'results': {},
+        }
+        with override_settings(ALLOWED_HOSTS=['testserver'],
+                               EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            for scale in options['scales']:
+                started = time.perf_counter()
+                run['results'][scale] = results = self.bench_scale(scale, options['repeat'])
+                self.stdout.write(f'{scale} ({time.perf_counter() - started:.1f}s including seeding)')
+                self.stdout.write(f"  {'benchmark':<20} {'p50':>9} {'p95':>9} {'queries':>8} {'peak':>10}")
+                for name, result in results.items():
+                    self.stdout.write(f"  {name:<20} {result['p50_ms']:>7.2f}ms {result['p95_ms']:>7.2f}ms "
+                                      f"{result['queries']:>8} {result['peak_kib']:>7.0f}KiB")
+
+        if options['save'] or not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(run, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {path}.'))
+            return
+
+        baseline = json.loads(path.read_text())
+        if baseline.get('environment') != run['environment']:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline was recorded on {baseline.get('environment')}; timings may not be comparable."))
+        regressions = self.compare(baseline['results'], run['results'], options['threshold'] / 100,
+                                   options['min_ms'])
+        if regressions:
+            raise CommandError('Performance regressions against the baseline:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {path}.'))
+
+    def compare(self, baseline, current, threshold, min_ms):
+        regressions = []
+        for scale, results in current.items():
+            for name, result in results.items():
+                before = baseline.get(scale, {}).get(name)
+                if before is None:
+                    continue
+                label = f'{scale}/{name}'
+                if result['queries'] > before['queries']:
+                    regressions.append(f"{label}: {result['queries']} queries, baseline {before['queries']}")
+                if (result['p50_ms'] > before['p50_ms'] * (1 + threshold)
+                        and result['p50_ms'] - before['p50_ms'] >= min_ms):
+                    regressions.append(f"{label}: p50 {result['p50_ms']:.2f}ms, baseline {before['p50_ms']:.2f}ms")
+                if result['peak_kib'] > before['peak_kib'] * (1 + threshold) and result['peak_kib'] - before['peak_kib'] >= 64:
+                    regressions.append(f"{label}: peak memory {result['peak_kib']:.0f}KiB, "
+                                       f"baseline {before['peak_kib']:.0f}KiB")
+        return regressions
@@ -0,0 +1,16 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.tasks import complete_expired_habits
+
+
+class Command(BaseCommand):
+    help = 'Mark habits whose end date has passed as completed (celery beat runs this nightly).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--today', type=date.fromisoformat, help='Treat this date (YYYY-MM-DD) as today.')
+
+    def handle(self, *args, **options):
+        count = complete_expired_habits(options['today'] and options['today'].isoformat())
+        self.stdout.write(self.style.SUCCESS(f'Completed expired habits of {count} user{"" if count == 1 else "s"}.'))
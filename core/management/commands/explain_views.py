@@ -0,0 +1,110 @@
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from core import stamps
+from core.models import Note, ToDo
+from core.services import create_habit, toggle_entry
+from core.tasks import claim_due_reminders
+
+VIEW_URLS = [
+    '/habits/', '/habits/ongoing/', '/habits/completed/', '/habits/deleted/', '/habits/all/',
+    '/reports/', '/notes/', '/notes/page/', '/to-do/', '/to-do/page/',
+]
+FULL_SCAN = {
+    'sqlite': re.compile(r'^SCAN (core_\w+)(?! USING)'),
+    'postgresql': re.compile(r'Seq Scan on (core_\w+)'),
+}
+UNINDEXED_SORT = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'),
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[3] for row in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN {sql}')
+        return [row[0] for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway dataset, run every core view and the reminder sweep query, "
+            "and fail if EXPLAIN shows a full table scan on a core table or an unindexed sort.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+
+    def seed(self, users):
+        now = timezone.now()
+        for i in range(users):
+            user = User.objects.create_user(f'explain-{i}-{now.timestamp()}', password='explain-pass')
+            for h in range(6):
+                habit = create_habit(user, f'Habit {h}', start_date=now.date() - timedelta(days=20))
+                for d in range(0, 20, 3):
+                    toggle_entry(habit, habit.start_date + timedelta(days=d))
+                habit.is_completed, habit.is_deleted = h % 3 == 1, h % 3 == 2
+                habit.save()
+            Note.objects.bulk_create(Note(user=user, title=f'N{n}', heading='h', content='c') for n in range(20))
+            ToDo.objects.bulk_create(
+                ToDo(user=user, task=f'T{t}', deadline=now + timedelta(days=t), reminder=now + timedelta(days=t))
+                for t in range(20)
+            )
+        return user
+
+    def handle(self, *args, **options):
+        if connection.vendor not in FULL_SCAN:
+            raise CommandError(f'No EXPLAIN support for {connection.vendor}.')
+        pattern = FULL_SCAN[connection.vendor]
+        sort_pattern = UNINDEXED_SORT.get(connection.vendor)
+        problems = []
+        checked = 0
+        try:
+            with transaction.atomic():
+                user = self.seed(options['users'])
+                if connection.vendor == 'sqlite':
+                    connection.cursor().execute('ANALYZE')
+                else:
+                    connection.cursor().execute('SET LOCAL enable_seqscan = off')
+                stamps.bump([user.pk], 'reports')  # So /reports/ is built, not read from the cache
+
+                client = Client()
+                client.force_login(user)
+                captured = []
+                with override_settings(ALLOWED_HOSTS=['testserver']):
+                    for url in VIEW_URLS:
+                        with CaptureQueriesContext(connection) as queries:
+                            client.get(url)
+                        captured += [(url, q['sql']) for q in queries.captured_queries]
+                with CaptureQueriesContext(connection) as queries:
+                    claim_due_reminders(timezone.now(), 10)
+                captured += [('send_due_reminders', q['sql']) for q in queries.captured_queries]
+
+                for source, sql in captured:
+                    if not sql.lstrip().upper().startswith('SELECT'):
+                        continue
+                    checked += 1
+                    for line in explain(sql):
+                        match = pattern.search(line.strip())
+                        if match:
+                            problems.append(f'{source}: full scan of {match.group(1)}\n    {sql}\n    {line}')
+                        elif sort_pattern and sort_pattern.search(line) and 'core_' in sql:
+                            problems.append(f'{source}: sort without an index\n    {sql}\n    {line}')
+                raise Rollback
+        except Rollback:
+            pass
+
+        if problems:
+            raise CommandError('Query plan problems found:\n' + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS(f'{checked} SELECT queries checked, no full table scans or unindexed sorts.'))
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from core.export import RESOURCES, export_chunks, filename
+
+
+class Command(BaseCommand):
+    help = ("Stream users' habits, entries, notes and todos to CSV or JSON files "
+            "(<username>-streaks-<resource>.<format>[.gz]), or to stdout with --output -.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('users', nargs='*', help='User ids or usernames.')
+        parser.add_argument('--all-users', action='store_true')
+        parser.add_argument('--resource', default='all', choices=[*RESOURCES, 'all'],
+                            help="'all' writes one JSON document, or one CSV file per resource.")
+        parser.add_argument('--format', default='json', choices=['csv', 'json'])
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', default='.', help="Directory for the files, or - for stdout.")
+
+    def handle(self, *args, **options):
+        if options['all_users'] == bool(options['users']):
+            raise CommandError('Name some users or pass --all-users.')
+        users = User.objects.order_by('id')
+        if options['users']:
+            ids = [int(user) for user in options['users'] if user.isdigit()]
+            users = users.filter(Q(pk__in=ids) | Q(username__in=options['users']))
+            if not users.exists():
+                raise CommandError('No such users.')
+
+        fmt, gzip = options['format'], options['gzip']
+        resources = list(RESOURCES) if options['resource'] == 'all' and fmt == 'csv' else [options['resource']]
+        if options['output'] == '-':
+            for user in users:
+                for resource in resources:
+                    for chunk in export_chunks(user, resource, fmt, gzip):
+                        sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        directory = Path(options['output'])
+        directory.mkdir(parents=True, exist_ok=True)
+        written = 0
+        for user in users:
+            for resource in resources:
+                path = directory / f'{user.username}-{filename(resource, fmt, gzip)}'
+                with open(path, 'wb') as file:
+                    for chunk in export_chunks(user, resource, fmt, gzip):
+                        file.write(chunk)
+                written += 1
+                self.stdout.write(f'{path} ({path.stat().st_size:,} bytes)')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} export file{"" if written == 1 else "s"}.'))
@@ -0,0 +1,61 @@
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core import importer
+from core.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = ("Import habit histories from another tracker: a CSV with habit, date and optionally completed "
+            "columns, or JSON objects with those keys. Habits are matched by name and created when missing.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='User id or username.')
+        parser.add_argument('path', help='CSV or JSON file, or - for stdin.')
+        parser.add_argument('--format', choices=importer.FORMATS, help='Default: from the file extension.')
+        parser.add_argument('--resume', type=int, metavar='JOB', help='Continue an interrupted import of the same file.')
+        parser.add_argument('--batch-size', type=int, default=importer.BATCH_SIZE, help='Rows per transaction.')
+
+    def handle(self, *args, **options):
+        lookup = {'pk': int(options['user'])} if options['user'].isdigit() else {'username': options['user']}
+        user = User.objects.filter(**lookup).first()
+        if user is None:
+            raise CommandError('No such user.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        path = options['path']
+        try:
+            if options['resume']:
+                job = ImportJob.objects.filter(pk=options['resume'], user=user).first()
+                if job is None:
+                    raise CommandError(f"No import {options['resume']} for {user.username}.")
+            else:
+                fmt = options['format'] or importer.guess_format(path)
+                job = importer.start_import(user, fmt, 'stdin' if path == '-' else path)
+        except ValueError as e:
+            raise CommandError(f'{e} Pass --format.')
+
+        started = time.perf_counter()
+        done = job.rows_done
+        try:
+            if path == '-':
+                importer.run_import(job, sys.stdin.buffer, options['batch_size'])
+            else:
+                with open(path, 'rb') as file:
+                    importer.run_import(job, file, options['batch_size'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f'{e} Rows up to {job.rows_done} are imported; fix the file and rerun with '
+                               f'--resume {job.pk}.')
+        elapsed = time.perf_counter() - started
+
+        for error in job.errors:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        rows = job.rows_done - done
+        self.stdout.write(self.style.SUCCESS(
+            f'Import {job.pk}: {rows:,} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s), '
+            f'{job.entries_written:,} days written, {job.habits_created} habits created, {job.error_count} rows skipped.'
+        ))
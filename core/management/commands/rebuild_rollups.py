@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.tasks import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily and weekly report rollups from habit histories (celery beat runs this nightly).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='Only rebuild this user id (repeatable).')
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups(options['user'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {count} user{"" if count == 1 else "s"}.'))
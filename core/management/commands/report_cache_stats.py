@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core import report_cache
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters for the per-user reports cache (shared across processes only with Redis).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Clear the counters after printing them.')
+
+    def handle(self, *args, **options):
+        stats = report_cache.stats()
+        self.stdout.write(f"hits: {stats['hits']}  misses: {stats['misses']}  hit rate: {stats['hit_rate']}%")
+        if options['reset']:
+            report_cache.reset_stats()
@@ -0,0 +1,73 @@
+import os
+import random
+import sqlite3
+import tempfile
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+# Mirrors core_habitentry as created by the migrations on SQLite
+HABITENTRY_DDL = """
+CREATE TABLE core_habitentry (
+    id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+    date date NOT NULL,
+    completed bool NOT NULL,
+    habit_id bigint NOT NULL
+);
+CREATE UNIQUE INDEX core_habitentry_habit_id_date_uniq ON core_habitentry (habit_id, date);
+CREATE INDEX core_habitentry_habit_id ON core_habitentry (habit_id);
+"""
+
+
+def table_bytes(db):
+    page_size = db.execute('PRAGMA page_size').fetchone()[0]
+    page_count = db.execute('PRAGMA page_count').fetchone()[0]
+    return page_size * page_count
+
+
+class Command(BaseCommand):
+    help = 'Estimate HabitEntry table size for dense (one row per day) vs sparse (completed days only) storage.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--habits-per-user', type=int, default=3)
+        parser.add_argument('--days', type=int, default=31)
+        parser.add_argument('--completion', type=float, default=0.4, help='Fraction of days checked off.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        habits = options['users'] * options['habits_per_user']
+        start = date(2024, 1, 1)
+        dates = [(start + timedelta(days=i)).isoformat() for i in range(options['days'])]
+
+        def rows():
+            for habit_id in range(1, habits + 1):
+                for day in dates:
+                    yield day, rng.random() < options['completion'], habit_id
+
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        try:
+            db = sqlite3.connect(path)
+            db.executescript(HABITENTRY_DDL)
+            db.executemany('INSERT INTO core_habitentry (date, completed, habit_id) VALUES (?, ?, ?)', rows())
+            db.commit()
+            db.execute('VACUUM')
+            dense_rows = db.execute('SELECT COUNT(*) FROM core_habitentry').fetchone()[0]
+            dense_bytes = table_bytes(db)
+
+            db.execute('DELETE FROM core_habitentry WHERE completed = 0')
+            db.commit()
+            db.execute('VACUUM')
+            sparse_rows = db.execute('SELECT COUNT(*) FROM core_habitentry').fetchone()[0]
+            sparse_bytes = table_bytes(db)
+            db.close()
+        finally:
+            os.remove(path)
+
+        self.stdout.write(f"{options['users']} users, {habits} habits, {options['days']} days, "
+                          f"{options['completion']:.0%} of days completed")
+        self.stdout.write(f'  dense:  {dense_rows:>10} rows {dense_bytes / 1024 / 1024:>8.1f} MiB')
+        self.stdout.write(f'  sparse: {sparse_rows:>10} rows {sparse_bytes / 1024 / 1024:>8.1f} MiB')
+        self.stdout.write(self.style.SUCCESS(f'Reduction: {1 - sparse_bytes / dense_bytes:.1%} of the table and indexes'))
@@ -0,0 +1,159 @@
+# core/metrics.py
+# In-process request metrics, filled by core.middleware.PerformanceMiddleware and exported in the
+# Prometheus text format at /metrics. Histograms use fixed buckets, so memory stays bounded however
+# many requests are observed; Prometheus turns the cumulative counts into rolling windows with rate().
+# Every gunicorn worker keeps its own numbers; scrape each worker, or aggregate by instance.
+import contextvars
+import hmac
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (512, 2_048, 8_192, 32_768, 131_072, 524_288, 2_097_152)  # Bytes
+
+_lock = threading.Lock()
+_current = contextvars.ContextVar('core_request_sample', default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # labels -> [count per bucket..., count above the last bucket, sum]
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                yield f'{self.name}_bucket{{{_labels(labels, le=bound)}}} {cumulative}'
+            yield f'{self.name}_sum{{{_labels(labels)}}} {series[-1]}'
+            yield f'{self.name}_count{{{_labels(labels)}}} {cumulative}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.series = {}
+
+    def inc(self, labels):
+        self.series[labels] = self.series.get(labels, 0) + 1
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in sorted(self.series.items()):
+            yield f'{self.name}{{{_labels(labels)}}} {value}'
+
+
+REQUESTS = Counter('core_requests_total', 'Requests by view, method and status.')
+DURATION = Histogram('core_request_duration_seconds', 'Wall time per request.', DURATION_BUCKETS)
+QUERIES = Histogram('core_request_db_queries', 'Database queries per request.', QUERY_BUCKETS)
+DB_DURATION = Histogram('core_request_db_duration_seconds', 'Time spent in database queries per request.',
+                        DURATION_BUCKETS)
+RESPONSE_SIZE = Histogram('core_response_size_bytes', 'Response body size (streaming responses excluded).',
+                          SIZE_BUCKETS)
+METRICS = (REQUESTS, DURATION, QUERIES, DB_DURATION, RESPONSE_SIZE)
+
+
+def _labels(values, le=None):
+    # values is (view,) for histograms and (view, method, status) for the request counter
+    names = ('view', 'method', 'status')
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return ','.join(pairs)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestSample:
+    __slots__ = ('started', 'queries', 'db_time', 'sql', 'lock')
+
+    def __init__(self, keep_sql):
+        self.lock = threading.Lock()  # Async views may run queries for one request in several threads
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.sql = [] if keep_sql else None
+
+
+def start(keep_sql=False):
+    sample = RequestSample(keep_sql)
+    return sample, _current.set(sample)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper (installed by core.signals) counting queries for the current request.
+
+    The sample lives in a context variable, so queries that async views run through
+    sync_to_async in another thread are still counted against their request.
+    """
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        with sample.lock:
+            sample.queries += 1
+            sample.db_time += elapsed
+            if sample.sql is not None:
+                sample.sql.append(sql)
+
+
+def observe(view, method, status, sample, duration, size):
+    labels = (view,)
+    with _lock:
+        REQUESTS.inc((view, method, status))
+        DURATION.observe(labels, duration)
+        QUERIES.observe(labels, sample.queries)
+        DB_DURATION.observe(labels, sample.db_time)
+        if size is not None:
+            RESPONSE_SIZE.observe(labels, size)
+
+
+def render():
+    with _lock:
+        lines = [line for metric in METRICS for line in metric.render()]
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        for metric in METRICS:
+            metric.series.clear()
+
+
+def metrics_view(request):
+    # Not served at all without a token: per-view timings and URL names are not for everyone
+    token = getattr(settings, 'PERF_METRICS_TOKEN', '')
+    if not getattr(settings, 'PERF_METRICS_ENABLED', False) or not token:
+        raise Http404
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
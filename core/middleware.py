@@ -0,0 +1,61 @@
+# core/middleware.py
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+
+logger = logging.getLogger('core.performance')
+
+
+class PerformanceMiddleware:
+    """Record wall time, query count, database time and response size per view (see core.metrics).
+
+    With PERF_METRICS_ENABLED off it raises MiddlewareNotUsed, so Django leaves it out of the
+    request chain entirely. PERF_SLOW_REQUEST_MS > 0 also logs slower requests with their SQL.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, 'PERF_SLOW_REQUEST_MS', 0) / 1000
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        sample, token = metrics.start(keep_sql=self.slow_seconds > 0)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop(token)
+        self.record(request, response, sample)
+        return response
+
+    async def __acall__(self, request):
+        sample, token = metrics.start(keep_sql=self.slow_seconds > 0)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop(token)
+        self.record(request, response, sample)
+        return response
+
+    def record(self, request, response, sample):
+        duration = time.perf_counter() - sample.started
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        metrics.observe(view, request.method, response.status_code, sample, duration, size)
+        if self.slow_seconds and duration >= self.slow_seconds:
+            logger.warning('Slow request %s %s (%s): %.0f ms, %d queries, %.0f ms in the database\n%s',
+                           request.method, request.path, view, duration * 1000, sample.queries,
+                           sample.db_time * 1000, '\n'.join(sample.sql))
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.21 on 2026-10-18 17:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_remove_todo_is_completed_todo_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_days', models.PositiveIntegerField(default=0)),
+                ('total_days', models.PositiveIntegerField(default=0)),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('longest_streak', models.PositiveIntegerField(default=0)),
+                ('last_completed', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('habit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='core.habit')),
+            ],
+        ),
+    ]
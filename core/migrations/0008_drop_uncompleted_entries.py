@@ -0,0 +1,34 @@
+# Generated by Django 4.2.21 on 2026-10-18 17:53
+
+from datetime import timedelta
+
+from django.db import migrations
+
+
+def drop_uncompleted_entries(apps, schema_editor):
+    # Only completed days are stored from here on; missing days count as not completed
+    HabitEntry = apps.get_model('core', 'HabitEntry')
+    HabitEntry.objects.filter(completed=False).delete()
+
+
+def restore_uncompleted_entries(apps, schema_editor):
+    Habit = apps.get_model('core', 'Habit')
+    HabitEntry = apps.get_model('core', 'HabitEntry')
+    for habit in Habit.objects.iterator(chunk_size=500):
+        entries = []
+        current_date = habit.start_date
+        while current_date <= habit.end_date:
+            entries.append(HabitEntry(habit=habit, date=current_date, completed=False))
+            current_date += timedelta(days=1)
+        HabitEntry.objects.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_habitstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_uncompleted_entries, restore_uncompleted_entries),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.21 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+def pack_histories(apps, schema_editor):
+    Habit = apps.get_model('core', 'Habit')
+    HabitEntry = apps.get_model('core', 'HabitEntry')
+    for habit in Habit.objects.only('id', 'start_date', 'end_date').iterator(chunk_size=500):
+        bits = 0
+        dates = HabitEntry.objects.filter(
+            habit=habit, completed=True, date__range=(habit.start_date, habit.end_date),
+        ).values_list('date', flat=True)
+        for date in dates:
+            bits |= 1 << (date - habit.start_date).days
+        if bits:
+            Habit.objects.filter(pk=habit.pk).update(history=bits.to_bytes((bits.bit_length() + 7) // 8, 'little'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_drop_uncompleted_entries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='history',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(pack_histories, migrations.RunPython.noop),
+    ]
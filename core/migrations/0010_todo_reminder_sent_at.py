@@ -0,0 +1,31 @@
+# Generated by Django 4.2.21 on 2026-10-18 17:57
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def mark_past_reminders_sent(apps, schema_editor):
+    # Reminders that were already due went out through the old per-todo ETA tasks
+    ToDo = apps.get_model('core', 'ToDo')
+    ToDo.objects.filter(reminder__lte=timezone.now()).update(reminder_sent_at=F('reminder'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_habit_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('reminder_sent_at__isnull', True)), fields=['reminder'], name='todo_reminder_due_idx'),
+        ),
+        migrations.RunPython(mark_past_reminders_sent, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.21 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_todo_reminder_sent_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'is_deleted', 'is_completed'], name='habit_user_tab_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'is_completed'], name='habit_live_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', '-created_at'], name='note_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'deadline'], name='todo_user_deadline_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.21 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_query_shape_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='note',
+            name='note_user_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_user_deadline_idx',
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='note_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'deadline', 'id'], name='todo_user_deadline_idx'),
+        ),
+    ]
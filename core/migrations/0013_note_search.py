@@ -0,0 +1,24 @@
+# Generated by Django 4.2.21 on 2026-10-18 18:30
+
+from django.db import migrations
+
+
+def install_search(apps, schema_editor):
+    from core import search
+    search.install(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from core import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
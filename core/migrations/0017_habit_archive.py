@@ -0,0 +1,58 @@
+# Generated by Django 4.2.21 on 2026-10-18 20:03
+
+import core.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def start_deletion_clock(apps, schema_editor):
+    # When habits were deleted was not recorded; the archival horizon counts from now for them
+    Habit = apps.get_model('core', 'Habit')
+    Habit.objects.filter(is_deleted=True).update(deleted_at=django.utils.timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0016_import_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedHabit',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('created_at', models.DateTimeField()),
+                ('is_completed', models.BooleanField(default=False)),
+                ('deleted_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('history', models.BinaryField(default=b'')),
+            ],
+            bases=(core.models.HabitHistory, models.Model),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='habit_deleted_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedhabit',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedhabit',
+            index=models.Index(fields=['user', '-deleted_at'], name='archivedhabit_user_idx'),
+        ),
+        migrations.RunPython(start_deletion_clock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.21 on 2026-10-18 20:40
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+# auth_user belongs to django.contrib.auth, so the index is created here rather than declared on a model.
+# Empty emails (accounts made by the bench and explain commands) are left out of it.
+EMAIL_CONSTRAINT = models.UniqueConstraint(Lower('email'), name='auth_user_email_lower_uniq',
+                                           condition=~models.Q(email=''))
+
+
+def add_email_index(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    duplicates = list(User.objects.exclude(email='').values(email_lower=Lower('email'))
+                      .annotate(count=models.Count('id')).filter(count__gt=1).values_list('email_lower', flat=True)[:20])
+    if duplicates:
+        raise RuntimeError('Several accounts share these emails, give each a different one before migrating: '
+                           + ', '.join(duplicates))
+    schema_editor.add_constraint(User, EMAIL_CONSTRAINT)
+
+
+def remove_email_index(apps, schema_editor):
+    schema_editor.remove_constraint(apps.get_model('auth', 'User'), EMAIL_CONSTRAINT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0017_habit_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_email_index, remove_email_index),
+    ]
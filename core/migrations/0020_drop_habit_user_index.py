@@ -0,0 +1,21 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0019_stamps'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='habit',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
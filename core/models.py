@@ -8,33 +8,188 @@ class Note(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='note_user_created_idx'),  # notes(), newest first
+        ]
+
     def __str__(self):
         return f"{self.title} by {self.user.username} on {self.created_at.strftime('%Y-%m-%d %H:%M')}"
 
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
-class Habit(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+from . import bitset
+
+class HabitQuerySet(models.QuerySet):
+    def for_tab(self, user, tab):
+        if tab == 'ongoing':
+            return self.filter(user=user, is_deleted=False, is_completed=False)
+        if tab == 'completed':
+            return self.filter(user=user, is_deleted=False, is_completed=True)
+        if tab == 'deleted':
+            return self.filter(user=user, is_deleted=True)
+        return self.filter(user=user)
+
+class HabitHistory:
+    # Day helpers shared by Habit and ArchivedHabit, read from start_date, end_date and history
+
+    @property
+    def total_days(self):
+        return (self.end_date - self.start_date).days + 1
+
+    @property
+    def completed_days(self):
+        return bitset.count(bitset.decode(self.history))
+
+    def days(self):
+        # (date, completed) for every day of the habit, decoded from the packed history
+        bits = bitset.decode(self.history)
+        for index in range(self.total_days):
+            yield self.start_date + timedelta(days=index), bitset.is_set(bits, index)
+
+class Habit(HabitHistory, models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)  # Led by habit_user_tab_idx
     name = models.CharField(max_length=100)
     start_date = models.DateField(default=timezone.now)
     end_date = models.DateField()
     created_at = models.DateTimeField(default=timezone.now)
     is_completed = models.BooleanField(default=False)  # New: Tracks if habit is completed
     is_deleted = models.BooleanField(default=False)    # New: Tracks if habit is deleted
+    deleted_at = models.DateTimeField(null=True, blank=True)  # When is_deleted was set; core.archive moves it out later
+    history = models.BinaryField(default=b'', editable=False)  # One bit per day from start_date, see core.bitset
+
+    objects = HabitQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # habits() tabs and reports() filter on (user, is_deleted, is_completed)
+            models.Index(fields=['user', 'is_deleted', 'is_completed'], name='habit_user_tab_idx'),
+            models.Index(fields=['user', 'is_completed'], name='habit_live_user_idx',
+                         condition=models.Q(is_deleted=False)),
+            # The archival sweep: deleted habits by how long ago
+            models.Index(fields=['deleted_at'], name='habit_deleted_at_idx', condition=models.Q(is_deleted=True)),
+        ]
 
     def __str__(self):
         return self.name
 
 class HabitEntry(models.Model):
-    habit = models.ForeignKey(Habit, on_delete=models.CASCADE)
+    # Sparse: a row exists only for completed days, missing days count as not completed
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, db_index=False)  # Led by the unique (habit, date) index
     date = models.DateField()
     completed = models.BooleanField(default=False)
 
     class Meta:
         unique_together = ('habit', 'date')
 
+class HabitStats(models.Model):
+    # Persisted streak summary, kept in sync by core.streaks on every toggle
+    habit = models.OneToOneField(Habit, on_delete=models.CASCADE, related_name='stats')
+    completed_days = models.PositiveIntegerField(default=0)
+    total_days = models.PositiveIntegerField(default=0)
+    current_streak = models.PositiveIntegerField(default=0)  # Run ending at last_completed
+    longest_streak = models.PositiveIntegerField(default=0)
+    last_completed = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def completion_rate(self):
+        return (self.completed_days / self.total_days * 100) if self.total_days > 0 else 0
+
+    def __str__(self):
+        return f"Stats for {self.habit.name}"
+
+class DailyRollup(models.Model):
+    # Per user and day: live habits covering the day and how many were completed, see core.rollups
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    habits_active = models.PositiveIntegerField(default=0)
+    days_completed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'date')
+
+class WeeklyHabitRollup(models.Model):
+    # Per habit and week (starting Monday): days the habit ran and days completed, see core.rollups
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE)
+    week_start = models.DateField()
+    days_active = models.PositiveSmallIntegerField(default=0)
+    days_completed = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('habit', 'week_start')
+
+class Achievement(models.Model):
+    # A milestone from core.achievements that the user has reached, and when
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=50)
+    earned_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('user', 'key')
+        indexes = [
+            models.Index(fields=['user', 'earned_at'], name='achievement_user_earned_idx'),  # reports(), oldest first
+        ]
+
+    def __str__(self):
+        return f"{self.key} for {self.user.username}"
+
+class ArchivedHabit(HabitHistory, models.Model):
+    # A habit deleted longer than HABIT_ARCHIVE_AFTER_DAYS ago, moved out of the hot tables by core.archive.
+    # It keeps the Habit's id; its entries are the set bits of history and become rows again on restore.
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    name = models.CharField(max_length=100)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    created_at = models.DateTimeField()
+    is_completed = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+    history = models.BinaryField(default=b'', editable=False)
+
+    is_deleted = True  # Shown alongside deleted habits
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-deleted_at'], name='archivedhabit_user_idx'),  # The deleted tab, newest first
+        ]
+
+    def __str__(self):
+        return f"{self.name} (archived)"
+
+class Stamp(models.Model):
+    # Version of one user's resource (habits, notes, ...) for ETags and cache keys, see core.stamps.
+    # In the database so every web and worker process sees the same version.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)  # Led by the unique index
+    resource = models.CharField(max_length=20)
+    version = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ('user', 'resource')
+
+class ImportJob(models.Model):
+    # One history import (core.importer); rows_done advances with every committed batch, so a rerun
+    # of the same file with this job resumes after the last batch instead of starting over
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    source = models.CharField(max_length=255)
+    format = models.CharField(max_length=10, choices=[('csv', 'CSV'), ('json', 'JSON')])
+    status = models.CharField(max_length=20, choices=[('running', 'Running'), ('done', 'Done')], default='running')
+    rows_done = models.PositiveIntegerField(default=0)  # Input rows processed, valid or not
+    entries_written = models.PositiveIntegerField(default=0)
+    habits_created = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # The first few, as {"row": n, "error": "..."}
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Import of {self.source} for {self.user.username} ({self.status})"
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -45,6 +200,15 @@ class ToDo(models.Model):
     reminder = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=[('pending', 'Pending'), ('completed', 'Completed')], default='pending')
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)  # Set when the reminder sweeper claims the todo
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deadline', 'id'], name='todo_user_deadline_idx'),  # to_do(), soonest first
+            # Due reminders: WHERE reminder_sent_at IS NULL AND reminder <= now
+            models.Index(fields=['reminder'], name='todo_reminder_due_idx',
+                         condition=models.Q(reminder_sent_at__isnull=True)),
+        ]
 
     def __str__(self):
         return f"{self.task} (Due: {self.deadline.strftime('%Y-%m-%d %H:%M')})"
@@ -0,0 +1,85 @@
+# core/pagination.py
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 24
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('Malformed cursor.') from e
+    if not isinstance(values, list):
+        raise InvalidCursor('Malformed cursor.')
+    return values
+
+
+def _after(model, ordering, values):
+    # (a, b) > (x, y) spelled out as a > x OR (a = x AND b > y), flipped for descending fields
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        value = model._meta.get_field(name).to_python(value)
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=PAGE_SIZE):
+    """Return (items, next_cursor) for the page after `cursor`.
+
+    `ordering` must end in a unique field (normally the id) so every row has a distinct
+    position; the cost of a page is the same however deep the cursor is.
+    """
+    queryset = _page_queryset(queryset, ordering, cursor)
+    return _split(list(queryset[:page_size + 1]), ordering, page_size)
+
+
+async def akeyset_page(queryset, ordering, cursor=None, page_size=PAGE_SIZE):
+    """keyset_page for async views."""
+    queryset = _page_queryset(queryset, ordering, cursor)
+    return _split([item async for item in queryset[:page_size + 1]], ordering, page_size)
+
+
+def _page_queryset(queryset, ordering, cursor):
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(ordering):
+            raise InvalidCursor('Cursor does not match this listing.')
+        try:
+            queryset = queryset.filter(_after(queryset.model, ordering, values))
+        except (ValidationError, TypeError, ValueError) as e:  # Tampered values that to_python rejects
+            raise InvalidCursor('Malformed cursor.') from e
+    return queryset
+
+
+def _split(items, ordering, page_size):
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor([
+            _serialize(getattr(last, field.lstrip('-'))) for field in ordering
+        ])
+    return items, next_cursor
+
+
+def _serialize(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
@@ -0,0 +1,86 @@
+# core/report_cache.py
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from . import stamps
+
+HITS_KEY = 'reports:hits'
+MISSES_KEY = 'reports:misses'
+
+
+def _cache():
+    return caches[getattr(settings, 'REPORT_CACHE_ALIAS', 'default')]
+
+
+def report_key(user_id, version):
+    return f'reports:context:{user_id}:{version}'
+
+
+def _count(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:  # Counter not created yet, or evicted
+        cache.set(key, 1, timeout=None)
+
+
+def _version(user_id):
+    # Keyed by the user's 'reports' stamp, which lives in the database: an invalidation made in any
+    # process (another web worker, a celery task) moves every process on to a new key
+    return stamps.get_stamp(user_id, 'reports')
+
+
+def _build(user, build, key):
+    _count(MISSES_KEY)
+    context = build(user)
+    _cache().set(key, context, timeout=getattr(settings, 'REPORT_CACHE_TIMEOUT', 60 * 60))
+    return context
+
+
+def get_report_context(user, build):
+    """Return the cached reports() context for a user, building it with build(user) on a miss."""
+    key = report_key(user.pk, _version(user.pk))
+    context = _cache().get(key)
+    if context is not None:
+        _count(HITS_KEY)
+        return context
+    return _build(user, build, key)
+
+
+async def aget_report_context(user, build):
+    """get_report_context for async views; a miss is built in one worker thread, not query by query."""
+    key = report_key(user.pk, await sync_to_async(_version)(user.pk))
+    context = await _cache().aget(key)
+    if context is not None:
+        await sync_to_async(_count)(HITS_KEY)
+        return context
+    return await sync_to_async(_build)(user, build, key)
+
+
+def invalidate(user_id):
+    invalidate_many([user_id])
+
+
+def invalidate_many(user_ids):
+    """Move the users on to new report keys once the current transaction commits.
+
+    Until the commit other requests still read the old rows, so a report one of them caches in
+    between is left under the old key. The old entries expire after REPORT_CACHE_TIMEOUT.
+    """
+    stamps.touch_many(user_ids, 'reports')
+
+
+def stats():
+    values = _cache().get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = values.get(HITS_KEY, 0), values.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups * 100, 1) if lookups else 0,
+    }
+
+
+def reset_stats():
+    _cache().delete_many([HITS_KEY, MISSES_KEY])
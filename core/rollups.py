@@ -0,0 +1,157 @@
+# core/rollups.py
+# Precomputed report aggregates. DailyRollup counts, per user and day, the live (not deleted) habits
+# covering the day and how many of them were completed; WeeklyHabitRollup does the same per habit and
+# week. A toggle adjusts the one row of each it falls in; habit changes and the nightly rebuild_rollups
+# task recompute rows from the packed histories. Reports read a fixed window of these rows, so their
+# cost does not grow with the length of a user's history.
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import bitset
+from .models import DailyRollup, Habit, WeeklyHabitRollup
+
+TREND_DAYS = 30
+TREND_WEEKS = 12
+BATCH_SIZE = 2000
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def habit_days(habit, start=None, end=None):
+    """(day, completed) for the days of `habit` that fall within [start, end]."""
+    bits = bitset.decode(habit.history)
+    first = max(habit.start_date, start or habit.start_date)
+    last = min(habit.end_date, end or habit.end_date)
+    for index in range((first - habit.start_date).days, (last - habit.start_date).days + 1):
+        yield habit.start_date + timedelta(days=index), bitset.is_set(bits, index)
+
+
+def _in_range(queryset, field, start, end):
+    if start:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{field}__lte': end})
+    return queryset
+
+
+def rebuild_daily(user_id, start=None, end=None):
+    """Recompute a user's DailyRollup rows between start and end (every day when not given)."""
+    habits = Habit.objects.filter(user_id=user_id, is_deleted=False).only('start_date', 'end_date', 'history')
+    if start:
+        habits = habits.filter(end_date__gte=start)
+    if end:
+        habits = habits.filter(start_date__lte=end)
+    active, completed = Counter(), Counter()
+    for habit in habits:
+        for day, done in habit_days(habit, start, end):
+            active[day] += 1
+            completed[day] += done
+    with transaction.atomic(savepoint=False):
+        _in_range(DailyRollup.objects.filter(user_id=user_id), 'date', start, end).delete()
+        DailyRollup.objects.bulk_create(
+            [DailyRollup(user_id=user_id, date=day, habits_active=count, days_completed=completed[day])
+             for day, count in active.items()],
+            batch_size=BATCH_SIZE,
+        )
+
+
+def weekly_rows(habit, start=None, end=None):
+    # One row per week, counting the completed days as the set bits in that week's slice of the history
+    bits = bitset.decode(habit.history)
+    first = max(habit.start_date, start or habit.start_date)
+    last = min(habit.end_date, end or habit.end_date)
+    rows = []
+    week = week_start(first)
+    while first <= last and week <= last:
+        offset = (max(first, week) - habit.start_date).days
+        days = (min(last, week + timedelta(days=6)) - habit.start_date).days + 1 - offset
+        rows.append(WeeklyHabitRollup(habit_id=habit.pk, week_start=week, days_active=days,
+                                      days_completed=bitset.count((bits >> offset) & ((1 << days) - 1))))
+        week += timedelta(days=7)
+    return rows
+
+
+def rebuild_weekly(habits, start=None, end=None):
+    """Recompute the WeeklyHabitRollup rows of `habits` for the weeks touching [start, end] (all when not given)."""
+    start = start and week_start(start)
+    end = end and week_start(end)
+    rows, habit_ids = [], []
+    for habit in habits:
+        rows += weekly_rows(habit, start, end and end + timedelta(days=6))
+        habit_ids.append(habit.pk)
+    if not habit_ids:
+        return
+    with transaction.atomic(savepoint=False):
+        _in_range(WeeklyHabitRollup.objects.filter(habit__in=habit_ids), 'week_start', start, end).delete()
+        WeeklyHabitRollup.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def rebuild_habit(habit, created=False):
+    # After a habit is created or saved, e.g. soft-deleted or restored
+    with transaction.atomic(savepoint=False):
+        rebuild_daily(habit.user_id, habit.start_date, habit.end_date)
+        if created:
+            WeeklyHabitRollup.objects.bulk_create(weekly_rows(habit))  # Nothing to replace yet
+        else:
+            rebuild_weekly([habit])
+
+
+def rebuild_user(user_id):
+    with transaction.atomic(savepoint=False):
+        rebuild_daily(user_id)
+        rebuild_weekly(Habit.objects.filter(user_id=user_id).only('start_date', 'end_date', 'history'))
+
+
+def record_toggle(habit, day, completed):
+    """Move the rows `day` falls in by one completed day; a missing row is rebuilt instead."""
+    delta = 1 if completed else -1
+    week = week_start(day)
+    # A decrement that would go below zero means the row has drifted, so it is rebuilt as well
+    floor = {} if completed else {'days_completed__gte': 1}
+    if not habit.is_deleted:
+        if not (DailyRollup.objects.filter(user_id=habit.user_id, date=day, **floor)
+                .update(days_completed=F('days_completed') + delta)):
+            rebuild_daily(habit.user_id, day, day)
+    if not (WeeklyHabitRollup.objects.filter(habit=habit, week_start=week, **floor)
+            .update(days_completed=F('days_completed') + delta)):
+        rebuild_weekly([habit], day, day)
+
+
+def rate(completed, active):
+    return round(completed / active * 100, 1) if active else None
+
+
+def daily_trend(user, today=None, days=TREND_DAYS):
+    """Completion rate per day over the last `days` days; None where no habit was running."""
+    today = today or timezone.now().date()
+    first = today - timedelta(days=days - 1)
+    rows = {row.date: row for row in DailyRollup.objects.filter(user=user, date__range=(first, today))}
+    trend = []
+    for index in range(days):
+        day = first + timedelta(days=index)
+        row = rows.get(day)
+        trend.append({'date': day.isoformat(), 'rate': rate(row.days_completed, row.habits_active) if row else None})
+    return trend
+
+
+def weekly_trends(habits, today=None, weeks=TREND_WEEKS):
+    """{'weeks': [...], 'habits': [{'name', 'rates'}]} over the last `weeks` weeks for the given habits."""
+    today = today or timezone.now().date()
+    starts = [week_start(today) - timedelta(weeks=weeks - 1 - index) for index in range(weeks)]
+    rows = {(row.habit_id, row.week_start): row for row in
+            WeeklyHabitRollup.objects.filter(habit__in=[habit.pk for habit in habits],
+                                             week_start__range=(starts[0], starts[-1]))}
+    series = []
+    for habit in habits:
+        week_rows = [rows.get((habit.pk, week)) for week in starts]
+        series.append({
+            'name': habit.name,
+            'rates': [rate(row.days_completed, row.days_active) if row else None for row in week_rows],
+        })
+    return {'weeks': [week.isoformat() for week in starts], 'habits': series}
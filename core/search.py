@@ -0,0 +1,175 @@
+# core/search.py
+# Full-text search over notes. SQLite uses an FTS5 index kept in sync by triggers on core_note,
+# PostgreSQL a GIN index over a weighted tsvector expression. Both rank title > heading > content.
+import re
+from html import escape
+
+from django.db import connection
+
+from .models import Note
+from .pagination import PAGE_SIZE
+
+MAX_TERMS = 8
+MIN_PREFIX = 3
+# A term's cost grows with the number of notes that contain it (across all users), and words
+# like these are in nearly every note while saying nothing about which one is wanted
+STOPWORDS = frozenset('''
+    a an and are as at be but by for from has have i in is it its my of on or that the this
+    to was were will with
+'''.split())
+SNIPPET_WORDS = 24
+# Private-use characters mark matches in the raw text, so it can be HTML-escaped before <mark> goes in
+MARK_START, MARK_END = '\ue000', '\ue001'
+
+SQLITE_TRIGGERS = {
+    'core_note_fts_ai': """
+        CREATE TRIGGER core_note_fts_ai AFTER INSERT ON core_note BEGIN
+            INSERT INTO core_note_fts (rowid, title, heading, content, user_id)
+            VALUES (new.id, new.title, new.heading, new.content, new.user_id);
+        END""",
+    'core_note_fts_ad': """
+        CREATE TRIGGER core_note_fts_ad AFTER DELETE ON core_note BEGIN
+            INSERT INTO core_note_fts (core_note_fts, rowid, title, heading, content, user_id)
+            VALUES ('delete', old.id, old.title, old.heading, old.content, old.user_id);
+        END""",
+    'core_note_fts_au': """
+        CREATE TRIGGER core_note_fts_au AFTER UPDATE OF title, heading, content, user_id ON core_note BEGIN
+            INSERT INTO core_note_fts (core_note_fts, rowid, title, heading, content, user_id)
+            VALUES ('delete', old.id, old.title, old.heading, old.content, old.user_id);
+            INSERT INTO core_note_fts (rowid, title, heading, content, user_id)
+            VALUES (new.id, new.title, new.heading, new.content, new.user_id);
+        END""",
+}
+
+# External-content index: the text lives only in core_note. user_id is indexed as a token so the
+# per-user filter is part of the MATCH instead of a post-filter over every user's hits.
+SQLITE_FTS_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS core_note_fts USING fts5(
+        title, heading, content, user_id,
+        content='core_note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )"""
+
+SQLITE_SEARCH_SQL = f"""
+    SELECT core_note.id, core_note.user_id, core_note.created_at,
+           highlight(core_note_fts, 0, %s, %s) AS title_match,
+           highlight(core_note_fts, 1, %s, %s) AS heading_match,
+           snippet(core_note_fts, 2, %s, %s, '…', {SNIPPET_WORDS}) AS snippet
+    FROM core_note_fts JOIN core_note ON core_note.id = core_note_fts.rowid
+    WHERE core_note_fts MATCH %s AND rank MATCH 'bm25(10.0, 5.0, 1.0, 0.0)'
+    ORDER BY rank
+    LIMIT %s OFFSET %s"""
+
+POSTGRES_VECTOR = ("setweight(to_tsvector('english', title), 'A') || "
+                   "setweight(to_tsvector('english', heading), 'B') || "
+                   "setweight(to_tsvector('english', content), 'C')")
+
+POSTGRES_INDEX = f'CREATE INDEX IF NOT EXISTS note_search_idx ON core_note USING GIN (({POSTGRES_VECTOR}))'
+
+# The WHERE clause repeats the indexed expression verbatim so the planner can use note_search_idx;
+# headlines are only built for the rows of the requested page
+POSTGRES_SEARCH_SQL = f"""
+    SELECT core_note.id, core_note.user_id, core_note.created_at,
+           ts_headline('english', core_note.title, page.query, %s) AS title_match,
+           ts_headline('english', core_note.heading, page.query, %s) AS heading_match,
+           ts_headline('english', core_note.content, page.query, %s) AS snippet
+    FROM (
+        SELECT id, query, ts_rank({POSTGRES_VECTOR}, query) AS rank
+        FROM core_note, websearch_to_tsquery('english', %s) query
+        WHERE user_id = %s AND {POSTGRES_VECTOR} @@ query
+        ORDER BY rank DESC, id DESC
+        LIMIT %s OFFSET %s
+    ) page JOIN core_note ON core_note.id = page.id
+    ORDER BY page.rank DESC, page.id DESC"""
+
+
+def install(connection):
+    """Create the search index for this backend if it is missing (idempotent)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRES_INDEX)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(SQLITE_FTS_TABLE)
+            missing = _missing_triggers(cursor)
+            for name in missing:
+                cursor.execute(SQLITE_TRIGGERS[name])
+            if missing:
+                cursor.execute("INSERT INTO core_note_fts (core_note_fts) VALUES ('rebuild')")
+
+
+def repair(connection):
+    """Recreate dropped SQLite triggers and reindex.
+
+    Django rebuilds a SQLite table to alter it, which silently drops the table's triggers.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if 'core_note_fts' in connection.introspection.table_names(cursor) and _missing_triggers(cursor):
+            install(connection)
+
+
+def _missing_triggers(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'core_note'")
+    existing = {name for name, in cursor.fetchall()}
+    return [name for name in SQLITE_TRIGGERS if name not in existing]
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS note_search_idx')
+        elif connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute('DROP TABLE IF EXISTS core_note_fts')
+
+
+def search_terms(text):
+    terms = re.findall(r'\w+', text.lower())
+    return ([term for term in terms if term not in STOPWORDS] or terms)[:MAX_TERMS]
+
+
+def fts_query(user_id, terms):
+    # Every term is quoted so FTS5 operators in user input are searched for literally;
+    # the last one is a prefix so results show up while the user is still typing
+    phrases = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= MIN_PREFIX:
+        phrases[-1] += '*'
+    return f'user_id : "{user_id}" AND {{title heading content}} : ({" AND ".join(phrases)})'
+
+
+def highlighted(text):
+    return escape(text or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def search_notes(user, text, page=1, page_size=PAGE_SIZE):
+    """Return (notes, has_next) for one page of `user`'s notes matching `text`, best match first.
+
+    Each note carries title_match, heading_match and snippet: HTML-escaped text with the
+    matched words wrapped in <mark>.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return [], False
+    offset = (page - 1) * page_size
+
+    if connection.vendor == 'postgresql':
+        title_options = f'HighlightAll=true, StartSel={MARK_START}, StopSel={MARK_END}'
+        snippet_options = f'MaxWords={SNIPPET_WORDS}, MinWords=8, StartSel={MARK_START}, StopSel={MARK_END}'
+        notes = Note.objects.raw(POSTGRES_SEARCH_SQL, [
+            title_options, title_options, snippet_options,
+            ' '.join(terms), user.pk, page_size + 1, offset,
+        ])
+    else:
+        notes = Note.objects.raw(SQLITE_SEARCH_SQL, [
+            MARK_START, MARK_END, MARK_START, MARK_END, MARK_START, MARK_END,
+            fts_query(user.pk, terms), page_size + 1, offset,
+        ])
+
+    notes = list(notes)
+    for note in notes:
+        note.title_match = highlighted(note.title_match)
+        note.heading_match = highlighted(note.heading_match)
+        note.snippet = highlighted(note.snippet)
+    return notes[:page_size], len(notes) > page_size
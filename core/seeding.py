@@ -0,0 +1,86 @@
+# core/seeding.py
+# Synthetic users with habits, notes and todos for load tests and benchmarks (the seed_data and
+# bench_views commands). Rows go in with bulk_create, so each user costs a handful of queries
+# however long the habit histories are.
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from . import bitset, rollups
+from .models import Habit, HabitEntry, HabitStats, Note, ToDo
+from .streaks import compute_streaks
+
+BATCH_SIZE = 2000
+WORDS = '''
+    morning run read write plan review stretch water journal call focus walk budget sleep code
+    meeting groceries gym study email garden clean cook practice draft notes weekly project idea
+'''.split()
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choices(WORDS, k=words))
+
+
+def seed(users=10, habits=5, history_days=90, notes=20, todos=20, completion=0.7, due_reminders=0,
+         prefix='seed', seed=0):
+    """Create `users` users, each with the given numbers of habits, notes and todos; returns the users.
+
+    Every habit spans the `history_days` days up to today, with each day completed with probability
+    `completion`. `due_reminders` of each user's todos have a reminder that is due and not sent yet.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    today = now.date()
+    start = today - timedelta(days=history_days - 1)
+    password = make_password(None)  # Unusable, shared so seeding does not hash once per user
+
+    created = User.objects.bulk_create(
+        [User(username=f'{prefix}-{i}', email=f'{prefix}-{i}@example.com', password=password) for i in range(users)],
+        batch_size=BATCH_SIZE,
+    )
+    for user in created:
+        completed_days = []
+        user_habits = []
+        for h in range(habits):
+            days = [day for day in range(history_days) if rng.random() < completion]
+            completed_days.append(days)
+            user_habits.append(Habit(
+                user=user, name=sentence(rng, 2).capitalize(), start_date=start, end_date=today,
+                is_completed=h % 5 == 3, is_deleted=h % 5 == 4, deleted_at=now if h % 5 == 4 else None,
+                history=bitset.encode(bitset.from_indexes(days)),
+            ))
+        Habit.objects.bulk_create(user_habits)
+        HabitEntry.objects.bulk_create(
+            (HabitEntry(habit=habit, date=start + timedelta(days=day), completed=True)
+             for habit, days in zip(user_habits, completed_days) for day in days),
+            batch_size=BATCH_SIZE,
+        )
+        HabitStats.objects.bulk_create(
+            HabitStats(habit=habit, **compute_streaks(bitset.decode(habit.history), start, habit.total_days))
+            for habit in user_habits
+        )
+        rollups.rebuild_daily(user.pk)  # bulk_create sends no signals
+        rollups.rebuild_weekly(user_habits)
+
+        Note.objects.bulk_create(
+            (Note(user=user, title=sentence(rng, 3).capitalize(), heading=sentence(rng, 6),
+                  content=sentence(rng, 40)) for _ in range(notes)),
+            batch_size=BATCH_SIZE,
+        )
+        user_todos = []
+        for t in range(todos):
+            deadline = now + timedelta(hours=rng.randint(-240, 720))
+            due = t < due_reminders
+            if due:
+                deadline = now - timedelta(hours=rng.randint(1, 48))
+            reminder = deadline - timedelta(hours=1)
+            user_todos.append(ToDo(
+                user=user, task=sentence(rng, 4).capitalize(), deadline=deadline, reminder=reminder,
+                status='completed' if not due and t % 4 == 0 else 'pending',
+                reminder_sent_at=None if due or reminder > now else reminder,
+            ))
+        ToDo.objects.bulk_create(user_todos, batch_size=BATCH_SIZE)
+    return created
@@ -0,0 +1,177 @@
+# core/services.py
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import achievements, bitset, report_cache, rollups, stamps
+from .models import Habit, HabitEntry, HabitStats
+from .streaks import compute_streaks, refresh_stats
+
+DEFAULT_HABIT_DURATION = 30  # Days after start_date, so 31 days including both ends
+MAX_HABIT_DURATION = 3650
+MAX_CHECKINS = 500  # Operations per apply_checkins call
+STATS_FIELDS = ['completed_days', 'total_days', 'current_streak', 'longest_streak', 'last_completed', 'updated_at']
+
+
+def create_habit(user, name, start_date=None, end_date=None, duration=DEFAULT_HABIT_DURATION):
+    """Create a habit and its stats row in a single transaction.
+
+    Pass either an explicit end_date or a duration (days, or a timedelta) after start_date.
+    """
+    start_date = start_date or timezone.now().date()
+    if end_date is None:
+        if not isinstance(duration, timedelta):
+            days = int(duration)
+            if not 0 <= days <= MAX_HABIT_DURATION:
+                raise ValueError(f'Duration must be between 0 and {MAX_HABIT_DURATION} days.')
+            duration = timedelta(days=days)
+        end_date = start_date + duration
+    if end_date < start_date:
+        raise ValueError('end_date must not be before start_date.')
+    if (end_date - start_date).days > MAX_HABIT_DURATION:
+        raise ValueError(f'Habits can span at most {MAX_HABIT_DURATION} days.')
+
+    with transaction.atomic():
+        habit = Habit.objects.create(user=user, name=name, start_date=start_date, end_date=end_date)
+        HabitStats.objects.create(habit=habit, total_days=habit.total_days)
+    return habit
+
+
+def toggle_entry(habit, day):
+    """Flip a day between completed and not completed; returns the new state.
+
+    Completed days are stored as a HabitEntry row and as a set bit in Habit.history,
+    other days have no row at all.
+    """
+    if not habit.start_date <= day <= habit.end_date:
+        raise ValueError(f'{day} is outside {habit.name}.')
+    index = (day - habit.start_date).days
+
+    with transaction.atomic():
+        locked = Habit.objects.select_for_update().only('history').get(pk=habit.pk)
+        bits = bitset.flip(bitset.decode(locked.history), index)
+        completed = bitset.is_set(bits, index)
+        if completed:
+            HabitEntry.objects.update_or_create(habit=habit, date=day, defaults={'completed': True})
+        else:
+            HabitEntry.objects.filter(habit=habit, date=day).delete()
+        habit.history = bitset.encode(bits)
+        Habit.objects.filter(pk=habit.pk).update(history=habit.history)
+        refresh_stats(habit)
+        rollups.record_toggle(habit, day, completed)
+        achievements.evaluate(habit.user_id, achievements.DAY_COUNTERS)
+    return completed
+
+
+def bulk_set(objs, fields):
+    """Write `fields` of saved model instances, like bulk_update(), as one UPDATE ... WHERE pk run with executemany().
+
+    bulk_update() builds a CASE WHEN per object and field, which takes longer to compile than to
+    run once hundreds of rows change together.
+    """
+    if not objs:
+        return
+    meta = objs[0]._meta
+    columns = [meta.get_field(name) for name in fields]
+    quote = connection.ops.quote_name
+    assignments = ', '.join(f'{quote(field.column)} = %s' for field in columns)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {quote(meta.db_table)} SET {assignments} WHERE {quote(meta.pk.column)} = %s',
+            [[field.get_db_prep_save(getattr(obj, field.attname), cursor.db) for field in columns] + [obj.pk]
+             for obj in objs],
+        )
+
+
+def bulk_delete(model, fields, rows):
+    """Delete the rows of `model` matching each tuple of `fields` values, as one DELETE run with executemany().
+
+    Like bulk_set(), the statement is compiled once however many rows go, and no delete signals are sent.
+    """
+    if not rows:
+        return
+    columns = [model._meta.get_field(name) for name in fields]
+    quote = connection.ops.quote_name
+    condition = ' AND '.join(f'{quote(field.column)} = %s' for field in columns)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {quote(model._meta.db_table)} WHERE {condition}',
+            [[field.get_db_prep_value(value, cursor.db) for field, value in zip(columns, row)] for row in rows],
+        )
+
+
+def save_stats(habits):
+    """Recompute the HabitStats of `habits` from their histories and write them in bulk.
+
+    Stats fetched with select_related('stats') are updated, any others are created.
+    """
+    now = timezone.now()
+    changed, missing = [], []
+    for habit in habits:
+        fields = compute_streaks(bitset.decode(habit.history), habit.start_date, habit.total_days)
+        stats = getattr(habit, 'stats', None) if Habit.stats.is_cached(habit) else None
+        if stats is None:  # New habits, or ones created before the summary existed
+            habit.stats = HabitStats(habit=habit, **fields)
+            missing.append(habit.stats)
+            continue
+        for name, value in fields.items():
+            setattr(stats, name, value)
+        stats.updated_at = now
+        changed.append(stats)
+    bulk_set(changed, STATS_FIELDS)
+    HabitStats.objects.bulk_create(missing)
+
+
+def apply_checkins(user, operations):
+    """Set many (habit_id, day, completed) operations at once; returns {habit_id: HabitStats}.
+
+    Everything is validated before anything is written, then applied in one transaction with a
+    fixed number of queries however many operations there are: the habits and their stats are
+    read in one query, entries are inserted and deleted in bulk, and the histories and stats
+    are written with one bulk_set each. Later operations on the same day win.
+    """
+    if len(operations) > MAX_CHECKINS:
+        raise ValueError(f'At most {MAX_CHECKINS} check-ins per request.')
+    wanted = {}
+    for habit_id, day, completed in operations:
+        wanted[habit_id, day] = bool(completed)
+
+    with transaction.atomic():
+        habits = {habit.pk: habit for habit in (
+            Habit.objects.select_for_update(of=('self',)).select_related('stats')
+            .filter(user=user, pk__in={habit_id for habit_id, _ in wanted})
+        )}
+        bits = {}
+        for (habit_id, day), completed in wanted.items():
+            habit = habits.get(habit_id)
+            if habit is None:
+                raise ValueError(f'No habit {habit_id}.')
+            if not habit.start_date <= day <= habit.end_date:
+                raise ValueError(f'{day} is outside {habit.name}.')
+            index = (day - habit.start_date).days
+            current = bits.setdefault(habit_id, bitset.decode(habit.history))
+            bits[habit_id] = current | (1 << index) if completed else current & ~(1 << index)
+
+        HabitEntry.objects.bulk_create(
+            [HabitEntry(habit_id=habit_id, date=day, completed=True)
+             for (habit_id, day), completed in wanted.items() if completed],
+            ignore_conflicts=True,
+        )
+        # No per-row post_delete signals: they would only repeat the invalidation below
+        bulk_delete(HabitEntry, ['habit', 'date'],
+                    [(habit_id, day) for (habit_id, day), completed in wanted.items() if not completed])
+
+        for habit_id, value in bits.items():
+            habits[habit_id].history = bitset.encode(value)
+        bulk_set([habits[habit_id] for habit_id in bits], ['history'])
+        save_stats([habits[habit_id] for habit_id in bits])
+        days = [day for _, day in wanted]
+        rollups.rebuild_daily(user.pk, min(days), max(days))
+        rollups.rebuild_weekly([habits[habit_id] for habit_id in bits], min(days), max(days))
+        achievements.evaluate(user.pk, achievements.DAY_COUNTERS)
+
+    # bulk writes send no signals, so do what core.signals would have done once
+    report_cache.invalidate(user.pk)
+    stamps.touch(user.pk, 'habits')
+    return {habit_id: habits[habit_id].stats for habit_id in bits}
@@ -0,0 +1,76 @@
+# core/signals.py
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from . import achievements, metrics, report_cache, rollups, search, stamps
+from .models import Habit, HabitEntry, HabitStats, Note, ToDo
+
+
+@receiver([post_save, post_delete], sender=Habit)
+def habit_changed(sender, instance, **kwargs):
+    report_cache.invalidate(instance.user_id)
+    stamps.touch(instance.user_id, 'habits')
+
+
+@receiver(post_save, sender=Habit)
+def habit_saved_rollups(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        rollups.rebuild_habit(instance, created)
+        if instance.is_completed:
+            achievements.evaluate(instance.user_id, {achievements.COMPLETED_HABITS})
+
+
+@receiver(post_delete, sender=Habit)
+def habit_deleted_rollups(sender, instance, origin=None, **kwargs):
+    # When the delete started from the user, their rollup rows are being deleted in the same cascade
+    if isinstance(origin, Habit) or getattr(origin, 'model', None) is Habit:
+        rollups.rebuild_daily(instance.user_id, instance.start_date, instance.end_date)
+
+
+@receiver([post_save, post_delete], sender=HabitEntry)
+@receiver([post_save, post_delete], sender=HabitStats)
+def habit_data_changed(sender, instance, **kwargs):
+    if sender._meta.get_field('habit').is_cached(instance):
+        user_id = instance.habit.user_id
+    else:
+        user_id = Habit.objects.filter(pk=instance.habit_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        report_cache.invalidate(user_id)
+        stamps.touch(user_id, 'habits')
+
+
+@receiver([post_save, post_delete], sender=Note)
+def note_changed(sender, instance, **kwargs):
+    stamps.touch(instance.user_id, 'notes')
+
+
+@receiver([post_save, post_delete], sender=ToDo)
+def todo_changed(sender, instance, **kwargs):
+    stamps.touch(instance.user_id, 'todos')
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    # WAL lets readers run alongside a writer; busy_timeout waits instead of raising "database is locked"
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+@receiver(connection_created)
+def instrument_queries(sender, connection, **kwargs):
+    # Queries are attributed to the current request by core.middleware.PerformanceMiddleware;
+    # connection_created fires again on reconnect, hence the membership check
+    if getattr(settings, 'PERF_METRICS_ENABLED', False) and metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.record_query)
+
+
+@receiver(post_migrate)
+def repair_note_search(sender, using, **kwargs):
+    if sender.name == 'core':
+        search.repair(connections[using])
@@ -0,0 +1,42 @@
+# core/stamps.py
+# Per-user version stamps behind the API's ETags, bumped by core.signals whenever a user's
+# habits, notes or todos change, and behind the report cache keys (core.report_cache). They
+# live in the Stamp table rather than the cache, so a write made in one process (another web
+# worker, a celery task) is seen by all of them, and reading one is a single indexed lookup,
+# so a conditional GET can be answered with a 304 before any habit, note or todo is queried.
+import time
+
+from django.db import transaction
+
+from .models import Stamp
+
+RESOURCES = ('habits', 'notes', 'todos', 'reports')
+
+
+def get_stamp(user_id, resource):
+    # 0 until the first write; ETags also hash the path, so that cannot match an older stamp's ETag
+    versions = list(Stamp.objects.filter(user_id=user_id, resource=resource).values_list('version', flat=True)[:1])
+    return versions[0] if versions else 0
+
+
+def touch(user_id, *resources):
+    touch_many([user_id], *resources)
+
+
+def touch_many(user_ids, *resources):
+    """Bump the stamps once the current transaction commits (right away outside one).
+
+    Bumped earlier, a concurrent GET could pair the new stamp with the rows it read before the
+    commit, and clients would keep that stale body under a current ETag.
+    """
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: bump(user_ids, *resources))
+
+
+def bump(user_ids, *resources):
+    """Bump the stamps now, inside any transaction; touch_many() is what writers should call."""
+    version = time.time_ns()
+    Stamp.objects.bulk_create(
+        [Stamp(user_id=user_id, resource=resource, version=version) for user_id in set(user_ids) for resource in resources],
+        update_conflicts=True, unique_fields=['user', 'resource'], update_fields=['version'],
+    )
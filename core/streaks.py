@@ -0,0 +1,37 @@
+# core/streaks.py
+from datetime import timedelta
+
+from . import bitset
+from .models import Habit, HabitEntry, HabitStats
+
+
+def compute_streaks(bits, start_date, total_days):
+    """Return the summary fields for a packed history (see core.bitset)."""
+    return {
+        'completed_days': bitset.count(bits),
+        'total_days': total_days,
+        'current_streak': bitset.trailing_run(bits),
+        'longest_streak': bitset.longest_run(bits),
+        'last_completed': start_date + timedelta(days=bits.bit_length() - 1) if bits else None,
+    }
+
+
+def completed_dates(habit):
+    return (HabitEntry.objects
+            .filter(habit=habit, completed=True, date__range=(habit.start_date, habit.end_date))
+            .order_by('date').values_list('date', flat=True))
+
+
+def refresh_stats(habit):
+    """Recompute a habit's summary from its packed history."""
+    fields = compute_streaks(bitset.decode(habit.history), habit.start_date, habit.total_days)
+    stats, _ = HabitStats.objects.update_or_create(habit=habit, defaults=fields)
+    return stats
+
+
+def rebuild_stats(habit):
+    """Repack a habit's history from its completed entries, then recompute its summary."""
+    bits = bitset.from_indexes((date - habit.start_date).days for date in completed_dates(habit).iterator())
+    habit.history = bitset.encode(bits)
+    Habit.objects.filter(pk=habit.pk).update(history=habit.history)
+    return refresh_stats(habit)
@@ -1,25 +1,201 @@
 # core/tasks.py
+import logging
+import smtplib
+import socket
+import time
+from datetime import date
+
 from celery import shared_task
-from django.core.mail import send_mail
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
-from .models import ToDo
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from . import achievements, archive, report_cache, rollups, stamps
+from .models import DailyRollup, Habit, ToDo
+
+logger = logging.getLogger(__name__)
+
+
+def reminder_subject(todo):
+    return f"Reminder: {todo.task}"
+
+
+def reminder_body(todo):
+    return f"Your task '{todo.task}' is due on {todo.deadline.strftime('%Y-%m-%d %I:%M %p')}. Get it done!"
+
+
+def is_transient(error):
+    # Dropped connections, timeouts and 4xx SMTP replies are worth another attempt
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, socket.timeout, ConnectionError))
+
+
+def is_refused(error):
+    # 5xx replies about this one message (bad recipient, rejected content); a refused sender fails every message
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return (isinstance(error, smtplib.SMTPResponseException) and not isinstance(error, smtplib.SMTPSenderRefused)
+            and error.smtp_code >= 500)
+
+
+def send_with_retry(connection, message):
+    """Send one message on an open connection, reconnecting with exponential backoff on transient errors."""
+    attempt = 0
+    while True:
+        try:
+            if attempt:
+                connection.close()
+                connection.open()
+            return connection.send_messages([message]) or 0
+        except Exception as error:
+            if not is_transient(error) or attempt >= settings.REMINDER_EMAIL_MAX_RETRIES:
+                raise
+            delay = settings.REMINDER_EMAIL_RETRY_BACKOFF * 2 ** attempt
+            attempt += 1
+            logger.warning('Transient error sending a reminder, retry %d in %.1fs: %s', attempt, delay, error)
+            time.sleep(delay)
+
+
+def send_reminders(todos):
+    """Email a batch of claimed todos over one SMTP connection.
+
+    Messages go one send_messages() call each: the SMTP backend sends a list message by message
+    and raises partway through, so a failed call would not say which of its messages were delivered.
+    A retry therefore resends only the failed message. A message the server refuses for good (a bad
+    address, say) keeps its claim, so the next sweep does not pick it up again, and the batch goes
+    on. If the connection fails or retries run out, the claims on the failed todo and every todo
+    after it are released so the next sweep picks them up, and the error is re-raised.
+    """
+    todos = list(todos)
+    sent = 0
+    if not todos:
+        return sent
+
+    with get_connection(fail_silently=False) as connection:
+        for index, todo in enumerate(todos):
+            message = EmailMessage(reminder_subject(todo), reminder_body(todo), settings.DEFAULT_FROM_EMAIL,
+                                   [todo.user.email], connection=connection)
+            try:
+                sent += send_with_retry(connection, message)
+            except Exception as error:
+                if is_refused(error):
+                    logger.error('Reminder for todo %s refused, not retrying: %s', todo.id, error)
+                    continue
+                unsent = [todo.id for todo in todos[index:]]
+                ToDo.objects.filter(id__in=unsent).update(reminder_sent_at=None)
+                logger.exception('Failed to send %d reminder(s); released them for the next sweep', len(unsent))
+                raise
+    logger.info('Sent %d reminder email(s)', sent)
+    return sent
+
+
+def claim_due_reminders(now, limit):
+    """Mark up to `limit` due reminders as sent and return the ids this call claimed.
+
+    The conditional UPDATE makes a reminder fire at most once even if two sweeps overlap.
+    """
+    due_ids = list(ToDo.objects
+                   .filter(reminder_sent_at__isnull=True, reminder__lte=now)
+                   .order_by('reminder')
+                   .values_list('id', flat=True)[:limit])
+    if not due_ids:
+        return []
+    ToDo.objects.filter(id__in=due_ids, reminder_sent_at__isnull=True).update(reminder_sent_at=now)
+    return list(ToDo.objects.filter(id__in=due_ids, reminder_sent_at=now).values_list('id', flat=True))
+
+
+def load_reminders(todo_ids):
+    # One query: the user row is joined in, and only the columns the email needs are read
+    return (ToDo.objects
+            .filter(id__in=todo_ids, status='pending')
+            .select_related('user')
+            .only('id', 'task', 'deadline', 'user__email'))
+
+
+@shared_task
+def send_reminder_batch(todo_ids):
+    """Email the pending todos among an already claimed list of ids."""
+    return send_reminders(load_reminders(todo_ids))
+
+
+@shared_task
+def send_due_reminders():
+    # Periodic sweeper run by celery beat, see CELERY_BEAT_SCHEDULE
+    now = timezone.now()
+    batch_size = settings.REMINDER_BATCH_SIZE
+    claimed = claim_due_reminders(now, batch_size)
+    sent = send_reminder_batch(claimed) if claimed else 0
+    if len(claimed) == batch_size:
+        send_due_reminders.delay()  # More reminders are due than fit in one tick
+    return sent
+
 
 @shared_task
 def send_reminder_email(todo_id):
-    try:
-        todo = ToDo.objects.get(id=todo_id)
-        if todo.status == 'pending':
-            subject = f"Reminder: {todo.task}"
-            message = f"Your task '{todo.task}' is due on {todo.deadline.strftime('%Y-%m-%d %I:%M %p')}. Get it done!"
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[todo.user.email],
-                fail_silently=False,
-            )
-            print(f"Email sent for task '{todo.task}' to {todo.user.email}")
-    except ToDo.DoesNotExist:
-        print(f"Task {todo_id} not found, skipping email.")
-    except Exception as e:
-        print(f"Failed to send email for task {todo_id}: {str(e)}")
\ No newline at end of file
+    # Kept for ETA tasks still queued from before the sweeper; claims the todo so it fires once
+    claimed = ToDo.objects.filter(id=todo_id, reminder_sent_at__isnull=True).update(reminder_sent_at=timezone.now())
+    if not claimed:
+        logger.info('Reminder for todo %s already sent or todo deleted, skipping.', todo_id)
+        return 0
+    return send_reminder_batch([todo_id])
+
+
+@shared_task
+def rebuild_rollups(user_ids=None):
+    """Recompute the report rollups from the packed histories; nightly from celery beat, fixing any drift."""
+    if user_ids is None:
+        user_ids = (set(Habit.objects.values_list('user_id', flat=True).distinct())
+                    | set(DailyRollup.objects.values_list('user_id', flat=True).distinct()))
+    for user_id in sorted(user_ids):
+        rollups.rebuild_user(user_id)
+    report_cache.invalidate_many(user_ids)
+    logger.info('Rebuilt rollups for %d user(s)', len(user_ids))
+    return len(user_ids)
+
+
+def complete_expired(first_user_id, last_user_id, today):
+    """Mark the live habits of users first..last whose end_date is before `today` completed; returns those users.
+
+    One transaction with a fixed number of queries however many habits expire: a completed habit
+    changes no history, stats or rollups, only the completed-habit milestones and cached pages.
+    """
+    with transaction.atomic():
+        expired = list(Habit.objects
+                       .filter(user_id__gte=first_user_id, user_id__lte=last_user_id, is_deleted=False, is_completed=False,
+                               end_date__lt=today)
+                       .values_list('id', 'user_id'))
+        if not expired:
+            return []
+        # By id, so a habit that expires while this runs is left for the next run rather than missed below
+        Habit.objects.filter(id__in=[habit_id for habit_id, _ in expired]).update(is_completed=True)
+        user_ids = sorted({user_id for _, user_id in expired})
+        achievements.evaluate_many(user_ids, {achievements.COMPLETED_HABITS})
+    # update() sends no signals. Both bump stamps in the database after the commit, so the web
+    # processes serve new reports and ETags even though this runs in a celery worker
+    report_cache.invalidate_many(user_ids)
+    stamps.touch_many(user_ids, 'habits')
+    return user_ids
+
+
+@shared_task
+def complete_expired_habits(today=None):
+    """Nightly from celery beat: complete every habit whose end_date has passed, a chunk of users at a time."""
+    today = date.fromisoformat(today) if today else timezone.now().date()
+    chunk_size = settings.HABIT_LIFECYCLE_CHUNK_SIZE
+    last_id = User.objects.aggregate(last=Max('id'))['last'] or 0
+    users = 0
+    for first_id in range(1, last_id + 1, chunk_size):
+        users += len(complete_expired(first_id, first_id + chunk_size - 1, today))
+    logger.info('Completed expired habits of %d user(s)', users)
+    return users
+
+
+@shared_task
+def archive_deleted_habits():
+    """Nightly from celery beat: move habits deleted more than HABIT_ARCHIVE_AFTER_DAYS ago into the archive."""
+    archived = archive.archive_deleted()
+    logger.info('Archived %d deleted habit(s)', archived)
+    return archived
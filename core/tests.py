@@ -1,3 +1,1449 @@
-from django.test import TestCase
+import asyncio
+import contextvars
+import gzip
+import json
+import os
+import random
+import smtplib
+import threading
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.mail.backends import locmem
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from my_webapp.celery import app as celery_app
+
+from . import (achievements, archive, backends, bitset, importer, metrics, report_cache, rollups, search, stamps,
+               views)
+from .middleware import PerformanceMiddleware
+from .models import (Achievement, ArchivedHabit, DailyRollup, Habit, HabitEntry, HabitStats, ImportJob, Note, ToDo,
+                     WeeklyHabitRollup)
+from .pagination import PAGE_SIZE, encode_cursor
+from .services import MAX_HABIT_DURATION, apply_checkins, create_habit, toggle_entry
+from .streaks import compute_streaks, rebuild_stats
+from .tasks import (claim_due_reminders, complete_expired, complete_expired_habits, load_reminders, rebuild_rollups,
+                    send_due_reminders, send_reminder_batch)
+
+
+def dense_days(habit):
+    # One (date, completed) pair per day, read from the HabitEntry rows rather than Habit.history
+    completed = set(habit.habitentry_set.filter(completed=True).values_list('date', flat=True))
+    return [(habit.start_date + timedelta(days=i), habit.start_date + timedelta(days=i) in completed)
+            for i in range(habit.total_days)]
+
+
+def legacy_highest_streak(habit):
+    # The per-request loop reports() used before HabitStats existed, over the dense day grid
+    streaks = []
+    temp_streak = 0
+    prev_date = None
+    for day, completed in dense_days(habit):
+        if prev_date and (day - prev_date).days > 1:
+            if temp_streak > 0:
+                streaks.append(temp_streak)
+            temp_streak = 0
+        if completed:
+            temp_streak += 1
+        elif temp_streak > 0:
+            streaks.append(temp_streak)
+            temp_streak = 0
+        prev_date = day
+    if temp_streak > 0:
+        streaks.append(temp_streak)
+    return max(streaks) if streaks else 0
+
+
+class HabitStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('streaker', 'streaker@example.com', 'pass12345')
+        self.start = date(2024, 1, 1)
+
+    def make_habit(self, days):
+        return create_habit(self.user, 'Read', start_date=self.start, duration=days - 1)
+
+    def assertMatchesLegacy(self, habit):
+        stats = HabitStats.objects.get(habit=habit)
+        self.assertEqual(stats.longest_streak, legacy_highest_streak(habit))
+        self.assertEqual(stats.completed_days, sum(completed for _, completed in dense_days(habit)))
+        self.assertEqual(stats.total_days, len(dense_days(habit)))
+        self.assertEqual(list(habit.days()), dense_days(habit))
+        rebuilt = rebuild_stats(habit)
+        self.assertEqual(
+            (stats.current_streak, stats.longest_streak, stats.last_completed),
+            (rebuilt.current_streak, rebuilt.longest_streak, rebuilt.last_completed),
+        )
+
+    def test_incremental_toggles_match_legacy_loop(self):
+        rng = random.Random(2024)
+        for _ in range(5):
+            habit = self.make_habit(rng.randint(5, 60))
+            for _ in range(80):
+                toggle_entry(habit, habit.start_date + timedelta(days=rng.randrange(habit.total_days)))
+                self.assertMatchesLegacy(habit)
+
+    def test_only_completed_days_are_stored(self):
+        habit = self.make_habit(10)
+        day = self.start + timedelta(days=3)
+        self.assertTrue(toggle_entry(habit, day))
+        self.assertEqual(list(habit.habitentry_set.values_list('date', flat=True)), [day])
+        self.assertFalse(toggle_entry(habit, day))
+        self.assertFalse(habit.habitentry_set.exists())
+        with self.assertRaises(ValueError):
+            toggle_entry(habit, self.start - timedelta(days=1))
+
+    def test_update_habit_view_toggles_day(self):
+        habit = self.make_habit(5)
+        self.client.force_login(self.user)
+        self.client.get(f'/update_habit/{habit.id}/2024-01-02/')
+        self.assertTrue(habit.habitentry_set.filter(date=date(2024, 1, 2)).exists())
+        self.assertEqual(self.client.get(f'/update_habit/{habit.id}/2023-12-31/').status_code, 404)
+        self.assertEqual(self.client.get(f'/update_habit/{habit.id}/not-a-date/').status_code, 404)
+
+    def test_rebuild_handles_gaps_in_history(self):
+        habit = self.make_habit(10)
+        HabitEntry.objects.bulk_create(
+            HabitEntry(habit=habit, date=self.start + timedelta(days=i), completed=True) for i in range(10) if i != 4
+        )
+        stats = rebuild_stats(habit)
+        self.assertEqual(stats.longest_streak, legacy_highest_streak(habit))
+        self.assertEqual(stats.longest_streak, 5)
+        self.assertEqual(stats.current_streak, 5)
+
+    def test_backfill_command_creates_missing_stats(self):
+        habit = self.make_habit(7)
+        HabitStats.objects.all().delete()
+        call_command('backfill_habit_stats', stdout=StringIO())
+        self.assertEqual(HabitStats.objects.get(habit=habit).total_days, 7)
+
+    def test_reports_reads_summary(self):
+        habit = self.make_habit(4)
+        toggle_entry(habit, self.start)
+        self.client.force_login(self.user)
+        response = self.client.get('/reports/')
+        self.assertEqual(response.context['habit_data'][0]['highest_streak'], 1)
+        self.assertEqual(response.context['habit_data'][0]['completion_rate'], 25.0)
+
+
+class BitsetTests(TestCase):
+    def test_matches_naive_runs(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            flags = [rng.random() < 0.6 for _ in range(rng.randint(0, 400))]
+            bits = bitset.from_indexes(i for i, done in enumerate(flags) if done)
+            self.assertEqual(bitset.decode(bitset.encode(bits)), bits)
+
+            runs, run = [0], 0
+            for done in flags:
+                run = run + 1 if done else 0
+                runs.append(run)
+            last = max((i for i, done in enumerate(flags) if done), default=None)
+            self.assertEqual(bitset.count(bits), sum(flags))
+            self.assertEqual(bitset.longest_run(bits), max(runs))
+            self.assertEqual(bitset.trailing_run(bits), 0 if last is None else runs[last + 1])
+
+
+class HabitListingQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('lister', 'lister@example.com', 'pass12345')
+        self.client.force_login(self.user)
+
+    def make_habits(self, count):
+        start = date(2024, 1, 1)
+        for i in range(count):
+            habit = Habit.objects.create(user=self.user, name=f'Habit {i}', start_date=start,
+                                         end_date=start + timedelta(days=30))
+            HabitEntry.objects.bulk_create(
+                HabitEntry(habit=habit, date=start + timedelta(days=d), completed=True) for d in range(0, 31, 2)
+            )
+            rebuild_stats(habit)
+
+    def test_counts_come_from_packed_history(self):
+        self.make_habits(1)
+        habit = Habit.objects.for_tab(self.user, 'all').get()
+        self.assertEqual((habit.completed_days, habit.total_days), (16, 31))
+        self.assertEqual(sum(completed for _, completed in habit.days()), 16)
+
+    def test_query_count_is_independent_of_habit_count(self):
+        # session, user, habits, archived habits (counts and day grid are decoded from history)
+        self.make_habits(1)
+        with self.assertNumQueries(4):
+            response = self.client.get('/habits/all/')
+        self.assertEqual(response.context['habits_with_rates'][0]['completion_rate'], 51.6)
+
+        self.make_habits(49)
+        with self.assertNumQueries(4):
+            response = self.client.get('/habits/all/')
+        self.assertEqual(len(response.context['habits_with_rates']), 50)
+
+
+class CreateHabitServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('creator', 'creator@example.com', 'pass12345')
+
+    def test_default_duration_matches_previous_window(self):
+        habit = create_habit(self.user, 'Run', start_date=date(2024, 3, 1))
+        self.assertEqual(habit.end_date, date(2024, 3, 31))
+        self.assertFalse(habit.habitentry_set.exists())
+        self.assertEqual(habit.stats.total_days, 31)
+
+    def test_explicit_range_and_duration(self):
+        habit = create_habit(self.user, 'Stretch', start_date=date(2024, 1, 1), end_date=date(2024, 12, 31))
+        self.assertEqual(habit.stats.total_days, 366)
+        habit = create_habit(self.user, 'Walk', start_date=date(2024, 1, 1), duration=timedelta(weeks=1))
+        self.assertEqual(habit.stats.total_days, 8)
+
+    def test_invalid_range_creates_nothing(self):
+        with self.assertRaises(ValueError):
+            create_habit(self.user, 'Nope', start_date=date(2024, 1, 2), end_date=date(2024, 1, 1))
+        with self.assertRaises(ValueError):
+            create_habit(self.user, 'Nope', duration=MAX_HABIT_DURATION + 1)
+        self.assertFalse(Habit.objects.exists())
+
+    def test_creation_query_count(self):
+        # Habit insert, the user's overlapping habits, daily rollups replaced (2), weekly rollups
+        # inserted, stats insert, wrapped in a savepoint under TestCase
+        with self.assertNumQueries(8):
+            create_habit(self.user, 'Meditate', duration=30)
+
+    def test_view_accepts_duration(self):
+        self.client.force_login(self.user)
+        self.client.post('/habits/all/', {'name': 'Journal', 'duration': '6'})
+        self.assertEqual(Habit.objects.get(name='Journal').total_days, 7)
+
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cached', 'cached@example.com', 'pass12345')
+        self.habit = create_habit(self.user, 'Read', start_date=date(2024, 1, 1), duration=9)
+        self.client.force_login(self.user)
+
+    def test_second_view_is_served_from_cache(self):
+        self.client.get('/reports/')
+        # session, user and the report's version stamp; the report itself comes from the cache
+        with self.assertNumQueries(3):
+            response = self.client.get('/reports/')
+        self.assertEqual(response.context['total_possible_days'], 10)
+        self.assertEqual(report_cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 50.0})
+
+    def test_entry_toggle_invalidates(self):
+        self.client.get('/reports/')
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_entry(self.habit, date(2024, 1, 1))
+        response = self.client.get('/reports/')
+        self.assertEqual(response.context['total_completed_days'], 1)
+        self.assertEqual(report_cache.stats()['misses'], 2)
+
+    def test_report_cached_before_the_commit_is_not_served(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_entry(self.habit, date(2024, 1, 1))
+            # A concurrent request that still sees the pre-commit rows caches them
+            cache.set(report_cache.report_key(self.user.pk, stamps.get_stamp(self.user.pk, 'reports')), {'stale': True})
+        self.assertEqual(self.client.get('/reports/').context['total_completed_days'], 1)
+
+    def test_habit_changes_invalidate(self):
+        self.client.get('/reports/')
+        with self.captureOnCommitCallbacks(execute=True):
+            create_habit(self.user, 'Run', start_date=date(2024, 1, 1), duration=4)
+        self.assertEqual(self.client.get('/reports/').context['total_possible_days'], 15)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habit.delete()
+        self.assertEqual(self.client.get('/reports/').context['total_possible_days'], 5)
+
+    def test_cache_is_per_user(self):
+        self.client.get('/reports/')
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get('/reports/').context['habit_data'], [])
+
+
+class CountingBackend(locmem.EmailBackend):
+    # Stand-in SMTP backend that records connection opens, can fail the first opens and sends,
+    # and refuses the addresses in `refused`
+    opened = 0
+    failures = []
+    open_failures = []
+    refused = set()
+
+    def open(self):
+        CountingBackend.opened += 1
+        failure = CountingBackend.open_failures.pop(0) if CountingBackend.open_failures else None
+        if failure:
+            raise failure
+        return True
+
+    def send_messages(self, messages):
+        failure = CountingBackend.failures.pop(0) if CountingBackend.failures else None
+        if failure:
+            raise failure
+        bad = {address: (550, b'No such user') for message in messages for address in message.to
+               if address in CountingBackend.refused}
+        if bad:
+            raise smtplib.SMTPRecipientsRefused(bad)
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='core.tests.CountingBackend', REMINDER_EMAIL_RETRY_BACKOFF=0)
+class ReminderEmailBatchTests(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+        CountingBackend.failures = []
+        CountingBackend.open_failures = []
+        CountingBackend.refused = set()
+        self.user = User.objects.create_user('batched', 'batched@example.com', 'pass12345')
+        past = timezone.now() - timedelta(minutes=1)
+        for i in range(5):
+            ToDo.objects.create(user=self.user, task=f'Task {i}', deadline=past, reminder=past)
+
+    def test_one_connection_per_batch(self):
+        self.assertEqual(send_due_reminders(), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(CountingBackend.opened, 1)
+
+    def test_transient_failure_is_retried_on_a_new_connection(self):
+        CountingBackend.failures = [smtplib.SMTPServerDisconnected('dropped')]
+        with self.assertLogs('core.tasks', 'WARNING'):
+            self.assertEqual(send_due_reminders(), 5)
+        self.assertEqual(CountingBackend.opened, 2)
+
+    def test_retry_resends_only_the_failed_message(self):
+        CountingBackend.failures = [None, None, smtplib.SMTPServerDisconnected('dropped')]
+        with self.assertLogs('core.tasks', 'WARNING'):
+            self.assertEqual(send_due_reminders(), 5)
+        self.assertEqual(sorted(message.subject for message in mail.outbox),
+                         [f'Reminder: Task {i}' for i in range(5)])
+
+    def test_failed_reconnect_is_retried(self):
+        CountingBackend.failures = [smtplib.SMTPServerDisconnected('dropped')]
+        CountingBackend.open_failures = [None, ConnectionRefusedError()]  # The batch's open succeeds, the first reconnect not
+        with self.assertLogs('core.tasks', 'WARNING'):
+            self.assertEqual(send_due_reminders(), 5)
+        self.assertEqual((len(mail.outbox), CountingBackend.opened), (5, 3))
+
+    def test_refused_recipient_does_not_block_the_rest(self):
+        bad = User.objects.create_user('bad', 'bad@example.com', 'pass12345')
+        earliest = timezone.now() - timedelta(hours=1)
+        ToDo.objects.create(user=bad, task='Bounce', deadline=earliest, reminder=earliest)
+        CountingBackend.refused = {'bad@example.com'}
+        with self.assertLogs('core.tasks', 'ERROR') as logs:
+            self.assertEqual(send_due_reminders(), 5)
+        self.assertIn('refused', logs.output[0])
+        self.assertEqual(sorted(message.subject for message in mail.outbox), [f'Reminder: Task {i}' for i in range(5)])
+        # The refused todo keeps its claim, so the next sweep does not fail on it again
+        self.assertFalse(ToDo.objects.filter(reminder_sent_at__isnull=True).exists())
+        self.assertEqual(send_due_reminders(), 0)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_gives_up_after_max_retries(self):
+        CountingBackend.failures = [None] + [ConnectionResetError()] * 10
+        with self.assertLogs('core.tasks'), self.assertRaises(ConnectionResetError):
+            send_due_reminders()
+        self.assertEqual(CountingBackend.opened, 4)
+        # The connection is gone, so the failed todo and those after it are released for the next sweep
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(ToDo.objects.filter(reminder_sent_at__isnull=True).count(), 4)
+
+
+class ReminderQueryTests(TestCase):
+    def setUp(self):
+        past = timezone.now() - timedelta(minutes=1)
+        self.todos = []
+        for i in range(50):
+            user = User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pass12345')
+            self.todos.append(ToDo.objects.create(user=user, task=f'Task {i}', deadline=past, reminder=past))
+
+    def test_batch_loads_todos_and_users_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(send_reminder_batch([todo.id for todo in self.todos[:1]]), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(send_reminder_batch([todo.id for todo in self.todos[1:]]), 49)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(f'user{i}@example.com' for i in range(50)))
+
+    def test_sweeper_query_count_is_constant(self):
+        # select due ids, claim update, read back the claim, load todos with users
+        with self.assertNumQueries(4):
+            self.assertEqual(send_due_reminders(), 50)
+
+    def test_loads_only_needed_columns(self):
+        todo = load_reminders([self.todos[0].id]).get()
+        self.assertEqual(todo.get_deferred_fields(), {'reminder', 'created_at', 'status', 'reminder_sent_at'})
+
+
+class ReminderSweeperTests(TestCase):
+    def setUp(self):
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+        self.user = User.objects.create_user('reminded', 'reminded@example.com', 'pass12345')
+        self.now = timezone.now()
+
+    def make_todo(self, minutes, **kwargs):
+        when = self.now + timedelta(minutes=minutes)
+        return ToDo.objects.create(user=self.user, task=f'Task {minutes}', deadline=when + timedelta(hours=1),
+                                   reminder=when, **kwargs)
+
+    def test_sends_due_reminders_once(self):
+        due = self.make_todo(-5)
+        self.make_todo(30)
+        send_due_reminders.delay()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reminded@example.com'])
+        self.assertEqual(mail.outbox[0].subject, f'Reminder: {due.task}')
+        self.assertIsNotNone(ToDo.objects.get(pk=due.pk).reminder_sent_at)
+
+        send_due_reminders.delay()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_completed_and_deleted_todos_are_skipped(self):
+        self.make_todo(-5, status='completed')
+        self.make_todo(-5).delete()
+        send_due_reminders.delay()
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(REMINDER_BATCH_SIZE=2)
+    def test_backlog_larger_than_batch_is_drained(self):
+        for minutes in range(-5, 0):
+            self.make_todo(minutes)
+        send_due_reminders.delay()
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(ToDo.objects.filter(reminder_sent_at__isnull=True).exists())
+
+    def test_claim_skips_already_claimed(self):
+        todo = self.make_todo(-5)
+        self.assertEqual(claim_due_reminders(self.now, 10), [todo.pk])
+        self.assertEqual(claim_due_reminders(self.now, 10), [])
+
+    def test_creating_a_todo_schedules_no_task(self):
+        self.client.force_login(self.user)
+        when = timezone.localtime(self.now + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M')
+        response = self.client.post('/to-do/', {'task': 'Write', 'deadline': when, 'reminder': when},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTrue(response.json()['success'])
+        self.assertIsNone(ToDo.objects.get(task='Write').reminder_sent_at)
+
+
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_view_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_views', users=2, stdout=out)
+        self.assertIn('no full table scans', out.getvalue())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('paged', 'paged@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        stamp = timezone.now()
+        Note.objects.bulk_create(Note(user=self.user, title=f'N{i}', heading='h', content='c') for i in range(60))
+        # Duplicate timestamps so the id tie-breaker matters
+        Note.objects.filter(user=self.user).update(created_at=stamp)
+        ToDo.objects.bulk_create(
+            ToDo(user=self.user, task=f'T{i}', deadline=stamp + timedelta(hours=i % 7), reminder=stamp)
+            for i in range(60)
+        )
+
+    def walk(self, url, key):
+        seen, cursor, queries = [], None, []
+        while True:
+            with CaptureQueriesContext(connection) as captured:
+                data = self.client.get(url, {'cursor': cursor} if cursor else {}).json()
+            queries.append(len(captured))
+            seen += [item['id'] for item in data[key]]
+            cursor = data['next_cursor']
+            if not cursor:
+                return seen, queries
+
+    def test_notes_pages_cover_everything_once_newest_first(self):
+        response = self.client.get('/notes/')
+        self.assertEqual(len(response.context['notes']), PAGE_SIZE)
+        seen, queries = self.walk('/notes/page/', 'notes')
+        expected = list(Note.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(set(queries)), 1)
+
+    def test_todos_pages_follow_deadline_order(self):
+        seen, _ = self.walk('/to-do/page/', 'todos')
+        expected = list(ToDo.objects.filter(user=self.user).order_by('deadline', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursor_is_rejected(self):
+        for cursor in ('garbage', encode_cursor(['not-a-date', 1]), encode_cursor([1])):
+            response = self.client.get('/notes/page/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+
+    def test_pages_are_per_user(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get('/notes/page/').json()['notes'], [])
+
+
+class NoteSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('searcher', 'searcher@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.in_title = Note.objects.create(user=self.user, title='Marathon plan', heading='Week 1', content='Easy runs.')
+        self.in_content = Note.objects.create(user=self.user, title='Groceries', heading='Saturday',
+                                              content='Oats and bananas before the marathon training run.')
+        Note.objects.create(user=self.user, title='Books', heading='Reading', content='Nothing relevant here.')
+
+    def search(self, q, **params):
+        return self.client.get('/notes/search/', {'q': q, **params}).json()
+
+    def test_ranks_title_matches_first_and_highlights(self):
+        results = self.search('marathon')['results']
+        self.assertEqual([r['id'] for r in results], [self.in_title.id, self.in_content.id])
+        self.assertEqual(results[0]['title'], '<mark>Marathon</mark> plan')
+        self.assertIn('<mark>marathon</mark>', results[1]['snippet'])
+
+    def test_prefix_and_multiple_terms(self):
+        self.assertEqual([r['id'] for r in self.search('bananas mara')['results']], [self.in_content.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.in_content.content = 'Just oats.'
+        self.in_content.save()
+        Note.objects.filter(pk=self.in_title.pk).update(title='Plan')
+        self.assertEqual(self.search('marathon')['results'], [])
+        self.assertEqual(len(self.search('oats')['results']), 1)
+        self.in_content.delete()
+        self.assertEqual(self.search('oats')['results'], [])
+
+    def test_results_are_escaped_and_per_user(self):
+        Note.objects.create(user=self.user, title='<script>alert(1)</script>', heading='x', content='marathon')
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345')
+        Note.objects.create(user=other, title='Marathon', heading='x', content='y')
+        results = self.search('alert')['results']
+        self.assertEqual(results[0]['title'], '&lt;script&gt;<mark>alert</mark>(1)&lt;/script&gt;')
+        self.assertEqual(len(self.search('marathon')['results']), 3)
+
+    def test_operators_in_input_are_literal(self):
+        for q in ('"', 'NOT marathon', 'title: AND OR (', '*'):
+            self.assertTrue(self.search(q)['success'])
+
+    def test_stopwords_are_dropped_unless_nothing_else_is_left(self):
+        self.assertEqual(search.search_terms('The plan for the marathon'), ['plan', 'marathon'])
+        self.assertEqual(search.search_terms('the'), ['the'])
+
+    def test_paginates(self):
+        Note.objects.bulk_create(Note(user=self.user, title=f'Run {i}', heading='h', content='c') for i in range(30))
+        first = self.search('run')
+        self.assertEqual(len(first['results']), PAGE_SIZE)
+        second = self.search('run', page=first['next_page'])
+        self.assertIsNone(second['next_page'])
+        ids = [r['id'] for r in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 32)  # The 30 new notes plus 'runs' and 'run' in setUp
+
+    def test_repair_recreates_dropped_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER core_note_fts_ai')
+        Note.objects.create(user=self.user, title='Swimming', heading='h', content='c')
+        search.repair(connection)
+        self.assertEqual(len(self.search('swimming')['results']), 1)
+        Note.objects.create(user=self.user, title='Swimming again', heading='h', content='c')
+        self.assertEqual(len(self.search('swimming')['results']), 2)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('api', 'api@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.habit = create_habit(self.user, 'Read', start_date=date(2025, 1, 1), duration=9)
+        self.note = Note.objects.create(user=self.user, title='T', heading='H', content='C')
+
+    def test_unchanged_data_is_a_304_without_touching_app_tables(self):
+        response = self.client.get('/api/v1/habits/')
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/v1/habits/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual([q['sql'] for q in captured.captured_queries if 'core_' in q['sql']
+                          and 'core_stamp' not in q['sql']], [])
+
+    def test_etag_changes_only_for_the_changed_resource(self):
+        habits_etag = self.client.get('/api/v1/habits/')['ETag']
+        notes_etag = self.client.get('/api/v1/notes/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/v1/habits/{self.habit.id}/entries/2025-01-03/')
+        self.assertEqual(self.client.get('/api/v1/habits/', HTTP_IF_NONE_MATCH=habits_etag).status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/notes/', HTTP_IF_NONE_MATCH=notes_etag).status_code, 304)
+        # A different ?fields= is a different representation
+        self.assertNotEqual(self.client.get('/api/v1/notes/?fields=id')['ETag'], notes_etag)
+
+    def test_stamps_are_shared_and_bumped_on_commit(self):
+        etag = self.client.get('/api/v1/notes/')['ETag']
+        cache.clear()  # What another worker process sees: the stamps are not in its cache
+        self.assertEqual(self.client.get('/api/v1/notes/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Note.objects.create(user=self.user, title='New', heading='H', content='C')
+            # Not yet committed: readers still get the old rows, so the old ETag stays valid
+            self.assertEqual(self.client.get('/api/v1/notes/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(self.client.get('/api/v1/notes/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_habits_and_entries(self):
+        self.assertEqual(self.client.post(f'/api/v1/habits/{self.habit.id}/entries/2025-01-03/').json(),
+                         {'date': '2025-01-03', 'completed': True})
+        habit = self.client.get(f'/api/v1/habits/{self.habit.id}/').json()
+        self.assertEqual((habit['completed_days'], habit['total_days'], habit['last_completed']), (1, 10, '2025-01-03'))
+        self.assertNotIn('entries', habit)
+        entries = self.client.get(f'/api/v1/habits/{self.habit.id}/entries/').json()['entries']
+        self.assertEqual(len(entries), 10)
+        self.assertEqual([e['date'] for e in entries if e['completed']], ['2025-01-03'])
+        for day in ('2024-12-31', 'nope'):
+            self.assertEqual(self.client.post(f'/api/v1/habits/{self.habit.id}/entries/{day}/').status_code, 404)
+
+    def test_fields_selection(self):
+        results = self.client.get('/api/v1/habits/', {'fields': 'id,name,entries'}).json()['results']
+        self.assertEqual(results, [{'id': self.habit.id, 'name': 'Read', 'entries': []}])
+        response = self.client.get('/api/v1/notes/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('title', response.json()['available'])
+
+    def test_notes_crud(self):
+        response = self.client.post('/api/v1/notes/', {'title': 'New', 'heading': 'H', 'content': 'Body'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        note_id = response.json()['id']
+        response = self.client.patch(f'/api/v1/notes/{note_id}/', {'title': 'Renamed'}, content_type='application/json')
+        self.assertEqual((response.json()['title'], response.json()['content']), ('Renamed', 'Body'))
+        response = self.client.patch(f'/api/v1/notes/{note_id}/', {'title': ''}, content_type='application/json')
+        self.assertIn('title', response.json()['fields'])
+        self.assertEqual(self.client.delete(f'/api/v1/notes/{note_id}/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/v1/notes/{note_id}/').status_code, 404)
+
+    def test_todos_crud_resends_moved_reminders(self):
+        response = self.client.post('/api/v1/todos/', {
+            'task': 'File taxes', 'deadline': '2030-04-01T09:00:00+00:00', 'reminder': '2030-03-31T09:00:00+00:00',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        todo = ToDo.objects.get(pk=response.json()['id'])
+        self.assertEqual(todo.status, 'pending')
+        ToDo.objects.filter(pk=todo.pk).update(reminder_sent_at=timezone.now())
+        self.client.patch(f'/api/v1/todos/{todo.id}/', {'status': 'completed'}, content_type='application/json')
+        self.assertIsNotNone(ToDo.objects.get(pk=todo.pk).reminder_sent_at)
+        self.client.patch(f'/api/v1/todos/{todo.id}/', {'reminder': '2030-03-30T09:00:00+00:00'},
+                          content_type='application/json')
+        todo.refresh_from_db()
+        self.assertEqual((todo.status, todo.reminder_sent_at), ('completed', None))
+
+    def test_errors_are_json(self):
+        self.assertEqual(self.client.put('/api/v1/notes/').status_code, 405)
+        self.assertEqual(self.client.post('/api/v1/notes/', 'not json', content_type='application/json').status_code, 400)
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(f'/api/v1/notes/{self.note.id}/').status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/v1/notes/').status_code, 401)
+
+
+class BulkCheckinTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('bulk', 'bulk@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.start = date(2025, 1, 1)
+        self.habits = [create_habit(self.user, f'H{i}', start_date=self.start, duration=29) for i in range(5)]
+
+    def post(self, operations):
+        return self.client.post('/api/v1/checkins/', {'operations': operations}, content_type='application/json')
+
+    def operations(self, count, completed):
+        return [{'habit_id': self.habits[i % 5].id, 'date': (self.start + timedelta(days=i // 5)).isoformat(),
+                 'completed': completed} for i in range(count)]
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        # Already earned, so the larger batch does not also insert newly earned achievements
+        Achievement.objects.bulk_create(Achievement(user=self.user, key=key) for key in achievements.MILESTONES)
+        for completed in (True, False):
+            counts = []
+            for size in (1, 100):
+                with CaptureQueriesContext(connection) as captured:
+                    response = self.post(self.operations(size, completed))
+                self.assertEqual(response.status_code, 200)
+                counts.append(len(captured))
+            self.assertEqual(counts[0], counts[1], completed)
+
+    def test_entries_history_and_stats_agree(self):
+        rng = random.Random(3)
+        for _ in range(4):
+            operations = [{'habit_id': rng.choice(self.habits).id, 'completed': rng.random() < 0.7,
+                           'date': (self.start + timedelta(days=rng.randrange(30))).isoformat()} for _ in range(80)]
+            results = {r['id']: r for r in self.post(operations).json()['results']}
+        for habit in Habit.objects.filter(user=self.user).select_related('stats'):
+            self.assertEqual(list(habit.days()), dense_days(habit))
+            persisted = habit.stats
+            rebuilt = rebuild_stats(habit)
+            self.assertEqual((persisted.completed_days, persisted.current_streak, persisted.longest_streak,
+                              persisted.last_completed),
+                             (rebuilt.completed_days, rebuilt.current_streak, rebuilt.longest_streak,
+                              rebuilt.last_completed))
+            if habit.id in results:
+                self.assertEqual(results[habit.id]['completed_days'], rebuilt.completed_days)
+
+    def test_later_operations_win(self):
+        day = self.start.isoformat()
+        habit_id = self.habits[0].id
+        self.post([{'habit_id': habit_id, 'date': day, 'completed': True},
+                   {'habit_id': habit_id, 'date': day, 'completed': False}])
+        self.assertFalse(HabitEntry.objects.filter(habit_id=habit_id).exists())
+
+    def test_invalid_batches_change_nothing(self):
+        other = create_habit(User.objects.create_user('other', 'other@example.com', 'pass12345'), 'X')
+        good = self.operations(3, True)
+        for bad in ({'habit_id': other.id, 'date': self.start.isoformat(), 'completed': True},
+                    {'habit_id': self.habits[0].id, 'date': '2024-12-31', 'completed': True},
+                    {'habit_id': self.habits[0].id, 'date': self.start.isoformat(), 'completed': 'yes'},
+                    {'habit_id': self.habits[0].id}):
+            self.assertEqual(self.post(good + [bad]).status_code, 400)
+        self.assertFalse(HabitEntry.objects.exists())
+        self.assertEqual(HabitStats.objects.filter(completed_days__gt=0).count(), 0)
+
+    def test_invalidates_reports_and_etags(self):
+        self.client.get('/reports/')
+        etag = self.client.get('/api/v1/habits/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post(self.operations(5, True))
+        self.assertEqual(self.client.get('/api/v1/habits/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        rates = {h['name']: h['completion_rate'] for h in self.client.get('/reports/').context['habit_data']}
+        self.assertEqual(rates['H0'], round(1 / 30 * 100, 1))
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('async', 'async@example.com', 'pass12345')
+        self.async_client.force_login(self.user)
+        self.todo = ToDo.objects.create(user=self.user, task='Call', deadline=timezone.now(), reminder=timezone.now())
+
+    def test_io_bound_endpoints_are_coroutines(self):
+        for view in (views.to_do, views.update_todo_status, views.delete_todo, views.notes, views.notes_page,
+                     views.reports):
+            self.assertTrue(asyncio.iscoroutinefunction(view), view.__name__)
+
+    async def test_pages_render_under_asgi(self):
+        await Note.objects.acreate(user=self.user, title='T', heading='H', content='C')
+        for url in ('/notes/', '/notes/page/', '/to-do/', '/to-do/page/', '/reports/'):
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+
+    async def test_todo_ajax_endpoints(self):
+        ajax = {'headers': {'X-Requested-With': 'XMLHttpRequest'}}
+        response = await self.async_client.post(f'/to-do/{self.todo.id}/update/', **ajax)
+        self.assertEqual(response.json(), {'success': True, 'status': 'completed'})
+        response = await self.async_client.post(f'/to-do/{self.todo.id}/delete/', **ajax)
+        self.assertEqual(response.json(), {'success': True})
+        self.assertFalse(await ToDo.objects.filter(pk=self.todo.pk).aexists())
+
+    async def test_anonymous_users_are_sent_to_login(self):
+        response = await AsyncClient().get('/to-do/')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/accounts/login/?next=/to-do/', response['Location'])
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.user = User.objects.create_user('perf', 'perf@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        Note.objects.create(user=self.user, title='T', heading='H', content='C')
+
+    def sample_line(self, text, prefix):
+        return next(line for line in text.splitlines() if line.startswith(prefix))
+
+    def test_records_views_including_queries_run_by_async_views(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/notes/')
+        queries = len(captured)  # Read now: the next request resets connection.queries
+        self.client.get('/api/v1/notes/')
+        with override_settings(PERF_METRICS_TOKEN='s3cret'):
+            text = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret').content.decode()
+        self.assertIn('core_requests_total{view="notes",method="GET",status="200"} 1', text)
+        self.assertIn('core_requests_total{view="api_notes",method="GET",status="200"} 1', text)
+        self.assertEqual(self.sample_line(text, 'core_request_db_queries_sum{view="notes"}').split()[-1],
+                         str(queries))
+        self.assertEqual(self.sample_line(text, 'core_response_size_bytes_sum{view="notes"}').split()[-1],
+                         str(len(response.content)))
+        self.assertIn('core_request_duration_seconds_bucket{view="notes",le="+Inf"} 1', text)
+
+    def test_metrics_token(self):
+        # Without a configured token the endpoint is not served
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(PERF_METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+
+    def test_queries_from_several_threads_are_all_counted(self):
+        sample, token = metrics.start(keep_sql=True)
+        self.addCleanup(metrics.stop, token)
+
+        def run():
+            for _ in range(2000):
+                metrics.record_query(lambda *args: None, 'SELECT 1', (), False, {})
+
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(run,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((sample.queries, len(sample.sql)), (16000, 16000))
+
+    @override_settings(PERF_METRICS_ENABLED=False, PERF_METRICS_TOKEN='s3cret')
+    def test_disabled_middleware_is_left_out(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            PerformanceMiddleware(lambda request: None)
+        self.client.get('/notes/')
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(metrics.REQUESTS.series, {})
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0.001)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('core.performance', 'WARNING') as logs:
+            self.client.get('/notes/')
+        self.assertIn('(notes)', logs.output[0])
+        self.assertIn('core_note', logs.output[0])
+
+
+class BenchmarkTests(TestCase):
+    def test_seed_data(self):
+        call_command('seed_data', users=2, habits=3, history_days=40, notes=4, todos=6, due_reminders=2,
+                     prefix='t', stdout=StringIO())
+        user = User.objects.get(username='t-1')
+        self.assertEqual(Note.objects.filter(user=user).count(), 4)
+        self.assertEqual(ToDo.objects.filter(user=user, reminder_sent_at__isnull=True,
+                                             reminder__lte=timezone.now()).count(), 2)
+        for habit in Habit.objects.filter(user=user).select_related('stats'):
+            self.assertEqual(habit.total_days, 40)
+            bits = bitset.decode(habit.history)
+            self.assertEqual(habit.habitentry_set.count(), bitset.count(bits))
+            self.assertEqual(habit.stats.longest_streak, compute_streaks(bits, habit.start_date, 40)['longest_streak'])
+        with self.assertRaises(CommandError):
+            call_command('seed_data', users=1, prefix='t', stdout=StringIO())
+
+    def test_bench_views_baseline_and_regressions(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'baseline.json'
+            call_command('bench_views', scales=['small'], repeat=1, baseline=str(path), stdout=StringIO())
+            baseline = json.loads(path.read_text())
+            self.assertEqual(set(baseline['results']['small']),
+                             {'habits', 'reports', 'notes', 'to_do', 'send_reminder_email'})
+            self.assertFalse(User.objects.filter(username__startswith='bench-').exists())  # Rolled back
+
+            baseline['results']['small']['notes']['queries'] -= 1
+            for result in baseline['results']['small'].values():
+                result['p50_ms'] = result['peak_kib'] = 1e6  # Timing and memory noise must not fail it
+            path.write_text(json.dumps(baseline))
+            with self.assertRaisesMessage(CommandError, 'small/notes'):
+                call_command('bench_views', scales=['small'], repeat=1, baseline=str(path), stdout=StringIO())
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('rollup', 'rollup@example.com', 'pass12345')
+        self.today = timezone.now().date()
+        self.start = self.today - timedelta(days=13)
+        self.first = create_habit(self.user, 'Run', start_date=self.start, duration=13)
+        self.second = create_habit(self.user, 'Read', start_date=self.start + timedelta(days=7), duration=20)
+
+    def snapshot(self):
+        daily = set(DailyRollup.objects.filter(user=self.user).values_list('date', 'habits_active', 'days_completed'))
+        weekly = set(WeeklyHabitRollup.objects.filter(habit__user=self.user)
+                     .values_list('habit_id', 'week_start', 'days_active', 'days_completed'))
+        return daily, weekly
+
+    def assertMatchesRebuild(self):
+        current = self.snapshot()
+        rollups.rebuild_user(self.user.pk)
+        self.assertEqual(current, self.snapshot())
+
+    def test_creation_counts_active_days(self):
+        row = DailyRollup.objects.get(user=self.user, date=self.today)
+        self.assertEqual((row.habits_active, row.days_completed), (2, 0))
+        self.assertEqual(DailyRollup.objects.get(user=self.user, date=self.start).habits_active, 1)
+        self.assertEqual(sum(WeeklyHabitRollup.objects.filter(habit=self.first).values_list('days_active', flat=True)), 14)
+        self.assertMatchesRebuild()
+
+    def test_toggle_moves_one_row_each(self):
+        toggle_entry(self.first, self.today)
+        toggle_entry(self.second, self.today)
+        toggle_entry(self.first, self.start)
+        self.assertEqual(DailyRollup.objects.get(user=self.user, date=self.today).days_completed, 2)
+        self.assertMatchesRebuild()
+        toggle_entry(self.second, self.today)
+        self.assertEqual(DailyRollup.objects.get(user=self.user, date=self.today).days_completed, 1)
+        self.assertMatchesRebuild()
+
+    def test_bulk_checkins_and_deletes(self):
+        apply_checkins(self.user, [(self.first.pk, self.start + timedelta(days=i), True) for i in range(10)]
+                       + [(self.second.pk, self.today, True)])
+        self.assertMatchesRebuild()
+        self.first.is_deleted = True
+        self.first.save()
+        self.assertEqual(DailyRollup.objects.get(user=self.user, date=self.today).habits_active, 1)
+        self.assertFalse(DailyRollup.objects.filter(user=self.user, date=self.start).exists())
+        self.second.delete()
+        self.assertFalse(DailyRollup.objects.filter(user=self.user).exists())
+        self.user.delete()
+
+    def test_nightly_rebuild_repairs_drift(self):
+        toggle_entry(self.first, self.today)
+        DailyRollup.objects.filter(user=self.user).update(days_completed=5)
+        rebuild_rollups()
+        self.assertEqual(DailyRollup.objects.get(user=self.user, date=self.today).days_completed, 1)
+        self.assertEqual(settings.CELERY_BEAT_SCHEDULE['rebuild-rollups']['task'], 'core.tasks.rebuild_rollups')
+
+    def test_report_cost_does_not_grow_with_history(self):
+        self.client.force_login(self.user)
+        toggle_entry(self.first, self.today)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/reports/')
+        short = len(captured)
+        trend = response.context['daily_trend']
+        self.assertEqual((len(trend), trend[-1]['rate']), (rollups.TREND_DAYS, 50.0))
+        self.assertEqual([habit['name'] for habit in response.context['weekly_trends']['habits']], ['Run', 'Read'])
+
+        veteran = User.objects.create_user('veteran', 'veteran@example.com', 'pass12345')
+        for name in ('Run', 'Read'):
+            habit = create_habit(veteran, name, start_date=self.today - timedelta(days=5 * 365), duration=5 * 365 + 10)
+            apply_checkins(veteran, [(habit.pk, habit.start_date + timedelta(days=i), True) for i in range(0, 1800, 4)])
+        self.client.force_login(veteran)
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get('/reports/')
+        self.assertEqual(len(captured), short)
+
+    def test_weekly_rows_match_the_days(self):
+        rng = random.Random(5)
+        habit = Habit(pk=1, start_date=date(2025, 1, 2), end_date=date(2025, 3, 20))
+        habit.history = bitset.encode(bitset.from_indexes(i for i in range(habit.total_days) if rng.random() < 0.6))
+        for start, end in ((None, None), (date(2025, 1, 6), date(2025, 1, 6)), (date(2025, 2, 4), date(2025, 5, 1)),
+                           (date(2025, 4, 1), None)):
+            expected = {}
+            for day, done in rollups.habit_days(habit, start, end):
+                active, completed = expected.get(rollups.week_start(day), (0, 0))
+                expected[rollups.week_start(day)] = (active + 1, completed + done)
+            rows = rollups.weekly_rows(habit, start, end)
+            self.assertEqual({row.week_start: (row.days_active, row.days_completed) for row in rows}, expected)
+
+
+class AchievementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('achiever', 'achiever@example.com', 'pass12345')
+        self.habit = create_habit(self.user, 'Run', start_date=date(2025, 1, 1), duration=19)
+
+    def keys(self):
+        return set(Achievement.objects.filter(user=self.user).values_list('key', flat=True))
+
+    def test_toggles_award_once_and_keep_the_date(self):
+        for day in range(9):
+            toggle_entry(self.habit, date(2025, 1, 1) + timedelta(days=day))
+        self.assertEqual(self.keys(), {'streak_7'})
+        toggle_entry(self.habit, date(2025, 1, 10))
+        self.assertEqual(self.keys(), {'streak_7', 'days_10', 'rate_50'})
+        earned_at = Achievement.objects.get(user=self.user, key='days_10').earned_at
+        toggle_entry(self.habit, date(2025, 1, 10))
+        toggle_entry(self.habit, date(2025, 1, 10))
+        self.assertEqual(Achievement.objects.get(user=self.user, key='days_10').earned_at, earned_at)
+
+    def test_only_milestones_reading_a_changed_counter_are_checked(self):
+        with self.assertNumQueries(0):
+            achievements.evaluate(self.user.pk, {'something_else'})
+        self.client.force_login(self.user)
+        self.client.get(f'/habits/complete/{self.habit.id}/')
+        self.assertEqual(self.keys(), {'finisher'})
+
+    def test_reports_list_earned_milestones_and_new_rules_plug_in(self):
+        milestone = achievements.register(achievements.Milestone(
+            'days_1', 'Day One', 'One day down.', 'bg-info', achievements.COMPLETED_DAYS, 1))
+        self.addCleanup(achievements.MILESTONES.pop, 'days_1')
+        self.client.force_login(self.user)
+        self.assertEqual([m['title'] for m in self.client.get('/reports/').context['milestones']], ['First Steps'])
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_entry(self.habit, date(2025, 1, 1))
+        milestones = self.client.get('/reports/').context['milestones']
+        self.assertEqual([m['title'] for m in milestones], [milestone.title])
+        self.assertIsNotNone(milestones[0]['earned_at'])
+
+    def test_award_milestones_backfills(self):
+        HabitStats.objects.filter(habit=self.habit).update(completed_days=20, longest_streak=20)
+        call_command('award_milestones', stdout=StringIO())
+        self.assertEqual(self.keys(), {'days_10', 'streak_7', 'rate_100', 'rate_90', 'rate_75', 'rate_50'})
+
+
+def rss_kib():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('exporter', 'exporter@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+        self.habit = create_habit(self.user, 'Run, daily', start_date=date(2025, 1, 1), duration=9)
+        toggle_entry(self.habit, date(2025, 1, 2))
+        toggle_entry(self.habit, date(2025, 1, 5))
+        Note.objects.create(user=self.user, title='Ideas', heading='Q1', content='Line one\nline "two"')
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345')
+        Note.objects.create(user=other, title='Private', heading='h', content='c')
+
+    def download(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        self.assertEqual(self.download('/export/entries.csv').decode().splitlines(),
+                         ['habit_id,date', f'{self.habit.id},2025-01-02', f'{self.habit.id},2025-01-05'])
+        habits = self.download('/export/habits.csv').decode()
+        self.assertIn('"Run, daily",2025-01-01,2025-01-10', habits)
+        self.assertNotIn('Private', self.download('/export/notes.csv').decode())
+
+    def test_json_and_gzip(self):
+        data = json.loads(self.download('/export/all.json'))
+        self.assertEqual(list(data), ['habits', 'entries', 'notes', 'todos'])
+        self.assertEqual(data['notes'][0]['content'], 'Line one\nline "two"')
+        self.assertEqual(data['entries'], [{'habit_id': self.habit.id, 'date': '2025-01-02'},
+                                           {'habit_id': self.habit.id, 'date': '2025-01-05'}])
+        response = self.client.get('/export/all.json?gzip=1')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="streaks-all.json.gz"')
+        self.assertEqual(json.loads(gzip.decompress(b''.join(response.streaming_content))), data)
+
+    def test_unknown_exports_and_anonymous_users(self):
+        self.assertEqual(self.client.get('/export/all.csv').status_code, 404)
+        self.assertEqual(self.client.get('/export/users.json').status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get('/export/notes.csv').status_code, 302)
+
+    async def test_streams_under_asgi(self):
+        response = await self.async_client.get('/export/entries.csv')
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content.decode().splitlines()[1:], [f'{self.habit.id},2025-01-02', f'{self.habit.id},2025-01-05'])
+
+    def test_export_data_command(self):
+        with TemporaryDirectory() as directory:
+            call_command('export_data', 'exporter', format='csv', gzip=True, output=directory, stdout=StringIO())
+            files = sorted(path.name for path in Path(directory).iterdir())
+            self.assertEqual(files, [f'exporter-streaks-{name}.csv.gz' for name in ('entries', 'habits', 'notes', 'todos')])
+            notes = gzip.decompress((Path(directory) / 'exporter-streaks-notes.csv.gz').read_bytes()).decode()
+            self.assertIn('Ideas', notes)
+        with self.assertRaises(CommandError):
+            call_command('export_data', stdout=StringIO())
+
+    @skipUnless(os.path.exists('/proc/self/status'), 'reads RSS from /proc')
+    def test_million_entries_stream_in_bounded_memory(self):
+        start = date(2000, 1, 1)
+        habits = Habit.objects.bulk_create(
+            Habit(user=self.user, name=f'H{i}', start_date=start, end_date=start + timedelta(days=3649)) for i in range(274)
+        )
+        days = [(start + timedelta(days=i)).isoformat() for i in range(3650)]
+        with connection.cursor() as cursor:
+            cursor.executemany('INSERT INTO core_habitentry (habit_id, date, completed) VALUES (%s, %s, %s)',
+                               ((habit.id, day, True) for habit in habits for day in days))
+        del days
+        baseline = peak = rss_kib()
+        lines = 0
+        for chunk in self.client.get('/export/entries.csv').streaming_content:
+            lines += chunk.count(b'\n')
+            peak = max(peak, rss_kib())
+        self.assertEqual(lines, 1 + 2 + 274 * 3650)
+        # Holding the rows in memory would take well over 100 MiB
+        self.assertLess(peak - baseline, 32 * 1024)
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('importer', 'importer@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.run = create_habit(self.user, 'Run', start_date=date(2025, 1, 10), duration=9)
+        toggle_entry(self.run, date(2025, 1, 12))
+        toggle_entry(self.run, date(2025, 1, 13))
+
+    def run_import(self, content, fmt='csv', **kwargs):
+        job = importer.start_import(self.user, fmt, f'history.{fmt}')
+        return importer.run_import(job, BytesIO(content.encode()), **kwargs)
+
+    def assertConsistent(self):
+        for habit in Habit.objects.filter(user=self.user).select_related('stats'):
+            self.assertEqual(list(habit.days()), dense_days(habit))
+            persisted = habit.stats
+            rebuilt = rebuild_stats(habit)
+            self.assertEqual((persisted.completed_days, persisted.total_days, persisted.longest_streak,
+                              persisted.last_completed),
+                             (rebuilt.completed_days, rebuilt.total_days, rebuilt.longest_streak, rebuilt.last_completed))
+        daily = set(DailyRollup.objects.filter(user=self.user).values_list('date', 'habits_active', 'days_completed'))
+        rollups.rebuild_user(self.user.pk)
+        self.assertEqual(daily, set(DailyRollup.objects.filter(user=self.user)
+                                    .values_list('date', 'habits_active', 'days_completed')))
+
+    def test_csv_creates_habits_and_widens_existing_ones(self):
+        job = self.run_import('Habit,Date,Completed\n'
+                              'Run,2025-01-05,true\n'
+                              'Run,2025-01-13,no\n'
+                              'Run,2025-01-25,1\n'
+                              '"Read, nightly",2025-01-01,yes\n'
+                              '"Read, nightly",2025-01-02,x\n'
+                              '"Read, nightly",2025-01-02,x\n')
+        self.assertEqual((job.status, job.rows_done, job.habits_created, job.error_count), ('done', 6, 1, 0))
+        run = Habit.objects.get(pk=self.run.pk)
+        self.assertEqual((run.start_date, run.end_date), (date(2025, 1, 5), date(2025, 1, 25)))
+        self.assertEqual(sorted(run.habitentry_set.values_list('date', flat=True)),
+                         [date(2025, 1, 5), date(2025, 1, 12), date(2025, 1, 25)])
+        read = Habit.objects.get(user=self.user, name='Read, nightly')
+        self.assertEqual((read.start_date, read.end_date, read.stats.longest_streak), (date(2025, 1, 1), date(2025, 1, 2), 2))
+        self.assertTrue(Achievement.objects.filter(user=self.user, key='rate_100').exists())
+        self.assertConsistent()
+
+    def test_json_array_and_lines(self):
+        records = [{'habit': f'H{i % 3}', 'date': (date(2024, 1, 1) + timedelta(days=i)).isoformat(), 'completed': i % 4 != 0}
+                   for i in range(200)]
+        # A small chunk size cuts objects across reads
+        parsed = list(importer.json_records(BytesIO(json.dumps(records, indent=1).encode()), chunk_size=7))
+        self.assertEqual(parsed, [(r['habit'], r['date'], r['completed']) for r in records])
+        lines = '\n'.join(json.dumps({'Name': r['habit'], 'Day': r['date']}) for r in records[:10])
+        self.assertEqual(list(importer.json_records(BytesIO(lines.encode()), chunk_size=5)),
+                         [(r['habit'], r['date'], True) for r in records[:10]])
+        with self.assertRaises(ValueError):
+            list(importer.json_records(BytesIO(b'[{"habit": "H", "date": "2024-01-01"}, {"habit": ')))
+
+        job = self.run_import(json.dumps(records), 'json', batch_size=64)
+        self.assertEqual((job.rows_done, job.entries_written, job.habits_created), (200, 200, 3))
+        self.assertEqual(HabitEntry.objects.filter(habit__name='H1').count(), sum(
+            1 for r in records if r['habit'] == 'H1' and r['completed']))
+        self.assertConsistent()
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        job = self.run_import('habit,date,completed\n'
+                              'Run,2025-01-14,true\n'
+                              ',2025-01-15,true\n'
+                              'Run,01/15/2025,true\n'
+                              'Run,2025-01-16,maybe\n'
+                              'Run,2025-01-17\n'
+                              f'Run,{date(2025, 1, 10) + timedelta(days=MAX_HABIT_DURATION + 1)},true\n')
+        self.assertEqual((job.rows_done, job.entries_written, job.error_count), (6, 1, 5))
+        self.assertEqual([error['row'] for error in job.errors], [2, 3, 4, 5, 6])
+        self.assertIn('maybe', job.errors[2]['error'])
+        self.assertEqual(Habit.objects.get(pk=self.run.pk).stats.completed_days, 3)
+        with self.assertRaises(ValueError):
+            self.run_import('when,what\n2025-01-01,Run\n')
+        with self.assertRaises(ValueError):
+            importer.start_import(self.user, 'xml')
+
+    def test_resumes_after_the_last_committed_batch(self):
+        content = 'habit,date\n' + ''.join(f'Swim,{date(2025, 2, 1) + timedelta(days=i)}\n' for i in range(25))
+        job = importer.start_import(self.user, 'csv', 'swim.csv')
+        apply_batch = importer.apply_batch
+        calls = []
+
+        def interrupted(job, batch):
+            calls.append(len(batch))
+            if len(calls) == 3:
+                raise RuntimeError('worker killed')
+            return apply_batch(job, batch)
+
+        importer.apply_batch = interrupted
+        try:
+            with self.assertRaises(RuntimeError):
+                importer.run_import(job, BytesIO(content.encode()), batch_size=10)
+        finally:
+            importer.apply_batch = apply_batch
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_done), ('running', 20))
+        self.assertEqual(HabitEntry.objects.filter(habit__name='Swim').count(), 20)
+
+        with CaptureQueriesContext(connection) as captured:
+            importer.run_import(job, BytesIO(content.encode()), batch_size=10)
+        self.assertEqual((job.status, job.rows_done, job.entries_written), ('done', 25, 25))
+        self.assertEqual(sum('core_habitentry' in query['sql'] for query in captured), 1)
+        self.assertEqual(Habit.objects.get(name='Swim').stats.current_streak, 25)
+        with self.assertRaises(ValueError):
+            importer.run_import(job, BytesIO(content.encode()))
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        Achievement.objects.bulk_create(Achievement(user=self.user, key=key) for key in achievements.MILESTONES)
+        counts = []
+        for size in (3, 3, 300):  # The first creates the habits the others update
+            content = 'habit,date,completed\n' + ''.join(
+                f'H{i % 3},{date(2025, 1, 1) + timedelta(days=i // 3)},{i % 2}\n' for i in range(size))
+            job = importer.start_import(self.user, 'csv')
+            with CaptureQueriesContext(connection) as captured:
+                importer.apply_batch(job, list(enumerate(importer.csv_records(BytesIO(content.encode())), start=1)))
+            counts.append(len(captured))
+        self.assertEqual(counts[1], counts[2])
+
+    def test_upload_endpoint(self):
+        upload = SimpleUploadedFile('streaks.csv', b'habit,date\nRun,2025-01-15\nWalk,2025-01-15\n')
+        response = self.client.post('/api/v1/imports/', {'file': upload})
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['status'], body['rows_done'], body['habits_created']), ('done', 2, 1))
+        self.assertEqual(self.client.get(f"/api/v1/imports/{body['id']}/").json()['entries_written'], 2)
+        self.assertEqual(Habit.objects.get(pk=self.run.pk).stats.completed_days, 3)
+
+        response = self.client.post('/api/v1/imports/', {'file': SimpleUploadedFile('streaks.txt', b'x')})
+        self.assertEqual(response.status_code, 400)
+        broken = SimpleUploadedFile('streaks.json', b'[{"habit": "Run", "date": "2025-01-16"}, {oops')
+        response = self.client.post('/api/v1/imports/', {'file': broken})
+        self.assertEqual((response.status_code, response.json()['job']['rows_done']), (400, 0))
+        fixed = SimpleUploadedFile('streaks.json', b'[{"habit": "Run", "date": "2025-01-16"}]')
+        response = self.client.post('/api/v1/imports/', {'file': fixed, 'resume': response.json()['job']['id']})
+        self.assertEqual((response.status_code, response.json()['status']), (200, 'done'))
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(f"/api/v1/imports/{body['id']}/").status_code, 404)
+
+    def test_import_history_command(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'loop.csv'
+            path.write_text('name,day,done\nLoop,2025-03-01,yes\nLoop,2025-03-02,yes\n')
+            out = StringIO()
+            call_command('import_history', 'importer', str(path), stdout=out, stderr=StringIO())
+        self.assertIn('2 rows', out.getvalue())
+        self.assertEqual(Habit.objects.get(name='Loop').stats.current_streak, 2)
+        with self.assertRaises(CommandError):
+            call_command('import_history', 'importer', 'history.xml', stdout=StringIO())
+
+    def test_hundred_thousand_rows(self):
+        start = date(2020, 1, 1)
+        content = 'habit,date,completed\n' + ''.join(
+            f'H{h},{start + timedelta(days=d)},{int((h + d) % 5 != 0)}\n' for h in range(40) for d in range(2500))
+        job = self.run_import(content)
+        self.assertEqual((job.rows_done, job.habits_created, job.error_count), (100000, 40, 0))
+        self.assertEqual(HabitEntry.objects.filter(habit__user=self.user).count(), 2 + 40 * 2000)
+        self.assertEqual(Habit.objects.get(user=self.user, name='H7').stats.longest_streak, 4)
+
+
+class HabitLifecycleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = date(2025, 6, 1)
+        self.user = User.objects.create_user('finisher', 'finisher@example.com', 'pass12345')
+        self.expired = create_habit(self.user, 'Done', start_date=date(2025, 5, 1), end_date=date(2025, 5, 31))
+        self.running = create_habit(self.user, 'Running', start_date=date(2025, 5, 1), end_date=self.today)
+        self.deleted = create_habit(self.user, 'Gone', start_date=date(2025, 4, 1), end_date=date(2025, 4, 30))
+        self.deleted.is_deleted = True
+        self.deleted.save()
+
+    def test_completes_expired_habits_and_awards_milestones(self):
+        self.client.force_login(self.user)
+        etag = self.client.get('/api/v1/habits/')['ETag']
+        self.client.get('/reports/')
+        stale = report_cache.report_key(self.user.pk, stamps.get_stamp(self.user.pk, 'reports'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(complete_expired_habits(self.today.isoformat()), 1)
+        # A worker cannot delete from a web process's cache: the stamp moves on and the old entry goes unread
+        self.assertIsNotNone(cache.get(stale))
+        self.client.get('/reports/')
+        self.assertEqual(report_cache.stats()['misses'], 2)
+        self.assertEqual(set(Habit.objects.filter(is_completed=True).values_list('name', flat=True)), {'Done'})
+        self.assertTrue(Achievement.objects.filter(user=self.user, key='finisher').exists())
+        self.assertEqual(self.client.get('/api/v1/habits/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(complete_expired_habits(self.today.isoformat()), 0)
+
+    def test_chunks_by_user_id_with_fixed_queries(self):
+        users = [User.objects.create_user(f'u{i}') for i in range(6)]
+        for user in users:
+            for i in range(1 + user.pk % 3):
+                create_habit(user, f'H{i}', start_date=date(2025, 1, 1), end_date=date(2025, 1, 31))
+        ids = [user.pk for user in users]
+        with self.assertNumQueries(6):  # Savepoint pair, select, update, earned, counters (no new ones to insert)
+            Achievement.objects.bulk_create(Achievement(user_id=pk, key='finisher') for pk in ids)
+            self.assertEqual(complete_expired(ids[0], ids[-1], self.today), ids)
+        with override_settings(HABIT_LIFECYCLE_CHUNK_SIZE=2):
+            self.assertEqual(complete_expired_habits(self.today.isoformat()), 1)
+        self.assertFalse(Habit.objects.filter(is_deleted=False, is_completed=False, end_date__lt=self.today).exists())
+
+    def test_evaluate_many_matches_evaluate(self):
+        other = User.objects.create_user('other')
+        habit = create_habit(other, 'Walk', start_date=date(2025, 1, 1), duration=9)
+        apply_checkins(other, [(habit.pk, date(2025, 1, 1) + timedelta(days=i), True) for i in range(8)])
+        Achievement.objects.all().delete()
+        new = achievements.evaluate_many([self.user.pk, other.pk])
+        self.assertEqual({(a.user_id, a.key) for a in new},
+                         {(other.pk, key) for key in ('streak_7', 'rate_75', 'rate_50')})
+        self.assertEqual(achievements.evaluate_many([self.user.pk, other.pk]), [])
+
+    def test_beat_schedule_and_command(self):
+        self.assertEqual(settings.CELERY_BEAT_SCHEDULE['complete-expired-habits']['task'],
+                         'core.tasks.complete_expired_habits')
+        out = StringIO()
+        call_command('complete_expired_habits', '--today', '2025-06-01', stdout=out)
+        self.assertIn('1 user.', out.getvalue())
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('archivist', 'archivist@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.start = timezone.now().date() - timedelta(days=20)
+        self.old = self.make_habit('Old', days_ago=40, checked=(0, 1, 2, 5))
+        self.recent = self.make_habit('Recent', days_ago=3, checked=(1,))
+        self.live = create_habit(self.user, 'Live', start_date=self.start, duration=9)
+
+    def make_habit(self, name, days_ago, checked):
+        habit = create_habit(self.user, name, start_date=self.start, duration=9)
+        apply_checkins(self.user, [(habit.pk, self.start + timedelta(days=i), True) for i in checked])
+        self.client.get(f'/habits/delete/{habit.pk}/')
+        Habit.objects.filter(pk=habit.pk).update(deleted_at=timezone.now() - timedelta(days=days_ago))
+        return Habit.objects.get(pk=habit.pk)
+
+    def test_moves_old_deleted_habits_out_of_the_hot_tables(self):
+        etag = self.client.get('/api/v1/habits/')['ETag']
+        reports = stamps.get_stamp(self.user.pk, 'reports')
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_habits', stdout=StringIO())
+        # Invalidated through the database stamps, which the nightly task's worker shares with the web processes
+        self.assertEqual(self.client.get('/api/v1/habits/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertNotEqual(stamps.get_stamp(self.user.pk, 'reports'), reports)
+        self.assertFalse(Habit.objects.filter(pk=self.old.pk).exists())
+        for model in (HabitEntry, HabitStats, WeeklyHabitRollup):
+            self.assertFalse(model.objects.filter(habit_id=self.old.pk).exists())
+        archived = ArchivedHabit.objects.get(pk=self.old.pk)
+        self.assertEqual((archived.name, archived.history, archived.completed_days), ('Old', self.old.history, 4))
+        self.assertTrue(Habit.objects.filter(pk=self.recent.pk, is_deleted=True).exists())
+        self.assertEqual(archive.archive_deleted(), 0)
+
+        response = self.client.get('/habits/deleted/')
+        self.assertEqual([(item['habit'].name, item['completion_rate']) for item in response.context['habits_with_rates']],
+                         [('Recent', 10.0), ('Old', 40.0)])
+        self.assertContains(response, f'/habits/restore/{self.old.pk}/')
+        names = {item['habit'].name for item in self.client.get('/habits/all/').context['habits_with_rates']}
+        self.assertEqual(names, {'Old', 'Recent', 'Live'})
+
+    def test_restore_from_the_archive(self):
+        archive.archive_deleted()
+        response = self.client.get(f'/habits/restore/{self.old.pk}/')
+        self.assertRedirects(response, '/habits/ongoing/', fetch_redirect_response=False)
+        habit = Habit.objects.select_related('stats').get(pk=self.old.pk)
+        self.assertEqual((habit.is_deleted, habit.deleted_at, habit.history), (False, None, self.old.history))
+        self.assertEqual(list(habit.days()), dense_days(habit))
+        self.assertEqual((habit.stats.completed_days, habit.stats.longest_streak), (4, 3))
+        self.assertFalse(ArchivedHabit.objects.exists())
+        daily = set(DailyRollup.objects.filter(user=self.user).values_list('date', 'habits_active', 'days_completed'))
+        rollups.rebuild_user(self.user.pk)
+        self.assertEqual(daily, set(DailyRollup.objects.filter(user=self.user)
+                                    .values_list('date', 'habits_active', 'days_completed')))
+
+    def test_restore_a_recently_deleted_habit(self):
+        self.client.get(f'/habits/restore/{self.recent.pk}/')
+        self.assertFalse(Habit.objects.get(pk=self.recent.pk).is_deleted)
+        self.assertEqual(self.client.get(f'/habits/restore/{self.live.pk}/').status_code, 404)
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345')
+        self.client.force_login(other)
+        archive.archive_deleted()
+        self.assertEqual(self.client.get(f'/habits/restore/{self.old.pk}/').status_code, 404)
+
+    def test_batches_take_a_fixed_number_of_queries(self):
+        many = [self.make_habit(f'Extra {i}', days_ago=60, checked=(i % 10,)) for i in range(30)]
+        counts = []
+        for limit in (1, 30):
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(archive.archive_batch(archive.cutoff(), limit), limit)
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(ArchivedHabit.objects.filter(pk__in=[habit.pk for habit in many]).count(), 30)
+        self.assertEqual(settings.CELERY_BEAT_SCHEDULE['archive-deleted-habits']['task'], 'core.tasks.archive_deleted_habits')
+
+
+class EmailLoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', 'Ana@Example.com', 'pass12345')
+
+    def test_login_by_email_ignores_case(self):
+        response = self.client.post('/login/', {'email': 'ana@example.COM', 'password': 'pass12345'})
+        self.assertRedirects(response, '/dashboard/', fetch_redirect_response=False)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.pk)
+
+        for email, password in (('ana@example.com', 'wrong'), ('bob@example.com', 'pass12345')):
+            response = Client().post('/login/', {'email': email, 'password': password})
+            self.assertEqual([str(message) for message in response.context['messages']], ['Invalid email or password.'])
+        # The admin still logs in by username
+        self.assertEqual(authenticate(username='ana', password='pass12345'), self.user)
+
+    def test_lookup_uses_the_email_index(self):
+        if connection.vendor == 'sqlite':
+            self.assertIn('auth_user_email_lower_uniq', backends.users_with_email('ANA@example.com').explain())
+        with self.assertNumQueries(1):
+            self.assertEqual(backends.users_with_email(' ANA@example.com ').get(), self.user)
+
+    def test_emails_are_unique_in_any_case(self):
+        response = self.client.post('/register/', {'username': 'ana2', 'email': 'ANA@example.com',
+                                                   'password1': 'Vx9-long-pass', 'password2': 'Vx9-long-pass'})
+        self.assertContains(response, 'An account with this email already exists.')
+        self.client.post('/register/', {'username': 'bo', 'email': ' Bo@Example.com',
+                                        'password1': 'Vx9-long-pass', 'password2': 'Vx9-long-pass'})
+        self.assertEqual(User.objects.get(username='bo').email, 'bo@example.com')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user('ana3', 'ana@EXAMPLE.com')
+        # Accounts without an email are not covered
+        User.objects.create_user('nobody-1')
+        User.objects.create_user('nobody-2')
+
+
+class SessionProfileTests(TestCase):
+    def setUp(self):
+        User.objects.create_user('ana', 'ana@example.com', 'pass12345')
+
+    def test_default_profile(self):
+        self.assertEqual(settings.SESSION_ENGINE, settings.SESSION_PROFILES[settings.SESSION_PROFILE])
+
+    def test_pages_skip_the_session_table(self):
+        # Only the user is read once the session comes from the cache or the cookie
+        for profile in ('cached_db', 'signed_cookies'):
+            with self.subTest(profile), override_settings(SESSION_ENGINE=settings.SESSION_PROFILES[profile]):
+                cache.clear()
+                client = Client()
+                client.post('/login/', {'email': 'ana@example.com', 'password': 'pass12345'})
+                with self.assertNumQueries(1):
+                    self.assertEqual(client.get('/dashboard/').status_code, 200)
+                client.get('/logout/')
+                self.assertEqual(client.get('/dashboard/').status_code, 302)
+
+    def test_bench_servers_session_cookie(self):
+        # bench_servers hands this cookie to gunicorn; it must log in under every profile
+        from .management.commands.bench_servers import Command as BenchServers
+        user = BenchServers().seed()
+        for profile, engine in settings.SESSION_PROFILES.items():
+            with self.subTest(profile), override_settings(SESSION_ENGINE=engine):
+                name, _, value = BenchServers().session_cookie(user).partition('=')
+                client = Client()
+                client.cookies[name] = value
+                self.assertEqual(client.get('/dashboard/').status_code, 200)
+
+    def test_bench_auth_command(self):
+        out = StringIO()
+        with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+            call_command('bench_auth', '--users', '20', '--repeat', '2', stdout=out)
+        self.assertIn('signed_cookies', out.getvalue())
+        self.assertFalse(User.objects.filter(username__startswith='bench-auth-').exists())
@@ -1,5 +1,5 @@
-from django.urls import path
-from . import views
+from django.urls import include, path
+from . import export, metrics, views
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -8,12 +8,19 @@ urlpatterns = [
     # path('habits/edit/<int:habit_id>/', views.edit_habit, name='edit_habit'),
     path('habits/delete/<int:habit_id>/', views.delete_habit, name='delete_habit'),
     path('habits/complete/<int:habit_id>/', views.complete_habit, name='complete_habit'),
+    path('habits/restore/<int:habit_id>/', views.restore_habit, name='restore_habit'),
     # path('entry/<int:habit_id>/<str:date>/', views.toggle_entry, name='toggle_entry'),
     path('reports/', views.reports, name='reports'),
     path('notes/', views.notes, name='notes'),
     path('notes/delete/<int:note_id>/', views.delete_note, name='delete_note'),
+    path('notes/page/', views.notes_page, name='notes_page'),
+    path('notes/search/', views.notes_search, name='notes_search'),
     path('to-do/', views.to_do, name='to_do'),
+    path('to-do/page/', views.todos_page, name='todos_page'),
     path('to-do/<int:todo_id>/update/', views.update_todo_status, name='update_todo_status'),
     path('to-do/<int:todo_id>/delete/', views.delete_todo, name='delete_todo'),
+    path('export/<str:resource>.<str:fmt>', export.export_view, name='export'),
+    path('api/v1/', include('core.api_urls')),
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
 
@@ -2,7 +2,6 @@ from django.http import JsonResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 
-from core.tasks import send_reminder_email
 from .forms import RegisterForm, LoginForm
 from django.contrib import messages
 from django.contrib.auth.models import User
@@ -25,19 +24,12 @@ def user_login(request):
     if request.method == 'POST':
         form = LoginForm(request.POST)
         if form.is_valid():
-            email = form.cleaned_data['email']
-            password = form.cleaned_data['password']
-            try:
-                user = User.objects.get(email=email)
-                user = authenticate(request, username=user.username, password=password)
-                if user is not None:
-                    login(request, user)
-                    messages.success(request, 'Logged in successfully!')
-                    return redirect('dashboard')
-                else:
-                    messages.error(request, 'Invalid email or password.')
-            except User.DoesNotExist:
-                messages.error(request, 'No account found with this email.')
+            user = authenticate(request, email=form.cleaned_data['email'], password=form.cleaned_data['password'])
+            if user is not None:
+                login(request, user)
+                messages.success(request, 'Logged in successfully!')
+                return redirect('dashboard')
+            messages.error(request, 'Invalid email or password.')
     else:
         form = LoginForm()
     return render(request, 'core/login.html', {'form': form})
@@ -49,13 +41,16 @@ def user_logout(request):
 
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from .models import Habit, HabitEntry, ToDo
+from .models import Habit, HabitEntry, HabitStats, ToDo
+from .streaks import rebuild_stats
+from . import achievements, report_cache, rollups
+from .decorators import async_login_required
 from django.utils import timezone
 
 
-def reports(request):
-    habits = Habit.objects.filter(user=request.user, is_deleted=False)
-    completed_habits_all = Habit.objects.filter(user=request.user, is_completed=True, is_deleted=False)
+def build_report_context(user):
+    habits = Habit.objects.filter(user=user, is_deleted=False)
+    completed_habits_all = Habit.objects.filter(user=user, is_completed=True, is_deleted=False)
     
     habit_data = []
     total_habits = habits.count()
@@ -63,40 +58,21 @@ def reports(request):
     total_possible_days = 0
     
     ongoing_habits_queryset = habits.filter(is_completed=False)
-    for habit in ongoing_habits_queryset:
-        total_days = habit.habitentry_set.count()
-        completed_days = habit.habitentry_set.filter(completed=True).count()
-        completion_rate = (completed_days / total_days * 100) if total_days > 0 else 0
-        
-        entries = habit.habitentry_set.order_by('date')
-        streaks = []
-        temp_streak = 0
-        prev_date = None
-        
-        for entry in entries:
-            if prev_date and (entry.date - prev_date).days > 1:
-                if temp_streak > 0:
-                    streaks.append(temp_streak)
-                temp_streak = 0
-            if entry.completed:
-                temp_streak += 1
-            elif temp_streak > 0:
-                streaks.append(temp_streak)
-                temp_streak = 0
-            prev_date = entry.date
-        if temp_streak > 0:
-            streaks.append(temp_streak)
-        
-        highest_streak = max(streaks) if streaks else 0
+    ongoing_habits_list = list(ongoing_habits_queryset.select_related('stats').defer('history'))
+    for habit in ongoing_habits_list:
+        try:
+            stats = habit.stats
+        except HabitStats.DoesNotExist:
+            stats = rebuild_stats(habit)  # Habits created before the summary existed
         
         habit_data.append({
             'name': habit.name,
-            'completion_rate': round(completion_rate, 1),
+            'completion_rate': round(stats.completion_rate, 1),
             'is_completed': habit.is_completed,
-            'highest_streak': highest_streak,
+            'highest_streak': stats.longest_streak,
         })
-        total_completed_days += completed_days
-        total_possible_days += total_days
+        total_completed_days += stats.completed_days
+        total_possible_days += stats.total_days
 
     overall_completion_rate = (total_completed_days / total_possible_days * 100) if total_possible_days > 0 else 0
     ongoing_habits = ongoing_habits_queryset.count()
@@ -112,26 +88,9 @@ def reports(request):
     else:
         summary = f"Starting strong! {completed_habits}/{total_habits} habits are in the bag with {round(overall_completion_rate, 1)}% consistency—let’s crank it up! You’ve got {ongoing_habits} ongoing habits and {total_completed_days}/{total_possible_days} days tracked so far. Fun tidbit: Even a 1% daily boost compounds into epic gains—time to stack those victories!"
 
-    milestones = []
-    if total_habits > 0:
-        if total_completed_days >= 10:
-            milestones.append({'title': "10 Days Consistent", 'message': "You’ve checked off 10 days! Small steps lead to big wins—keep it up!", 'color': 'bg-info'})
-        if total_completed_days >= 30:
-            milestones.append({'title': "30-Day Champion", 'message': "Wow, 30 days of progress! You’re building habits like a pro!", 'color': 'bg-primary'})
-        if any(h['highest_streak'] >= 7 for h in habit_data):
-            milestones.append({'title': "Week-Long Warrior", 'message': "A 7-day streak? That’s serious dedication—stay unstoppable!", 'color': 'bg-warning'})
-        if completed_habits >= 1:
-            milestones.append({'title': "Habit Finisher", 'message': f"You’ve completed {completed_habits} habit{'' if completed_habits == 1 else 's'}! Celebrate your victory!", 'color': 'bg-success'})
-        if any(h['completion_rate'] >= 100 for h in habit_data):
-            milestones.append({'title': "Perfect Habit Master", 'message': "100% completion on a habit? You’re a perfectionist—amazing work!", 'color': 'bg-dark'})
-        if any(h['completion_rate'] >= 90 for h in habit_data):
-            milestones.append({'title': "Near-Perfect Achiever", 'message': "90%+ on a habit—almost flawless, keep shining!", 'color': 'bg-purple'})
-        if any(h['completion_rate'] >= 75 for h in habit_data):
-            milestones.append({'title': "Three-Quarter Titan", 'message': "75%+ completion—strong and steady, you’re crushing it!", 'color': 'bg-teal'})
-        if any(h['completion_rate'] >= 50 for h in habit_data):
-            milestones.append({'title': "Halfway Hero", 'message': "50%+ on a habit—half the battle won, keep pushing forward!", 'color': 'bg-orange'})
-        if not milestones:
-            milestones.append({'title': "First Steps", 'message': "Every journey starts somewhere—keep checking those boxes!", 'color': 'bg-secondary'})
+    milestones = achievements.earned(user)  # Awarded as habits change, see core.achievements
+    if total_habits > 0 and not milestones:
+        milestones.append({'title': "First Steps", 'message': "Every journey starts somewhere—keep checking those boxes!", 'color': 'bg-secondary'})
 
     context = {
         'habit_data': habit_data,
@@ -140,7 +99,16 @@ def reports(request):
         'milestones': milestones,
         'total_completed_days': total_completed_days,
         'total_possible_days': total_possible_days,
+        # Trend charts read fixed windows of the rollup tables, never the entries
+        'daily_trend': rollups.daily_trend(user),
+        'weekly_trends': rollups.weekly_trends(ongoing_habits_list),
     }
+    return context
+
+
+@async_login_required
+async def reports(request):
+    context = await report_cache.aget_report_context(request.user, build_report_context)
     return render(request, 'core/reports.html', context)
 
 from django.shortcuts import render, redirect
@@ -154,11 +122,13 @@ def dashboard(request):
 
 # Keep existing views like update_habit, reports, etc.
 
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
+from django.http import Http404
 from django.utils import timezone
-from .models import Habit, HabitEntry
-from datetime import timedelta
+from . import archive
+from .models import ArchivedHabit, Habit, HabitEntry
+from .services import DEFAULT_HABIT_DURATION, MAX_HABIT_DURATION, create_habit, toggle_entry
 from django.contrib import messages
 
 @login_required
@@ -167,37 +137,32 @@ def habits(request, tab='all'):
     if tab not in valid_tabs:
         tab = 'ongoing'
 
-    if tab == 'ongoing':
-        habits = Habit.objects.filter(user=request.user, is_deleted=False, is_completed=False)
-    elif tab == 'completed':
-        habits = Habit.objects.filter(user=request.user, is_deleted=False, is_completed=True)
-    elif tab == 'deleted':
-        habits = Habit.objects.filter(user=request.user, is_deleted=True)
-    else:  # all
-        habits = Habit.objects.filter(user=request.user)
+    if request.method == 'POST':
+        name = request.POST['name']
+        duration = request.POST.get('duration') or DEFAULT_HABIT_DURATION
+        try:
+            create_habit(request.user, name, duration=duration)
+        except ValueError:
+            messages.error(request, f'Duration must be a whole number of days up to {MAX_HABIT_DURATION}.')
+            return redirect('habits', tab=tab)
+        messages.success(request, 'Habit added successfully!')
+        return redirect('habits', tab=tab)
+
+    if tab == 'deleted':
+        habits = archive.deleted_habits(request.user)
+    elif tab == 'all':
+        habits = [*Habit.objects.for_tab(request.user, tab), *ArchivedHabit.objects.filter(user=request.user)]
+    else:
+        habits = Habit.objects.for_tab(request.user, tab)
 
     habits_with_rates = []
     for habit in habits:
-        total_days = habit.habitentry_set.count()
-        completed_days = habit.habitentry_set.filter(completed=True).count()
-        completion_rate = (completed_days / total_days * 100) if total_days > 0 else 0
+        completion_rate = (habit.completed_days / habit.total_days * 100) if habit.total_days > 0 else 0
         habits_with_rates.append({
             'habit': habit,
             'completion_rate': round(completion_rate, 1)
         })
 
-    if request.method == 'POST':
-        name = request.POST['name']
-        start_date = timezone.now().date()
-        end_date = start_date + timedelta(days=30)
-        habit = Habit.objects.create(user=request.user, name=name, start_date=start_date, end_date=end_date)
-        current_date = start_date
-        while current_date <= end_date:
-            HabitEntry.objects.get_or_create(habit=habit, date=current_date, defaults={'completed': False})
-            current_date += timedelta(days=1)
-        messages.success(request, 'Habit added successfully!')
-        return redirect('habits', tab=tab)
-
     return render(request, 'core/habits.html', {
         'habits_with_rates': habits_with_rates,
         'current_tab': tab,
@@ -206,9 +171,11 @@ def habits(request, tab='all'):
 
 @login_required
 def update_habit(request, habit_id, date):
-    habit_entry = HabitEntry.objects.get(habit__id=habit_id, date=date, habit__user=request.user)
-    habit_entry.completed = not habit_entry.completed
-    habit_entry.save()
+    habit = get_object_or_404(Habit, id=habit_id, user=request.user)
+    try:
+        toggle_entry(habit, datetime.strptime(date, '%Y-%m-%d').date())
+    except ValueError:
+        raise Http404('No such day for this habit.')
     messages.success(request, 'Habit entry updated!')
     return redirect('habits')
 
@@ -216,10 +183,20 @@ def update_habit(request, habit_id, date):
 def delete_habit(request, habit_id):
     habit = Habit.objects.get(id=habit_id, user=request.user)
     habit.is_deleted = True
+    habit.deleted_at = timezone.now()
     habit.save()
     messages.success(request, 'Habit deleted successfully!')
     return redirect('habits', tab='deleted')
 
+@login_required
+def restore_habit(request, habit_id):
+    try:
+        habit = archive.restore(request.user, habit_id)
+    except ArchivedHabit.DoesNotExist:
+        raise Http404('No such deleted habit.')
+    messages.success(request, 'Habit restored!')
+    return redirect('habits', tab='completed' if habit.is_completed else 'ongoing')
+
 @login_required
 def complete_habit(request, habit_id):
     habit = Habit.objects.get(id=habit_id, user=request.user)
@@ -230,25 +207,71 @@ def complete_habit(request, habit_id):
 
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.urls import reverse
 from .models import Habit, HabitEntry, Note
+from .pagination import InvalidCursor, akeyset_page
+from .search import search_notes
 from django.utils import timezone
 
-@login_required
-def notes(request):
+NOTE_ORDERING = ('-created_at', '-id')
+TODO_ORDERING = ('deadline', 'id')
+
+@async_login_required
+async def notes(request):
     if request.method == "POST":
         title = request.POST.get('title')
         heading = request.POST.get('heading')
         content = request.POST.get('content')
         if title and heading and content:
-            Note.objects.create(user=request.user, title=title, heading=heading, content=content)
+            await Note.objects.acreate(user=request.user, title=title, heading=heading, content=content)
             return redirect('notes')
 
-    notes = Note.objects.filter(user=request.user).order_by('-created_at')
+    notes, next_cursor = await akeyset_page(Note.objects.filter(user=request.user), NOTE_ORDERING)
     context = {
         'notes': notes,
+        'next_cursor': next_cursor,
     }
     return render(request, 'core/notes.html', context)
 
+def note_json(note):
+    return {
+        'id': note.id,
+        'title': note.title,
+        'heading': note.heading,
+        'content': note.content,
+        'created_at': timezone.localtime(note.created_at).strftime('%Y-%m-%d %I:%M %p'),
+        'delete_url': reverse('delete_note', args=[note.id]),
+    }
+
+@async_login_required
+async def notes_page(request):
+    # Infinite-scroll endpoint: the page of notes after ?cursor=, newest first
+    try:
+        notes, next_cursor = await akeyset_page(Note.objects.filter(user=request.user), NOTE_ORDERING,
+                                         request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': True, 'notes': [note_json(note) for note in notes], 'next_cursor': next_cursor})
+
+@login_required
+def notes_search(request):
+    # Ranked full-text search; title, heading and snippet come back as HTML with <mark> around matches
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid page.'}, status=400)
+    notes, has_next = search_notes(request.user, request.GET.get('q', ''), page)
+    results = [{
+        'id': note.id,
+        'title': note.title_match,
+        'heading': note.heading_match,
+        'snippet': note.snippet,
+        'created_at': timezone.localtime(note.created_at).strftime('%Y-%m-%d %I:%M %p'),
+        'delete_url': reverse('delete_note', args=[note.id]),
+    } for note in notes]
+    return JsonResponse({'success': True, 'results': results, 'next_page': page + 1 if has_next else None})
+
 @login_required
 def delete_note(request, note_id):
     note = Note.objects.get(id=note_id, user=request.user)
@@ -257,23 +280,24 @@ def delete_note(request, note_id):
 
 # Rest of views (reports, etc.)...
 
+import logging
+
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from .models import ToDo
 from django.utils import timezone
 from django.http import JsonResponse
-from .tasks import send_reminder_email
 
-@login_required
-def to_do(request):
+logger = logging.getLogger(__name__)
+
+@async_login_required
+async def to_do(request):
     if request.method == "POST" and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         task = request.POST.get('task')
         deadline_str = request.POST.get('deadline')
         reminder_str = request.POST.get('reminder')
         now = timezone.now().replace(second=0, microsecond=0)
 
-        print(f"POST Data - Task: {task}, Deadline: {deadline_str}, Reminder: {reminder_str}, Now: {now}")
-
         if not all([task, deadline_str, reminder_str]):
             return JsonResponse({'success': False, 'error': 'All fields are required.'})
 
@@ -283,54 +307,61 @@ def to_do(request):
             deadline = timezone.make_aware(deadline, timezone.get_current_timezone())
             reminder = timezone.make_aware(reminder, timezone.get_current_timezone())
 
-            print(f"Parsed - Deadline: {deadline}, Reminder: {reminder}")
-
             if deadline < now - timezone.timedelta(minutes=1) or reminder < now - timezone.timedelta(minutes=1):
                 return JsonResponse({'success': False, 'error': 'Deadline and reminder must be within the last minute or future.'})
 
-            todo = ToDo.objects.create(user=request.user, task=task, deadline=deadline, reminder=reminder)
-            eta = max(0, (reminder - timezone.now()).total_seconds())
-            send_reminder_email.apply_async((todo.id,), eta=eta)
-
-            print(f"Task Created - ID: {todo.id}, Scheduled Reminder ETA: {eta} seconds")
-
-            return JsonResponse({
-                'success': True,
-                'id': todo.id,
-                'task': todo.task,
-                'deadline': todo.deadline.strftime('%Y-%m-%d %I:%M %p'),
-                'reminder': todo.reminder.strftime('%Y-%m-%d %I:%M %p'),
-                'status': todo.status,
-                'created_at': todo.created_at.strftime('%Y-%m-%d %I:%M %p')
-            })
-        except ValueError as e:
-            print(f"ValueError: {e}")
+            # The reminder is picked up by the send_due_reminders sweeper once it is due
+            todo = await ToDo.objects.acreate(user=request.user, task=task, deadline=deadline, reminder=reminder)
+
+            return JsonResponse({'success': True, **todo_json(todo)})
+        except ValueError:
             return JsonResponse({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DDTHH:MM.'})
         except Exception as e:
-            print(f"Unexpected Error: {e}")
+            logger.exception('Could not create todo for user %s', request.user.pk)
             return JsonResponse({'success': False, 'error': f'An unexpected error occurred: {str(e)}'})
 
-    todos = ToDo.objects.filter(user=request.user).order_by('deadline')
+    todos, next_cursor = await akeyset_page(ToDo.objects.filter(user=request.user), TODO_ORDERING)
     context = {
         'todos': todos,
+        'next_cursor': next_cursor,
         'now': timezone.now().strftime('%Y-%m-%dT%H:%M'),
     }
     return render(request, 'core/to_do.html', context)
 
-@login_required
-def update_todo_status(request, todo_id):
+def todo_json(todo):
+    return {
+        'id': todo.id,
+        'task': todo.task,
+        'deadline': timezone.localtime(todo.deadline).strftime('%Y-%m-%d %I:%M %p'),
+        'reminder': timezone.localtime(todo.reminder).strftime('%Y-%m-%d %I:%M %p'),
+        'status': todo.status,
+        'created_at': timezone.localtime(todo.created_at).strftime('%Y-%m-%d %I:%M %p'),
+    }
+
+@async_login_required
+async def todos_page(request):
+    # Infinite-scroll endpoint: the page of todos after ?cursor=, soonest deadline first
+    try:
+        todos, next_cursor = await akeyset_page(ToDo.objects.filter(user=request.user), TODO_ORDERING,
+                                         request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': True, 'todos': [todo_json(todo) for todo in todos], 'next_cursor': next_cursor})
+
+@async_login_required
+async def update_todo_status(request, todo_id):
     if request.method == "POST" and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        todo = ToDo.objects.get(id=todo_id, user=request.user)
+        todo = await ToDo.objects.aget(id=todo_id, user=request.user)
         todo.status = 'completed' if todo.status == 'pending' else 'pending'
-        todo.save()
+        await todo.asave(update_fields=['status'])
         return JsonResponse({'success': True, 'status': todo.status})
     return JsonResponse({'success': False, 'error': 'Invalid request.'})
 
-@login_required
-def delete_todo(request, todo_id):
+@async_login_required
+async def delete_todo(request, todo_id):
     if request.method == "POST" and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        todo = ToDo.objects.get(id=todo_id, user=request.user)
-        todo.delete()
+        todo = await ToDo.objects.aget(id=todo_id, user=request.user)
+        await todo.adelete()
         return JsonResponse({'success': True})
     return redirect('to_do')
 
@@ -0,0 +1,15 @@
+# gunicorn.conf.py — read automatically when gunicorn is started from the project root.
+# SERVER_PROFILE=wsgi (default) runs the classic sync workers; SERVER_PROFILE=asgi runs
+# my_webapp.asgi under uvicorn workers so the async views in core.views are awaited natively.
+import decouple  # Not `from decouple import config`: gunicorn would read that name as its own setting
+
+SERVER_PROFILE = decouple.config('SERVER_PROFILE', default='wsgi')
+
+bind = decouple.config('GUNICORN_BIND', default=f"0.0.0.0:{decouple.config('PORT', default='8000')}")
+workers = decouple.config('WEB_CONCURRENCY', default=2, cast=int)
+
+if SERVER_PROFILE == 'asgi':
+    wsgi_app = 'my_webapp.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'my_webapp.wsgi:application'